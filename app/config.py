@@ -0,0 +1,143 @@
+"""
+Application settings loaded from environment variables
+"""
+import os
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Iterator
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    """Read a boolean flag such as 1/0, true/false, yes/no"""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+@dataclass(frozen=True)
+class Settings:
+    """Runtime configuration; every field can be set with a SHOP_* variable"""
+    # Adds per-request query counts to response headers
+    debug: bool = False
+    
+    # Statements slower than this go to the slow-query log (0 logs every one)
+    slow_query_ms: float = 200.0
+    slow_query_log_size: int = 100
+    # Handlers over their query budget: "log", "raise" or "off"
+    query_budget_mode: str = "log"
+    
+    # Database connection
+    database_url: str = "sqlite:///./shop.db"
+    db_echo: bool = False
+    # GET handlers read through a read-only engine: this replica URL, or the
+    # SQLite file reopened read-only (empty shares the main engine otherwise)
+    read_database_url: str = ""
+    
+    # Serve the API routers from the async stack (aiosqlite/asyncpg)
+    db_async: bool = False
+    
+    # Connection pool (ignored for in-memory SQLite)
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30.0
+    db_pool_recycle: int = 1800
+    db_read_pool_size: int = 5
+    
+    # Catalog read cache (shop items and categories)
+    catalog_cache_enabled: bool = True
+    catalog_cache_maxsize: int = 10_000
+    catalog_cache_ttl: float = 300.0
+    # Cache-Control sent with catalog ETags; no-cache means "revalidate first"
+    catalog_cache_control: str = "no-cache"
+    
+    # Build list pages from column rows and encode them with orjson
+    fast_list_responses: bool = False
+    
+    # Deletes mark customers, categories and items with deleted_at instead
+    # of removing the rows
+    soft_delete: bool = False
+    
+    # Idempotency-Key handling: how long keys are kept, and how long a retry
+    # waits for the first request with the same key to finish
+    idempotency_ttl: float = 24 * 60 * 60
+    idempotency_wait: float = 10.0
+    
+    # Startup seeding; turn off for production workers. JSON Lines fixtures
+    # (.jsonl) are streamed, .json files are read whole
+    seed_data: bool = True
+    seed_file: str = "data/test_data.json"
+    
+    # SQLite connection pragmas
+    sqlite_journal_mode: str = "WAL"
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_cache_size_kib: int = 64 * 1024
+    sqlite_mmap_size: int = 256 * 1024 * 1024
+    
+    @classmethod
+    def from_env(cls) -> "Settings":
+        """Build settings from SHOP_* environment variables"""
+        defaults = cls()
+        return cls(
+            debug=_env_bool("SHOP_DEBUG", defaults.debug),
+            slow_query_ms=float(os.getenv("SHOP_SLOW_QUERY_MS", defaults.slow_query_ms)),
+            slow_query_log_size=int(os.getenv("SHOP_SLOW_QUERY_LOG_SIZE", defaults.slow_query_log_size)),
+            query_budget_mode=os.getenv("SHOP_QUERY_BUDGET_MODE", defaults.query_budget_mode),
+            database_url=os.getenv("SHOP_DATABASE_URL", defaults.database_url),
+            db_echo=_env_bool("SHOP_DB_ECHO", defaults.db_echo),
+            read_database_url=os.getenv("SHOP_READ_DATABASE_URL", defaults.read_database_url),
+            db_async=_env_bool("SHOP_DB_ASYNC", defaults.db_async),
+            db_pool_size=int(os.getenv("SHOP_DB_POOL_SIZE", defaults.db_pool_size)),
+            db_max_overflow=int(os.getenv("SHOP_DB_MAX_OVERFLOW", defaults.db_max_overflow)),
+            db_pool_timeout=float(os.getenv("SHOP_DB_POOL_TIMEOUT", defaults.db_pool_timeout)),
+            db_pool_recycle=int(os.getenv("SHOP_DB_POOL_RECYCLE", defaults.db_pool_recycle)),
+            db_read_pool_size=int(os.getenv("SHOP_DB_READ_POOL_SIZE", defaults.db_read_pool_size)),
+            catalog_cache_enabled=_env_bool("SHOP_CATALOG_CACHE", defaults.catalog_cache_enabled),
+            catalog_cache_maxsize=int(
+                os.getenv("SHOP_CATALOG_CACHE_MAXSIZE", defaults.catalog_cache_maxsize)
+            ),
+            catalog_cache_ttl=float(os.getenv("SHOP_CATALOG_CACHE_TTL", defaults.catalog_cache_ttl)),
+            catalog_cache_control=os.getenv(
+                "SHOP_CATALOG_CACHE_CONTROL", defaults.catalog_cache_control
+            ),
+            fast_list_responses=_env_bool("SHOP_FAST_LIST_RESPONSES", defaults.fast_list_responses),
+            soft_delete=_env_bool("SHOP_SOFT_DELETE", defaults.soft_delete),
+            idempotency_ttl=float(os.getenv("SHOP_IDEMPOTENCY_TTL", defaults.idempotency_ttl)),
+            idempotency_wait=float(os.getenv("SHOP_IDEMPOTENCY_WAIT", defaults.idempotency_wait)),
+            seed_data=_env_bool("SHOP_SEED_DATA", defaults.seed_data),
+            seed_file=os.getenv("SHOP_SEED_FILE", defaults.seed_file),
+            sqlite_journal_mode=os.getenv("SHOP_SQLITE_JOURNAL_MODE", defaults.sqlite_journal_mode),
+            sqlite_synchronous=os.getenv("SHOP_SQLITE_SYNCHRONOUS", defaults.sqlite_synchronous),
+            sqlite_busy_timeout_ms=int(
+                os.getenv("SHOP_SQLITE_BUSY_TIMEOUT_MS", defaults.sqlite_busy_timeout_ms)
+            ),
+            sqlite_cache_size_kib=int(
+                os.getenv("SHOP_SQLITE_CACHE_SIZE_KIB", defaults.sqlite_cache_size_kib)
+            ),
+            sqlite_mmap_size=int(os.getenv("SHOP_SQLITE_MMAP_SIZE", defaults.sqlite_mmap_size)),
+        )
+
+
+settings = Settings.from_env()
+
+
+class RuntimeSetting:
+    """A setting the app reads on every request, so it can change while running
+    
+    Starts from the ``settings`` field of the same name; tests and
+    benchmarks flip it with ``override``.
+    """
+    
+    def __init__(self, name: str):
+        self.name = name
+        self.value = getattr(settings, name)
+    
+    @contextmanager
+    def override(self, value: Any) -> Iterator[None]:
+        """Use ``value`` inside the block, then restore the previous one"""
+        previous, self.value = self.value, value
+        try:
+            yield
+        finally:
+            self.value = previous
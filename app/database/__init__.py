@@ -1,6 +1,33 @@
 """
 Database package initialization
 """
-from .connection import engine, get_session, create_db_and_tables, SessionDep
+from .connection import (
+    engine,
+    read_engine,
+    create_db_engine,
+    create_read_engine,
+    create_async_db_engine,
+    create_async_read_engine,
+    get_async_engine,
+    get_async_read_engine,
+    get_session,
+    get_read_session,
+    get_async_session,
+    get_async_read_session,
+    create_db_and_tables,
+    SessionDep,
+    ReadSessionDep,
+    AsyncSessionDep,
+    AsyncReadSessionDep
+)
+# Registers the DDL hooks that create the item search index with the tables
+from . import search
 
-__all__ = ["engine", "get_session", "create_db_and_tables", "SessionDep"]
+__all__ = [
+    "engine", "read_engine", "create_db_engine", "create_read_engine",
+    "create_async_db_engine", "create_async_read_engine",
+    "get_async_engine", "get_async_read_engine",
+    "get_session", "get_read_session", "get_async_session", "get_async_read_session",
+    "create_db_and_tables",
+    "SessionDep", "ReadSessionDep", "AsyncSessionDep", "AsyncReadSessionDep"
+]
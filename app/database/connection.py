@@ -1,21 +1,187 @@
 """
 Database connection and session management
 """
-from typing import Annotated
-from sqlmodel import SQLModel, Session, create_engine
+from dataclasses import replace
+from typing import Annotated, Optional
+from sqlalchemy import Engine, event
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlmodel import Session, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
 from fastapi import Depends
+from app.config import Settings, settings
+from app.database.migrations import upgrade_schema
 
 
-# Database URL - SQLite for simplicity
-DATABASE_URL = "sqlite:///./shop.db"
+# Async drivers used for each backend when the async stack is enabled
+ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}
 
-# Create engine
-engine = create_engine(DATABASE_URL, echo=True)
+
+def _is_memory_database(url) -> bool:
+    """Check whether a SQLite URL points at an in-memory database"""
+    return url.database in (None, "", ":memory:") or "mode=memory" in str(url)
+
+
+def _sqlite_pragmas(config: Settings) -> dict:
+    """Pragmas applied to every new SQLite connection"""
+    return {
+        "journal_mode": config.sqlite_journal_mode,
+        "synchronous": config.sqlite_synchronous,
+        "busy_timeout": config.sqlite_busy_timeout_ms,
+        # Negative cache_size is in KiB rather than pages
+        "cache_size": -config.sqlite_cache_size_kib,
+        "mmap_size": config.sqlite_mmap_size,
+    }
+
+
+def _read_url(config: Settings) -> Optional[URL]:
+    """URL of the read-only database, or None when reads share the main engine
+    
+    A configured replica wins; otherwise a SQLite file is reopened as a
+    ``mode=ro`` URI. In-memory SQLite and servers without a replica fall
+    back to the main engine.
+    """
+    if config.read_database_url:
+        return make_url(config.read_database_url)
+    
+    url = make_url(config.database_url)
+    if url.get_backend_name() != "sqlite" or _is_memory_database(url):
+        return None
+    
+    query = dict(url.query, mode="ro", uri="true")
+    database = url.database if url.query.get("uri") else f"file:{url.database}"
+    return url.set(database=database, query=query)
+
+
+def _engine_options(url: URL, config: Settings, read_only: bool = False) -> dict:
+    """Engine keyword arguments shared by the sync and async engines"""
+    engine_kwargs = {"echo": config.db_echo}
+    execution_options = {}
+    if read_only:
+        config = replace(config, db_pool_size=config.db_read_pool_size)
+        if config.read_database_url:
+            # Lets callers tell reads that may lag the primary
+            execution_options["replica"] = True
+    
+    if url.get_backend_name() == "sqlite":
+        engine_kwargs["connect_args"] = {"check_same_thread": False}
+        memory_database = _is_memory_database(url)
+    else:
+        memory_database = False
+        engine_kwargs["pool_pre_ping"] = True
+        if read_only and url.get_backend_name() == "postgresql":
+            # Every transaction starts READ ONLY, even against a primary
+            execution_options["postgresql_readonly"] = True
+    if execution_options:
+        engine_kwargs["execution_options"] = execution_options
+    
+    if not memory_database:
+        engine_kwargs.update(
+            pool_size=config.db_pool_size,
+            max_overflow=config.db_max_overflow,
+            pool_timeout=config.db_pool_timeout,
+            pool_recycle=config.db_pool_recycle,
+        )
+    
+    return engine_kwargs
+
+
+def _install_sqlite_pragmas(
+    db_engine: Engine, url: URL, config: Settings, read_only: bool = False
+) -> None:
+    """Apply the configured pragmas to every new SQLite connection"""
+    pragmas = _sqlite_pragmas(config)
+    if _is_memory_database(url):
+        # WAL and mmap don't apply to in-memory databases
+        pragmas = {
+            name: value for name, value in pragmas.items()
+            if name not in ("journal_mode", "mmap_size")
+        }
+    if read_only:
+        # The writer owns the journal mode; reject writes on this connection
+        pragmas.pop("journal_mode", None)
+        pragmas["query_only"] = "ON"
+    
+    @event.listens_for(db_engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+def create_db_engine(config: Settings = settings) -> Engine:
+    """Create an engine for the configured database URL
+    
+    SQLite connections get WAL journaling and the configured pragmas on
+    connect; server databases such as Postgres get a sized connection pool.
+    """
+    url = make_url(config.database_url)
+    db_engine = create_engine(url, **_engine_options(url, config))
+    
+    if url.get_backend_name() == "sqlite":
+        _install_sqlite_pragmas(db_engine, url, config)
+    
+    return db_engine
+
+
+def create_read_engine(config: Settings = settings) -> Optional[Engine]:
+    """Create a read-only engine, or None when reads share the main engine
+    
+    SQLite files are opened with ``mode=ro`` and ``query_only``; a replica
+    URL gets its own pool and read-only transactions.
+    """
+    url = _read_url(config)
+    if url is None:
+        return None
+    
+    db_engine = create_engine(url, **_engine_options(url, config, read_only=True))
+    if url.get_backend_name() == "sqlite":
+        _install_sqlite_pragmas(db_engine, url, config, read_only=True)
+    
+    return db_engine
+
+
+def _create_async_engine(url: URL, config: Settings, read_only: bool = False) -> AsyncEngine:
+    """Swap the URL's driver for its async one and create the engine"""
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for {backend!r} databases")
+    
+    url = url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+    db_engine = create_async_engine(url, **_engine_options(url, config, read_only))
+    
+    if backend == "sqlite":
+        _install_sqlite_pragmas(db_engine.sync_engine, url, config, read_only)
+    
+    return db_engine
+
+
+def create_async_db_engine(config: Settings = settings) -> AsyncEngine:
+    """Create an async engine for the configured database URL
+    
+    The URL's driver is swapped for aiosqlite or asyncpg; pooling and
+    SQLite pragmas match the sync engine.
+    """
+    return _create_async_engine(make_url(config.database_url), config)
+
+
+def create_async_read_engine(config: Settings = settings) -> Optional[AsyncEngine]:
+    """Async counterpart of ``create_read_engine``"""
+    url = _read_url(config)
+    if url is None:
+        return None
+    return _create_async_engine(url, config, read_only=True)
+
+
+# Create engines; GET handlers read through read_engine
+engine = create_db_engine()
+read_engine = create_read_engine() or engine
 
 
 def create_db_and_tables():
-    """Create database tables"""
-    SQLModel.metadata.create_all(engine)
+    """Create database tables, upgrading those left by earlier versions"""
+    upgrade_schema(engine)
 
 
 def get_session():
@@ -24,5 +190,50 @@ def get_session():
         yield session
 
 
-# Dependency for database session
+def get_read_session():
+    """Get read-only database session"""
+    with Session(read_engine) as session:
+        yield session
+
+
+# Dependencies for database sessions
 SessionDep = Annotated[Session, Depends(get_session)]
+ReadSessionDep = Annotated[Session, Depends(get_read_session)]
+
+
+# Async engines, created on first use so the async driver stays optional
+_async_engine: Optional[AsyncEngine] = None
+_async_read_engine: Optional[AsyncEngine] = None
+
+
+def get_async_engine() -> AsyncEngine:
+    """Get the shared async engine"""
+    global _async_engine
+    if _async_engine is None:
+        _async_engine = create_async_db_engine()
+    return _async_engine
+
+
+def get_async_read_engine() -> AsyncEngine:
+    """Get the shared async read-only engine"""
+    global _async_read_engine
+    if _async_read_engine is None:
+        _async_read_engine = create_async_read_engine() or get_async_engine()
+    return _async_read_engine
+
+
+async def get_async_session():
+    """Get async database session"""
+    async with AsyncSession(get_async_engine(), expire_on_commit=False) as session:
+        yield session
+
+
+async def get_async_read_session():
+    """Get async read-only database session"""
+    async with AsyncSession(get_async_read_engine(), expire_on_commit=False) as session:
+        yield session
+
+
+# Dependencies for async database sessions
+AsyncSessionDep = Annotated[AsyncSession, Depends(get_async_session)]
+AsyncReadSessionDep = Annotated[AsyncSession, Depends(get_async_read_session)]
@@ -0,0 +1,202 @@
+"""
+Idempotency-Key bookkeeping for retried POST requests
+
+Run ``python -m app.database.idempotency`` (for example from cron) to purge
+expired keys.
+"""
+import asyncio
+import hashlib
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+from fastapi import HTTPException, Response
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.util import await_only
+from sqlmodel import Session, SQLModel, select, delete, update
+from app.config import settings
+from app.models import IdempotencyKey
+
+
+# How often a retry re-checks a key whose first request is still running
+POLL_INTERVAL = 0.05
+
+
+def _fingerprint(request: SQLModel) -> str:
+    """Hash of the request body, so a key can't be reused for a different request"""
+    return hashlib.blake2b(request.model_dump_json().encode(), digest_size=16).hexdigest()
+
+
+def _pause(session: Session, seconds: float) -> None:
+    """Sleep between polls without blocking the event loop on the async stack"""
+    if session.get_bind().dialect.is_async:
+        await_only(asyncio.sleep(seconds))
+    else:
+        time.sleep(seconds)
+
+
+def _claims(session: Session) -> Dict[Tuple[str, str], datetime]:
+    """Claim timestamps of the keys this session holds, by (scope, key)"""
+    return session.info.setdefault("idempotency_claims", {})
+
+
+def _insert_claim(session: Session, scope: str, key: str, fingerprint: str, now: datetime) -> bool:
+    """Insert the key unless it already exists; True if this request now holds it"""
+    dialect_insert = postgresql.insert if session.get_bind().dialect.name == "postgresql" else sqlite.insert
+    inserted = session.exec(
+        dialect_insert(IdempotencyKey)
+        .values(
+            scope=scope, key=key, fingerprint=fingerprint,
+            created_at=now, claimed_at=now,
+            expires_at=now + timedelta(seconds=settings.idempotency_ttl)
+        )
+        .on_conflict_do_nothing()
+        .returning(IdempotencyKey.key)
+    ).first()
+    return inserted is not None
+
+
+def _take_over_claim(session: Session, scope: str, key: str, claimed_at: datetime, now: datetime) -> bool:
+    """Move a stale claim to this request; False if another retry got there first"""
+    result = session.exec(
+        update(IdempotencyKey)
+        .where(
+            IdempotencyKey.scope == scope, IdempotencyKey.key == key,
+            IdempotencyKey.status_code.is_(None), IdempotencyKey.claimed_at == claimed_at
+        )
+        .values(claimed_at=now)
+    )
+    return result.rowcount == 1
+
+
+def claim_idempotency_key(
+    session: Session,
+    scope: str,
+    key: str,
+    request: SQLModel
+) -> Optional[Response]:
+    """Claim a key for this request, or return the stored response to replay
+    
+    The claim is committed right away, so a concurrent retry with the same
+    key finds it and waits for the first request to finish instead of
+    running the handler a second time. Waiting retries poll with a plain
+    SELECT. A claim older than ``idempotency_wait`` belongs to a request
+    that died before finishing, and the next retry takes it over.
+    """
+    fingerprint = _fingerprint(request)
+    deadline = time.monotonic() + settings.idempotency_wait
+    
+    while True:
+        now = datetime.utcnow()
+        record = session.exec(
+            select(
+                IdempotencyKey.fingerprint, IdempotencyKey.status_code, IdempotencyKey.response_body,
+                IdempotencyKey.claimed_at, IdempotencyKey.expires_at
+            )
+            .where(IdempotencyKey.scope == scope, IdempotencyKey.key == key)
+        ).first()
+        
+        if record is None or record.expires_at <= now:
+            if record is not None:
+                session.exec(
+                    delete(IdempotencyKey)
+                    .where(IdempotencyKey.scope == scope, IdempotencyKey.key == key)
+                    .where(IdempotencyKey.expires_at <= now)
+                )
+            claimed = _insert_claim(session, scope, key, fingerprint, now)
+            session.commit()
+            if claimed:
+                _claims(session)[scope, key] = now
+                return None
+            # Another request claimed it in between; look again
+            continue
+        
+        if record.fingerprint != fingerprint:
+            session.rollback()
+            raise HTTPException(
+                status_code=422,
+                detail="Idempotency-Key was already used with a different request"
+            )
+        if record.status_code is not None:
+            session.rollback()
+            return Response(
+                content=record.response_body,
+                status_code=record.status_code,
+                media_type="application/json",
+                headers={"Idempotent-Replayed": "true"}
+            )
+        if record.claimed_at <= now - timedelta(seconds=settings.idempotency_wait):
+            taken = _take_over_claim(session, scope, key, record.claimed_at, now)
+            session.commit()
+            if taken:
+                _claims(session)[scope, key] = now
+                return None
+            continue
+        
+        # End the read transaction so the next poll sees new commits
+        session.rollback()
+        if time.monotonic() >= deadline:
+            raise HTTPException(
+                status_code=409,
+                detail="A request with this Idempotency-Key is still in progress"
+            )
+        _pause(session, POLL_INTERVAL)
+
+
+def _held_claim(session: Session, scope: str, key: str):
+    """WHERE clause matching the key only while this session's claim on it stands"""
+    return (
+        IdempotencyKey.scope == scope, IdempotencyKey.key == key,
+        IdempotencyKey.claimed_at == _claims(session).pop((scope, key), None)
+    )
+
+
+def store_idempotent_response(
+    session: Session,
+    scope: str,
+    key: str,
+    status_code: int,
+    body: SQLModel
+) -> None:
+    """Record the response for a claimed key; committed with the caller's transaction
+    
+    If a retry took the claim over meanwhile, this request's work must not
+    commit as well, so it fails with a 409 instead.
+    """
+    result = session.exec(
+        update(IdempotencyKey)
+        .where(*_held_claim(session, scope, key))
+        .values(status_code=status_code, response_body=body.model_dump_json())
+    )
+    if result.rowcount != 1:
+        raise HTTPException(
+            status_code=409,
+            detail="A retry with this Idempotency-Key took over the request"
+        )
+
+
+def release_idempotency_key(session: Session, scope: str, key: str) -> None:
+    """Drop the claim of a request that failed, so the client can retry it
+    
+    A claim that a retry has since taken over is left alone.
+    """
+    session.rollback()
+    session.exec(delete(IdempotencyKey).where(*_held_claim(session, scope, key)))
+    session.commit()
+
+
+def purge_expired_idempotency_keys(session: Session) -> int:
+    """Delete expired keys and return how many were removed"""
+    result = session.exec(
+        delete(IdempotencyKey).where(IdempotencyKey.expires_at <= datetime.utcnow())
+    )
+    session.commit()
+    return result.rowcount
+
+
+if __name__ == "__main__":
+    from app.database.connection import engine
+    
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        purged = purge_expired_idempotency_keys(session)
+    print(f"Purged {purged} expired idempotency keys")
@@ -1,21 +1,39 @@
 """
 Test data initialization
+
+Run ``python -m app.database.init_data [fixture]`` to seed a database ahead
+of starting workers with ``SHOP_SEED_DATA=false``.
 """
+import argparse
 import json
-from typing import List
-from sqlmodel import Session
+from typing import Dict, Iterable, Iterator, List, Tuple
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlmodel import Session, SQLModel, insert, select
+from app.config import settings
 from app.models import (
     Customer, CustomerCreate,
     ShopItemCategory, CategoryCreate,
-    ShopItem, ShopItemCreate,
-    Order, OrderCreate, OrderItem
+    ShopItem, ShopItemCreate, ShopItemCategoryAssociation,
+    SeedMarker
 )
+from app.utils.bulk import BULK_CHUNK_SIZE, chunked
+
+
+# Marker row recording that the fixture data has been loaded
+SEED_NAME = "test_data"
+
+# Times a worker re-checks the marker while another one holds SQLite's
+# write lock for longer than busy_timeout
+SEED_LOCK_RETRIES = 10
 
+# Sections in load order; shop items refer to categories by position
+FIXTURE_SECTIONS = ("customers", "categories", "shop_items")
 
-def load_test_data() -> dict:
+
+def load_test_data(path: str = "data/test_data.json") -> dict:
     """Load test data from JSON file"""
     try:
-        with open("data/test_data.json", "r") as f:
+        with open(path, "r") as f:
             return json.load(f)
     except FileNotFoundError:
         return get_default_test_data()
@@ -70,53 +88,143 @@ def get_default_test_data() -> dict:
     }
 
 
-def initialize_test_data(session: Session):
-    """Initialize database with test data"""
+def iter_fixture(path: str) -> Iterator[Tuple[str, dict]]:
+    """Records of a fixture file as (section, record) pairs, in file order
     
-    # Check if data already exists
-    existing_customers = session.query(Customer).first()
-    if existing_customers:
-        print("Test data already exists, skipping initialization")
+    A ``.json`` file holds one list per section and is read whole. A JSON
+    Lines file (``.jsonl``) holds one record per line, with its section
+    under ``"section"``, and is streamed so any size loads in flat memory.
+    """
+    if not path.endswith((".jsonl", ".ndjson")):
+        data = load_test_data(path)
+        for section in FIXTURE_SECTIONS:
+            for record in data.get(section, []):
+                yield section, record
         return
     
-    test_data = load_test_data()
-    
-    # Create customers
-    customers = []
-    for customer_data in test_data["customers"]:
-        customer = Customer(**customer_data)
-        session.add(customer)
-        customers.append(customer)
-    
-    session.commit()
+    with open(path, "r") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            section = record.pop("section", None)
+            if section not in FIXTURE_SECTIONS:
+                raise ValueError(f"{path}:{line_number}: unknown fixture section {section!r}")
+            yield section, record
+
+
+class _FixtureLoader:
+    """Buffers fixture records and writes them as chunked bulk inserts"""
     
-    # Create categories
-    categories = []
-    for category_data in test_data["categories"]:
-        category = ShopItemCategory(**category_data)
-        session.add(category)
-        categories.append(category)
+    def __init__(self, session: Session):
+        self.session = session
+        self.customers: List[Dict] = []
+        self.categories: List[Dict] = []
+        self.items: List[ShopItemCreate] = []
+        # Database IDs of the categories loaded so far, by fixture position
+        self.category_ids: List[int] = []
     
-    session.commit()
+    def add(self, section: str, record: dict) -> None:
+        if section == "customers":
+            self.customers.append(CustomerCreate(**record).model_dump())
+        elif section == "categories":
+            self.categories.append(CategoryCreate(**record).model_dump())
+        else:
+            self.items.append(ShopItemCreate(**record))
+        
+        if max(len(self.customers), len(self.categories), len(self.items)) >= BULK_CHUNK_SIZE:
+            self.flush()
     
-    # Create shop items
-    for item_data in test_data["shop_items"]:
-        category_ids = item_data.pop("category_ids", [])
-        item = ShopItem(**item_data)
-        session.add(item)
-        session.commit()
-        session.refresh(item)
+    def flush(self) -> None:
+        """Insert everything buffered, parents before the rows that refer to them"""
+        if self.customers:
+            self.session.exec(insert(Customer), params=self.customers)
+            self.customers = []
         
-        # Add categories through association table
-        from app.models.shop_item import ShopItemCategoryAssociation
-        for category_id in category_ids:
-            if category_id <= len(categories):
-                association = ShopItemCategoryAssociation(
-                    shop_item_id=item.id,
-                    category_id=categories[category_id - 1].id
-                )
-                session.add(association)
+        if self.categories:
+            self.category_ids.extend(self.session.exec(
+                insert(ShopItemCategory).returning(ShopItemCategory.id, sort_by_parameter_order=True),
+                params=self.categories
+            ).scalars().all())
+            self.categories = []
         
+        if self.items:
+            item_ids = self.session.exec(
+                insert(ShopItem).returning(ShopItem.id, sort_by_parameter_order=True),
+                params=[item.model_dump(exclude={"category_ids"}) for item in self.items]
+            ).scalars().all()
+            # Positions of categories not loaded yet are skipped
+            associations = [
+                {"shop_item_id": item_id, "category_id": self.category_ids[position - 1]}
+                for item_id, item in zip(item_ids, self.items)
+                for position in dict.fromkeys(item.category_ids or [])
+                if 1 <= position <= len(self.category_ids)
+            ]
+            for chunk in chunked(associations):
+                self.session.exec(insert(ShopItemCategoryAssociation), params=chunk)
+            self.items = []
+
+
+def seed_database(
+    session: Session,
+    records: Iterable[Tuple[str, dict]],
+    name: str = SEED_NAME
+) -> bool:
+    """Load fixture records in a single transaction, once per database
+    
+    The marker row is inserted first and commits with the data, so when
+    several workers start together one of them loads the records and the
+    rest wait on the marker's primary key, then skip. On SQLite a worker
+    that waits past ``busy_timeout`` gets "database is locked" instead; it
+    rolls back and checks the marker again, up to ``SEED_LOCK_RETRIES``
+    times. ``records`` is only read by the worker that seeds. Returns
+    whether this call loaded them.
+    """
+    for attempt in range(SEED_LOCK_RETRIES + 1):
+        if session.get(SeedMarker, name) is not None:
+            return False
+        
+        session.add(SeedMarker(name=name))
+        try:
+            session.flush()
+            break
+        except IntegrityError:
+            session.rollback()
+            return False
+        except OperationalError as error:
+            session.rollback()
+            if attempt == SEED_LOCK_RETRIES or "locked" not in str(error.orig):
+                raise
+    
+    # Databases seeded before the marker table existed
+    if session.exec(select(Customer.id).limit(1)).first() is not None:
         session.commit()
+        return False
+    
+    loader = _FixtureLoader(session)
+    for section, record in records:
+        loader.add(section, record)
+    loader.flush()
+    session.commit()
+    return True
+
+
+def initialize_test_data(session: Session, path: str = settings.seed_file) -> bool:
+    """Initialize database with test data"""
+    if seed_database(session, iter_fixture(path)):
+        print("Test data initialized successfully")
+        return True
+    print("Test data already exists, skipping initialization")
+    return False
+
+
+if __name__ == "__main__":
+    from app.database.connection import engine
+    
+    parser = argparse.ArgumentParser(description="Seed the configured database from a fixture file")
+    parser.add_argument("fixture", nargs="?", default=settings.seed_file, help="JSON or JSON Lines fixture")
+    args = parser.parse_args()
     
-    print("Test data initialized successfully")
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        initialize_test_data(session, args.fixture)
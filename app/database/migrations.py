@@ -0,0 +1,166 @@
+"""
+Startup upgrade of databases created by earlier versions
+
+``create_all`` creates missing tables along with their indexes, but never
+alters a table that already exists. ``upgrade_schema`` also adds the
+columns and indexes introduced since a table was created, backfilling
+them, so an existing ``shop.db`` keeps working after an upgrade. Every step
+checks the live schema first, so it is safe to run on each start, and the
+whole upgrade holds the database's write lock, so workers starting together
+run it one after another.
+"""
+import logging
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import Column, Engine, Index, Table, inspect, text
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.schema import CreateColumn, CreateIndex
+from sqlmodel import Session, SQLModel
+from app.database.rollups import backfill_rollups
+from app.models import DailySales
+
+
+logger = logging.getLogger(__name__)
+
+# Value existing rows take for NOT NULL columns without a scalar default
+COLUMN_DEFAULTS: Dict[Tuple[str, str], str] = {
+    ("order_items", "unit_price"): "0",
+    # Claims from before the column count as stale and can be taken over
+    ("idempotency_keys", "claimed_at"): "'1970-01-01 00:00:00'",
+}
+
+# Table constraints that come with a column; SQLite can't add them later
+COLUMN_CONSTRAINTS: Dict[Tuple[str, str], str] = {
+    ("shop_items", "stock"): "CONSTRAINT ck_shop_items_stock_non_negative CHECK (stock >= 0)",
+}
+
+# Fill columns added to existing rows, in this order, when the column was added
+BACKFILLS: List[Tuple[str, str, str]] = [
+    (
+        "order_items", "unit_price",
+        """
+        UPDATE order_items SET unit_price = COALESCE(
+            (SELECT price FROM shop_items WHERE shop_items.id = order_items.shop_item_id), 0
+        )
+        """
+    ),
+    (
+        "orders", "total_amount",
+        """
+        UPDATE orders SET total_amount = COALESCE((
+            SELECT ROUND(CAST(SUM(quantity * unit_price) AS NUMERIC), 2)
+            FROM order_items WHERE order_items.order_id = orders.id
+        ), 0)
+        """
+    ),
+    (
+        "orders", "item_count",
+        """
+        UPDATE orders SET item_count = COALESCE(
+            (SELECT SUM(quantity) FROM order_items WHERE order_items.order_id = orders.id), 0
+        )
+        """
+    ),
+]
+
+# Indexes replaced by later ones
+DROPPED_INDEXES = ["ix_customers_email"]
+
+# Postgres advisory lock key serializing upgrades across workers
+UPGRADE_LOCK_KEY = 0x73686F70
+
+# Times a worker retries taking SQLite's write lock while another one
+# upgrades for longer than busy_timeout
+UPGRADE_LOCK_RETRIES = 10
+
+
+def _lock_schema(connection) -> None:
+    """Hold the write lock until the transaction ends, before looking at the schema"""
+    if connection.dialect.name == "sqlite":
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+    elif connection.dialect.name == "postgresql":
+        connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": UPGRADE_LOCK_KEY})
+
+
+def _existing_rows_default(table: Table, column: Column) -> Optional[str]:
+    """SQL default for the rows already in the table when ``column`` is added"""
+    key = (table.name, column.name)
+    if key in COLUMN_DEFAULTS:
+        return COLUMN_DEFAULTS[key]
+    if column.nullable:
+        return None
+    if column.default is not None and column.default.is_scalar:
+        return repr(column.default.arg)
+    raise RuntimeError(f"No default for existing rows of {table.name}.{column.name}")
+
+
+def _add_missing_columns(connection, existing_tables: List[str]) -> List[Tuple[str, str]]:
+    """ALTER TABLE ... ADD COLUMN for every model column an existing table lacks"""
+    inspector = inspect(connection)
+    added = []
+    for table in SQLModel.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        columns = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in columns:
+                continue
+            key = (table.name, column.name)
+            ddl = str(CreateColumn(column).compile(dialect=connection.dialect))
+            default = _existing_rows_default(table, column)
+            if default is not None:
+                ddl += f" DEFAULT {default}"
+            if key in COLUMN_CONSTRAINTS:
+                ddl += f" {COLUMN_CONSTRAINTS[key]}"
+            connection.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {ddl}")
+            added.append(key)
+    return added
+
+
+def _create_index(connection, index: Index) -> None:
+    """Create an index unless it exists, refusing to start if rows break a unique one"""
+    try:
+        connection.execute(CreateIndex(index, if_not_exists=True))
+    except IntegrityError as error:
+        raise RuntimeError(
+            f"Existing rows in {index.table.name} violate the unique index {index.name}; "
+            "resolve the duplicates and restart"
+        ) from error
+
+
+def _upgrade(connection) -> None:
+    """Every upgrade step, in the caller's locked transaction"""
+    existing_tables = inspect(connection).get_table_names()
+    SQLModel.metadata.create_all(connection)
+    
+    added = _add_missing_columns(connection, existing_tables)
+    for table, column, statement in BACKFILLS:
+        if (table, column) in added:
+            connection.execute(text(statement))
+    if added:
+        logger.info("Added columns: %s", ", ".join(f"{table}.{column}" for table, column in added))
+    
+    for name in DROPPED_INDEXES:
+        connection.exec_driver_sql(f"DROP INDEX IF EXISTS {name}")
+    for table in SQLModel.metadata.sorted_tables:
+        if table.name in existing_tables:
+            for index in table.indexes:
+                _create_index(connection, index)
+    
+    # Orders that predate the sales rollups
+    if "orders" in existing_tables and DailySales.__tablename__ not in existing_tables:
+        with Session(bind=connection) as session:
+            backfill_rollups(session)
+
+
+def upgrade_schema(engine: Engine) -> None:
+    """Create missing tables, then add missing columns and indexes to existing ones"""
+    for attempt in range(UPGRADE_LOCK_RETRIES + 1):
+        try:
+            with engine.begin() as connection:
+                _lock_schema(connection)
+                _upgrade(connection)
+            return
+        except OperationalError as error:
+            # Another worker held the lock past busy_timeout; by now it may be done
+            if attempt == UPGRADE_LOCK_RETRIES or "locked" not in str(error.orig):
+                raise
@@ -0,0 +1,232 @@
+"""
+Daily sales rollups maintained by the order write paths
+
+Run ``python -m app.database.rollups`` to rebuild them from existing orders.
+"""
+from collections import defaultdict
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import Date, cast, func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel import Session, SQLModel, select, insert, delete
+from app.models import (
+    Order, OrderItem, OrderItemCategory, ShopItemCategoryAssociation,
+    DailySales, DailyItemSales, DailyCategorySales
+)
+
+
+# (shop_item_id, quantity, unit_price)
+OrderLine = Tuple[int, int, float]
+
+# (category_id, quantity, unit_price): an order line as counted towards one
+# of the categories snapshotted for it
+CategoryLine = Tuple[int, int, float]
+
+
+def snapshot_categories(session: Session, order_ids: List[int]) -> List[Tuple[int, int]]:
+    """Record the categories each item of these orders counts towards
+    
+    Taken from the items' current links in one INSERT ... SELECT; returns
+    the (order_item_id, category_id) pairs written.
+    """
+    return session.exec(
+        insert(OrderItemCategory).from_select(
+            ["order_item_id", "category_id"],
+            select(OrderItem.id, ShopItemCategoryAssociation.category_id)
+            .join(
+                ShopItemCategoryAssociation,
+                ShopItemCategoryAssociation.shop_item_id == OrderItem.shop_item_id
+            )
+            .where(OrderItem.order_id.in_(order_ids))
+        ).returning(OrderItemCategory.order_item_id, OrderItemCategory.category_id)
+    ).all()
+
+
+def release_categories(session: Session, order_ids: List[int]) -> List[Tuple[int, int]]:
+    """Delete the category snapshot of these orders' items; returns the pairs it held"""
+    return session.exec(
+        delete(OrderItemCategory)
+        .where(OrderItemCategory.order_item_id.in_(
+            select(OrderItem.id).where(OrderItem.order_id.in_(order_ids))
+        ))
+        .returning(OrderItemCategory.order_item_id, OrderItemCategory.category_id)
+    ).all()
+
+
+def category_lines(pairs: Iterable[Tuple[int, int]], lines: Dict[int, OrderLine]) -> List[CategoryLine]:
+    """Category lines for snapshot pairs, given each order item's line by order item ID"""
+    return [
+        (category_id, lines[order_item_id][1], lines[order_item_id][2])
+        for order_item_id, category_id in pairs
+    ]
+
+
+def _upsert(session: Session, model: type, key: List[str], rows: List[Dict]) -> None:
+    """Add each row's counters onto the matching rollup row, creating it if needed"""
+    if not rows:
+        return
+    
+    dialect_insert = postgresql.insert if session.get_bind().dialect.name == "postgresql" else sqlite.insert
+    statement = dialect_insert(model)
+    counters = [name for name in rows[0] if name not in key]
+    statement = statement.on_conflict_do_update(
+        index_elements=key,
+        set_={name: getattr(model, name) + getattr(statement.excluded, name) for name in counters}
+    )
+    session.exec(statement, params=rows)
+
+
+def _add_lines(
+    day: date,
+    lines: Iterable[Tuple[int, int, float]],
+    sign: int,
+    totals: Dict[Tuple[date, int], List]
+) -> None:
+    """Accumulate signed [quantity, revenue] per (day, shop item or category)"""
+    for key, quantity, unit_price in lines:
+        totals[day, key][0] += sign * quantity
+        totals[day, key][1] += sign * quantity * unit_price
+
+
+def _nonzero(totals: Dict[Tuple[date, int], List]) -> Dict[Tuple[date, int], List]:
+    """Drop the totals that cancelled out"""
+    return {key: value for key, value in totals.items() if value[0] or value[1]}
+
+
+def _apply_changes(
+    session: Session,
+    order_counts: Dict[date, int],
+    item_totals: Dict[Tuple[date, int], List],
+    category_totals: Dict[Tuple[date, int], List]
+) -> None:
+    """Add signed order counts and [quantity, revenue] per (day, shop item) and
+    (day, category) onto the rollups
+    
+    One upsert per rollup table, however many days the changes cover.
+    """
+    item_totals = _nonzero(item_totals)
+    category_totals = _nonzero(category_totals)
+    
+    day_totals: Dict[date, List] = defaultdict(lambda: [0, 0.0])
+    for (day, _), (quantity, revenue) in item_totals.items():
+        day_totals[day][0] += quantity
+        day_totals[day][1] += revenue
+    days = sorted({day for day, count in order_counts.items() if count} | set(day_totals))
+    if days:
+        _upsert(session, DailySales, ["day"], [
+            {
+                "day": day,
+                "order_count": order_counts.get(day, 0),
+                "item_count": day_totals[day][0],
+                "revenue": day_totals[day][1],
+            }
+            for day in days
+        ])
+    
+    _upsert(session, DailyItemSales, ["shop_item_id", "day"], [
+        {"day": day, "shop_item_id": shop_item_id, "quantity": quantity, "revenue": revenue}
+        for (day, shop_item_id), (quantity, revenue) in sorted(item_totals.items())
+    ])
+    _upsert(session, DailyCategorySales, ["category_id", "day"], [
+        {"day": day, "category_id": category_id, "quantity": quantity, "revenue": revenue}
+        for (day, category_id), (quantity, revenue) in sorted(category_totals.items())
+    ])
+
+
+def record_order_change(
+    session: Session,
+    day: date,
+    before: Optional[List[OrderLine]],
+    after: Optional[List[OrderLine]],
+    categories_before: Iterable[CategoryLine] = (),
+    categories_after: Iterable[CategoryLine] = ()
+) -> None:
+    """Apply the difference between an order's old and new lines to the rollups
+    
+    ``before`` is None for a new order and ``after`` is None for a deleted
+    one; the category lines come from the snapshot taken when the lines were
+    written. Runs in the caller's transaction so the rollups commit with the
+    order.
+    """
+    item_totals: Dict[Tuple[date, int], List] = defaultdict(lambda: [0, 0.0])
+    _add_lines(day, before or [], -1, item_totals)
+    _add_lines(day, after or [], 1, item_totals)
+    category_totals: Dict[Tuple[date, int], List] = defaultdict(lambda: [0, 0.0])
+    _add_lines(day, categories_before, -1, category_totals)
+    _add_lines(day, categories_after, 1, category_totals)
+    _apply_changes(
+        session, {day: (after is not None) - (before is not None)}, item_totals, category_totals
+    )
+
+
+def record_orders_removed(
+    session: Session,
+    orders: Iterable[Tuple[date, List[OrderLine], List[CategoryLine]]]
+) -> None:
+    """Take many orders, given as (day, lines, category lines), out of the rollups at once"""
+    order_counts: Dict[date, int] = defaultdict(int)
+    item_totals: Dict[Tuple[date, int], List] = defaultdict(lambda: [0, 0.0])
+    category_totals: Dict[Tuple[date, int], List] = defaultdict(lambda: [0, 0.0])
+    for day, lines, categories in orders:
+        order_counts[day] -= 1
+        _add_lines(day, lines, -1, item_totals)
+        _add_lines(day, categories, -1, category_totals)
+    _apply_changes(session, order_counts, item_totals, category_totals)
+
+
+def _order_day(session: Session):
+    """SQL expression for the calendar day of an order"""
+    if session.get_bind().dialect.name == "sqlite":
+        # SQLite stores dates as ISO text, which date() produces directly
+        return func.date(Order.created_at)
+    return cast(Order.created_at, Date)
+
+
+def backfill_rollups(session: Session) -> None:
+    """Rebuild every rollup table from orders and order_items
+    
+    Order lines without a category snapshot, from orders that predate it,
+    are first snapshotted with their item's current categories.
+    """
+    for model in (DailySales, DailyItemSales, DailyCategorySales):
+        session.exec(delete(model))
+    session.exec(insert(OrderItemCategory).from_select(
+        ["order_item_id", "category_id"],
+        select(OrderItem.id, ShopItemCategoryAssociation.category_id)
+        .join(
+            ShopItemCategoryAssociation,
+            ShopItemCategoryAssociation.shop_item_id == OrderItem.shop_item_id
+        )
+        .where(~OrderItem.id.in_(select(OrderItemCategory.order_item_id)))
+    ))
+    
+    day = _order_day(session)
+    line_revenue = func.sum(OrderItem.quantity * OrderItem.unit_price)
+    session.exec(insert(DailySales).from_select(
+        ["day", "order_count", "item_count", "revenue"],
+        select(day, func.count(), func.sum(Order.item_count), func.sum(Order.total_amount))
+        .group_by(day)
+    ))
+    session.exec(insert(DailyItemSales).from_select(
+        ["day", "shop_item_id", "quantity", "revenue"],
+        select(day, OrderItem.shop_item_id, func.sum(OrderItem.quantity), line_revenue)
+        .join(Order, Order.id == OrderItem.order_id)
+        .group_by(day, OrderItem.shop_item_id)
+    ))
+    session.exec(insert(DailyCategorySales).from_select(
+        ["day", "category_id", "quantity", "revenue"],
+        select(day, OrderItemCategory.category_id, func.sum(OrderItem.quantity), line_revenue)
+        .join(Order, Order.id == OrderItem.order_id)
+        .join(OrderItemCategory, OrderItemCategory.order_item_id == OrderItem.id)
+        .group_by(day, OrderItemCategory.category_id)
+    ))
+    session.commit()
+
+
+if __name__ == "__main__":
+    from app.database.connection import engine
+    
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        backfill_rollups(session)
+    print("Sales rollups rebuilt")
@@ -0,0 +1,92 @@
+"""
+Full-text search index over shop items (SQLite FTS5)
+"""
+import re
+from typing import Optional
+from sqlalchemy import Float, String, column, event, literal_column, table
+from sqlmodel import SQLModel
+
+
+SEARCH_TABLE = "shop_items_fts"
+
+# External-content index: the text lives in shop_items and triggers keep the
+# index in step with every write, including bulk inserts
+_SEARCH_DDL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+        title, description,
+        content='shop_items', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS shop_items_fts_insert AFTER INSERT ON shop_items BEGIN
+        INSERT INTO {SEARCH_TABLE}(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS shop_items_fts_delete AFTER DELETE ON shop_items BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS shop_items_fts_update
+    AFTER UPDATE OF title, description ON shop_items BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO {SEARCH_TABLE}(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+]
+
+# FTS table and auxiliary functions for use in select() statements
+search_table = table(SEARCH_TABLE, column("rowid"))
+# BM25 is lower-is-better; title matches weigh ten times description matches
+search_rank = literal_column(f"bm25({SEARCH_TABLE}, 10.0, 1.0)", Float)
+search_snippet = literal_column(
+    f"snippet({SEARCH_TABLE}, -1, '<mark>', '</mark>', '…', 12)", String
+)
+search_match = literal_column(SEARCH_TABLE).op("MATCH")
+
+
+def search_supported(dialect_name: str) -> bool:
+    """Whether the database backend has the FTS5 index"""
+    return dialect_name == "sqlite"
+
+
+def build_match_query(q: str) -> Optional[str]:
+    """Turn free text into an FTS5 query, or None if it has no searchable terms
+    
+    Every term is quoted so user input can't inject FTS5 operators; an item
+    matches when it contains all of the terms.
+    """
+    terms = re.findall(r"\w+", q)
+    if not terms:
+        return None
+    return " ".join(f'"{term}"' for term in terms)
+
+
+def _create_search_index(target, connection, **kw) -> None:
+    """Create the FTS5 table and its triggers, indexing any existing items"""
+    if not search_supported(connection.dialect.name):
+        return
+    exists = connection.exec_driver_sql(
+        f"SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = '{SEARCH_TABLE}'"
+    ).first()
+    for statement in _SEARCH_DDL:
+        connection.exec_driver_sql(statement)
+    if not exists:
+        connection.exec_driver_sql(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')")
+
+
+def _drop_search_index(target, connection, **kw) -> None:
+    """Drop the FTS5 table along with shop_items"""
+    if search_supported(connection.dialect.name):
+        connection.exec_driver_sql(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+
+
+event.listen(SQLModel.metadata, "after_create", _create_search_index)
+event.listen(SQLModel.metadata, "before_drop", _drop_search_index)
@@ -0,0 +1,36 @@
+"""
+Soft delete for customers, categories and shop items
+
+Reads of these tables filter on ``deleted_at IS NULL``; the customer email
+and item price and title indexes are partial on it, while categories are
+small and only read by primary key or in ID order.
+
+With ``SHOP_SOFT_DELETE`` deletes set ``deleted_at`` instead of removing the
+row, so order history keeps its customers and items. Otherwise they are
+real DELETEs, refused for customers and items that have orders. Either way
+the join-table rows go with the deleted row.
+"""
+from datetime import datetime
+from typing import List
+from sqlmodel import Session, delete, update
+from app.config import RuntimeSetting
+
+
+soft_delete = RuntimeSetting("soft_delete")
+
+
+def delete_rows(session: Session, model: type, condition) -> List[int]:
+    """Delete the live rows matching ``condition`` in one statement; returns their IDs
+    
+    In soft-delete mode the rows are stamped with ``deleted_at`` instead.
+    """
+    if soft_delete.value:
+        statement = update(model).values(deleted_at=datetime.utcnow())
+    else:
+        statement = delete(model)
+    return session.exec(
+        statement
+        .where(condition, model.deleted_at.is_(None))
+        .returning(model.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
@@ -2,9 +2,17 @@
 Main FastAPI application
 """
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+from app.config import settings
 from app.database import create_db_and_tables, get_session
+from app.database.idempotency import purge_expired_idempotency_keys
 from app.database.init_data import initialize_test_data
-from app.routers import customers_router, categories_router, shop_items_router, orders_router
+from app.routers import (
+    customers_router, categories_router, shop_items_router, orders_router,
+    analytics_router, admin_router, make_async_router
+)
+from app.utils.cache import catalog_cache
+from app.utils.metrics import MetricsMiddleware, install_query_metrics, metrics
 
 
 # Create FastAPI app
@@ -16,12 +24,21 @@ app = FastAPI(
     redoc_url="/redoc"
 )
 
+# Per-route latency, status and query metrics, served at /metrics
+app.add_middleware(MetricsMiddleware, registry=metrics, expose_query_count=settings.debug)
+install_query_metrics()
+
 
-# Include routers
-app.include_router(customers_router, prefix="/api/v1")
-app.include_router(categories_router, prefix="/api/v1")
-app.include_router(shop_items_router, prefix="/api/v1")
-app.include_router(orders_router, prefix="/api/v1")
+# Include routers, served from the async database stack when enabled
+api_routers = [
+    customers_router, categories_router, shop_items_router, orders_router, analytics_router,
+    admin_router
+]
+if settings.db_async:
+    api_routers = [make_async_router(router) for router in api_routers]
+
+for api_router in api_routers:
+    app.include_router(api_router, prefix="/api/v1")
 
 
 @app.on_event("startup")
@@ -29,9 +46,11 @@ def on_startup():
     """Initialize database and test data on startup"""
     create_db_and_tables()
     
-    # Initialize test data
     with next(get_session()) as session:
-        initialize_test_data(session)
+        # Seeded once per database, whichever worker gets there first
+        if settings.seed_data:
+            initialize_test_data(session, settings.seed_file)
+        purge_expired_idempotency_keys(session)
 
 
 @app.get("/")
@@ -51,6 +70,18 @@ def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/cache/stats")
+def cache_stats():
+    """Catalog cache hit/miss counters"""
+    return catalog_cache.stats()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Request and query metrics in the Prometheus text format"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
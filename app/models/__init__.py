@@ -11,15 +11,27 @@ from .shop_item import (
     ShopItemCreate,
     ShopItemUpdate,
     ShopItemRead,
+    ShopItemSearchResult,
     ShopItemCategoryAssociation
 )
-from .order import Order, OrderCreate, OrderUpdate, OrderRead, OrderItem, OrderItemCreate
+from .order import (
+    Order, OrderCreate, OrderUpdate, OrderRead, OrderItem, OrderItemCreate, OrderItemCategory
+)
+from .analytics import (
+    DailySales, DailyItemSales, DailyCategorySales,
+    DailyRevenueRead, ItemSalesRead, CategorySalesRead
+)
+from .idempotency import IdempotencyKey
+from .seed import SeedMarker
 
 __all__ = [
     "Customer", "CustomerCreate", "CustomerUpdate", "CustomerRead",
     "ShopItemCategory", "CategoryCreate", "CategoryUpdate", "CategoryRead",
     "ShopItem", "ShopItemCreate", "ShopItemUpdate", "ShopItemRead",
-    "ShopItemCategoryAssociation",
+    "ShopItemSearchResult", "ShopItemCategoryAssociation",
     "Order", "OrderCreate", "OrderUpdate", "OrderRead",
-    "OrderItem", "OrderItemCreate"
+    "OrderItem", "OrderItemCreate", "OrderItemCategory",
+    "DailySales", "DailyItemSales", "DailyCategorySales",
+    "DailyRevenueRead", "ItemSalesRead", "CategorySalesRead",
+    "IdempotencyKey", "SeedMarker"
 ]
@@ -0,0 +1,70 @@
+"""
+Sales rollup and analytics report models
+"""
+from datetime import date
+from sqlmodel import SQLModel, Field
+
+
+class DailySales(SQLModel, table=True):
+    """Order totals per day"""
+    __tablename__ = "daily_sales"
+    __table_args__ = {"sqlite_with_rowid": False}
+    
+    day: date = Field(primary_key=True, description="Order day (UTC)")
+    order_count: int = Field(default=0, description="Orders placed that day")
+    item_count: int = Field(default=0, description="Units sold that day")
+    revenue: float = Field(default=0.0, description="Revenue that day")
+
+
+class DailyItemSales(SQLModel, table=True):
+    """Units sold and revenue per shop item and day
+    
+    Clustered on (shop_item_id, day) so per-item totals over a date range
+    are summed in key order instead of through a temporary sort.
+    """
+    __tablename__ = "daily_item_sales"
+    __table_args__ = {"sqlite_with_rowid": False}
+    
+    shop_item_id: int = Field(primary_key=True, description="Shop item ID")
+    day: date = Field(primary_key=True, description="Order day (UTC)")
+    quantity: int = Field(default=0, description="Units sold")
+    revenue: float = Field(default=0.0, description="Revenue from the item")
+
+
+class DailyCategorySales(SQLModel, table=True):
+    """Units sold and revenue per category and day
+    
+    An item in several categories counts towards each of them, as linked
+    when the order line was written (see OrderItemCategory).
+    """
+    __tablename__ = "daily_category_sales"
+    __table_args__ = {"sqlite_with_rowid": False}
+    
+    category_id: int = Field(primary_key=True, description="Category ID")
+    day: date = Field(primary_key=True, description="Order day (UTC)")
+    quantity: int = Field(default=0, description="Units sold")
+    revenue: float = Field(default=0.0, description="Revenue from the category")
+
+
+class DailyRevenueRead(SQLModel):
+    """Revenue report row"""
+    day: date
+    order_count: int
+    item_count: int
+    revenue: float
+
+
+class ItemSalesRead(SQLModel):
+    """Top items report row"""
+    shop_item_id: int
+    title: str
+    quantity: int
+    revenue: float
+
+
+class CategorySalesRead(SQLModel):
+    """Top categories report row"""
+    category_id: int
+    title: str
+    quantity: int
+    revenue: float
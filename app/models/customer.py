@@ -1,15 +1,18 @@
 """
 Customer data models
 """
+from datetime import datetime
 from typing import Optional
+from sqlalchemy import func
 from sqlmodel import SQLModel, Field
+from app.models.soft_delete import live_index
 
 
 class CustomerBase(SQLModel):
     """Base customer model with common fields"""
     name: str = Field(max_length=100, description="Customer's first name")
     surname: str = Field(max_length=100, description="Customer's last name") 
-    email: str = Field(max_length=255, index=True, description="Customer's email address")
+    email: str = Field(max_length=255, description="Customer's email address")
 
 
 class Customer(CustomerBase, table=True):
@@ -17,6 +20,12 @@ class Customer(CustomerBase, table=True):
     __tablename__ = "customers"
     
     id: Optional[int] = Field(default=None, primary_key=True, description="Customer ID")
+    deleted_at: Optional[datetime] = Field(default=None, description="Set when the customer is soft deleted")
+
+
+# One live customer per email, whatever its case; lookups compare lower(email)
+EMAIL_INDEX = "ix_customers_email_lower"
+live_index(EMAIL_INDEX, func.lower(Customer.email), unique=True)
 
 
 class CustomerCreate(CustomerBase):
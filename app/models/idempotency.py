@@ -0,0 +1,27 @@
+"""
+Idempotency key data model
+"""
+from typing import Optional
+from datetime import datetime
+from sqlalchemy import Index
+from sqlmodel import SQLModel, Field
+
+
+class IdempotencyKey(SQLModel, table=True):
+    """A client-supplied Idempotency-Key and the response it produced"""
+    __tablename__ = "idempotency_keys"
+    # Serves the purge of expired keys
+    __table_args__ = (
+        Index("ix_idempotency_keys_expires_at", "expires_at"),
+    )
+    
+    scope: str = Field(primary_key=True, max_length=50, description="Endpoint the key was used on")
+    key: str = Field(primary_key=True, max_length=255, description="Client-supplied key")
+    fingerprint: str = Field(max_length=64, description="Hash of the request body")
+    status_code: Optional[int] = Field(default=None, description="Response status; null while the first request runs")
+    response_body: Optional[str] = Field(default=None, description="Response JSON replayed to retries")
+    created_at: datetime = Field(default_factory=datetime.utcnow, description="When the key was first seen")
+    claimed_at: datetime = Field(
+        default_factory=datetime.utcnow, description="When the request now running with the key claimed it"
+    )
+    expires_at: datetime = Field(description="When the key may be purged and reused")
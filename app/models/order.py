@@ -3,12 +3,14 @@ Order and order item data models
 """
 from typing import Optional, List
 from datetime import datetime
-from sqlmodel import SQLModel, Field
+from sqlalchemy import Index
+from sqlmodel import SQLModel, Field, Relationship
 
 
 class OrderItemBase(SQLModel):
     """Base order item model"""
-    shop_item_id: int = Field(foreign_key="shop_items.id", description="Shop item ID")
+    # Indexed for the "was this item ever ordered" check on deletes
+    shop_item_id: int = Field(foreign_key="shop_items.id", index=True, description="Shop item ID")
     quantity: int = Field(gt=0, description="Item quantity (must be positive)")
 
 
@@ -17,7 +19,22 @@ class OrderItem(OrderItemBase, table=True):
     __tablename__ = "order_items"
     
     id: Optional[int] = Field(default=None, primary_key=True, description="Order item ID")
-    order_id: int = Field(foreign_key="orders.id", description="Order ID")
+    order_id: int = Field(foreign_key="orders.id", index=True, description="Order ID")
+    unit_price: float = Field(ge=0, description="Shop item price when the order was placed")
+
+
+class OrderItemCategory(SQLModel, table=True):
+    """A category an order item counted towards when it was written
+    
+    Snapshotted from the item's links, so the category rollups take back
+    exactly what the line added even after the item changes categories.
+    """
+    __tablename__ = "order_item_categories"
+    __table_args__ = {"sqlite_with_rowid": False}
+    
+    order_item_id: int = Field(foreign_key="order_items.id", primary_key=True, description="Order item ID")
+    # No foreign key: deleting a category keeps its sales history
+    category_id: int = Field(primary_key=True, description="Category ID")
 
 
 class OrderItemCreate(OrderItemBase):
@@ -29,6 +46,7 @@ class OrderItemRead(OrderItemBase):
     """Order item read model"""
     id: int
     order_id: int
+    unit_price: float
 
 
 class OrderBase(SQLModel):
@@ -39,9 +57,22 @@ class OrderBase(SQLModel):
 class Order(OrderBase, table=True):
     """Order database model"""
     __tablename__ = "orders"
+    # Serves one customer's order history in keyset order
+    __table_args__ = (
+        Index("ix_orders_customer_id_created_at_id", "customer_id", "created_at", "id"),
+    )
     
     id: Optional[int] = Field(default=None, primary_key=True, description="Order ID")
     created_at: Optional[datetime] = Field(default_factory=datetime.utcnow, description="Order creation timestamp")
+    
+    # Kept in step with the order items on every write, so reports never join
+    total_amount: float = Field(default=0.0, description="Sum of unit_price * quantity over the items")
+    item_count: int = Field(default=0, description="Total quantity over the items")
+    
+    # Loaded with one extra SELECT ... IN per batch of orders, never per row
+    items: List[OrderItem] = Relationship(
+        sa_relationship_kwargs={"lazy": "selectin", "cascade": "all, delete-orphan"}
+    )
 
 
 class OrderCreate(OrderBase):
@@ -59,4 +90,6 @@ class OrderRead(OrderBase):
     """Order read model with relationships"""
     id: int
     created_at: datetime
+    total_amount: float
+    item_count: int
     items: List[OrderItemRead] = []
@@ -0,0 +1,13 @@
+"""
+Seed marker data model
+"""
+from datetime import datetime
+from sqlmodel import SQLModel, Field
+
+
+class SeedMarker(SQLModel, table=True):
+    """A fixture dataset that has been loaded into this database"""
+    __tablename__ = "seed_markers"
+    
+    name: str = Field(primary_key=True, max_length=100, description="Dataset that was loaded")
+    seeded_at: datetime = Field(default_factory=datetime.utcnow, description="When it was loaded")
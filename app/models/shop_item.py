@@ -1,8 +1,11 @@
 """
 Shop item and category data models
 """
+from datetime import datetime
 from typing import Optional, List
-from sqlmodel import SQLModel, Field
+from sqlalchemy import CheckConstraint, Index
+from sqlmodel import SQLModel, Field, Relationship
+from app.models.soft_delete import live_index
 
 
 class CategoryBase(SQLModel):
@@ -16,6 +19,8 @@ class ShopItemCategory(CategoryBase, table=True):
     __tablename__ = "shop_item_categories"
     
     id: Optional[int] = Field(default=None, primary_key=True, description="Category ID")
+    version: int = Field(default=1, description="Row version, bumped on every update")
+    deleted_at: Optional[datetime] = Field(default=None, description="Set when the category is soft deleted")
 
 
 class CategoryCreate(CategoryBase):
@@ -37,6 +42,10 @@ class CategoryRead(CategoryBase):
 class ShopItemCategoryAssociation(SQLModel, table=True):
     """Association table for many-to-many relationship between shop items and categories"""
     __tablename__ = "shop_item_category_association"
+    # The primary key leads with shop_item_id; category filters need the reverse
+    __table_args__ = (
+        Index("ix_shop_item_category_association_category_item", "category_id", "shop_item_id"),
+    )
     
     shop_item_id: Optional[int] = Field(default=None, foreign_key="shop_items.id", primary_key=True)
     category_id: Optional[int] = Field(default=None, foreign_key="shop_item_categories.id", primary_key=True)
@@ -47,18 +56,40 @@ class ShopItemBase(SQLModel):
     title: str = Field(max_length=200, description="Item title")
     description: str = Field(description="Item description")
     price: float = Field(gt=0, description="Item price (must be positive)")
+    stock: Optional[int] = Field(default=None, ge=0, description="Units on hand; null if stock isn't tracked")
 
 
 class ShopItem(ShopItemBase, table=True):
     """Shop item database model"""
     __tablename__ = "shop_items"
+    # Serve the price range filter and the keyset order of each sort option
+    __table_args__ = (
+        live_index("ix_shop_items_price_id", "price", "id"),
+        live_index("ix_shop_items_title_id", "title", "id"),
+        # Orders decrement stock conditionally; this is the backstop
+        CheckConstraint("stock >= 0", name="ck_shop_items_stock_non_negative"),
+    )
     
     id: Optional[int] = Field(default=None, primary_key=True, description="Item ID")
+    version: int = Field(default=1, description="Row version, bumped on every update")
+    deleted_at: Optional[datetime] = Field(default=None, description="Set when the item is soft deleted")
+    
+    # Loaded with one extra SELECT ... IN per batch of items, never per row
+    categories: List[ShopItemCategory] = Relationship(
+        link_model=ShopItemCategoryAssociation,
+        sa_relationship_kwargs={"lazy": "selectin"}
+    )
+
+
+# Category IDs per item write; one lookup chunk, so the write's query count is fixed
+MAX_CATEGORY_IDS = 1000
 
 
 class ShopItemCreate(ShopItemBase):
     """Shop item creation model"""
-    category_ids: Optional[List[int]] = Field(default=[], description="List of category IDs")
+    category_ids: Optional[List[int]] = Field(
+        default=[], max_length=MAX_CATEGORY_IDS, description="List of category IDs"
+    )
 
 
 class ShopItemUpdate(ShopItemBase):
@@ -66,10 +97,19 @@ class ShopItemUpdate(ShopItemBase):
     title: Optional[str] = Field(default=None, max_length=200)
     description: Optional[str] = Field(default=None)
     price: Optional[float] = Field(default=None, gt=0)
-    category_ids: Optional[List[int]] = Field(default=None, description="List of category IDs")
+    stock: Optional[int] = Field(default=None, ge=0)
+    category_ids: Optional[List[int]] = Field(
+        default=None, max_length=MAX_CATEGORY_IDS, description="List of category IDs"
+    )
 
 
 class ShopItemRead(ShopItemBase):
     """Shop item read model with ID and categories"""
     id: int
     categories: List[CategoryRead] = []
+
+
+class ShopItemSearchResult(ShopItemRead):
+    """Shop item search hit with its BM25 rank and a highlighted snippet"""
+    rank: float = Field(description="BM25 score; lower is a better match")
+    snippet: str = Field(description="Matching text with terms wrapped in <mark> tags")
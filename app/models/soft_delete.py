@@ -0,0 +1,15 @@
+"""
+Partial indexes over rows that aren't soft deleted
+"""
+from sqlalchemy import Index, text
+
+
+def live_index(name: str, *expressions, unique: bool = False) -> Index:
+    """Index only the rows whose ``deleted_at`` is null
+    
+    Reads filter on ``deleted_at IS NULL`` (see app.database.soft_delete),
+    so they can use these indexes, soft-deleted rows cost nothing in them,
+    and a unique one lets a deleted row's value be reused.
+    """
+    live = text("deleted_at IS NULL")
+    return Index(name, *expressions, unique=unique, sqlite_where=live, postgresql_where=live)
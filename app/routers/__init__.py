@@ -5,5 +5,11 @@ from .customers import router as customers_router
 from .categories import router as categories_router
 from .shop_items import router as shop_items_router
 from .orders import router as orders_router
+from .analytics import router as analytics_router
+from .admin import router as admin_router
+from .async_routes import make_async_router
 
-__all__ = ["customers_router", "categories_router", "shop_items_router", "orders_router"]
+__all__ = [
+    "customers_router", "categories_router", "shop_items_router", "orders_router",
+    "analytics_router", "admin_router", "make_async_router"
+]
@@ -0,0 +1,24 @@
+"""
+Operational endpoints for diagnosing performance
+"""
+from typing import List
+from fastapi import APIRouter, Query
+from app.utils.query_log import SlowQuery, slow_query_log
+
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+@router.get("/slow-queries", response_model=List[SlowQuery])
+def list_slow_queries(
+    limit: int = Query(100, ge=1, le=1000, description="Number of entries to return")
+) -> List[SlowQuery]:
+    """Most recent statements over the slow-query threshold, newest first"""
+    return slow_query_log.entries()[:limit]
+
+
+@router.delete("/slow-queries")
+def clear_slow_queries() -> dict:
+    """Empty the slow-query log"""
+    slow_query_log.clear()
+    return {"message": "Slow query log cleared"}
@@ -0,0 +1,119 @@
+"""
+Sales analytics endpoints, answered from the daily rollup tables
+"""
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Tuple
+from fastapi import APIRouter, HTTPException, Query
+from sqlalchemy import and_
+from sqlmodel import select, func
+from app.database import ReadSessionDep
+from app.models import (
+    ShopItem, ShopItemCategory,
+    DailySales, DailyItemSales, DailyCategorySales,
+    DailyRevenueRead, ItemSalesRead, CategorySalesRead
+)
+from app.utils.query_log import query_budget
+
+
+router = APIRouter(prefix="/analytics", tags=["analytics"])
+
+# Reports cover the last 90 days unless a range is given
+DEFAULT_REPORT_DAYS = 90
+
+
+def _date_range(start: Optional[date], end: Optional[date]) -> Tuple[date, date]:
+    """Resolve an inclusive report range, defaulting to the last 90 days"""
+    end = end or datetime.utcnow().date()
+    start = start or end - timedelta(days=DEFAULT_REPORT_DAYS - 1)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    return start, end
+
+
+@router.get("/revenue", response_model=List[DailyRevenueRead])
+@query_budget(2)
+def revenue_by_day(
+    session: ReadSessionDep,
+    start: Optional[date] = Query(None, description="First day (inclusive), defaults to 90 days ago"),
+    end: Optional[date] = Query(None, description="Last day (inclusive), defaults to today")
+) -> List[DailyRevenueRead]:
+    """Orders, units sold and revenue per day"""
+    start, end = _date_range(start, end)
+    rows = session.exec(
+        select(DailySales)
+        .where(DailySales.day >= start, DailySales.day <= end, DailySales.order_count > 0)
+        .order_by(DailySales.day)
+    ).all()
+    return [
+        DailyRevenueRead(
+            day=row.day, order_count=row.order_count,
+            item_count=row.item_count, revenue=round(row.revenue, 2)
+        )
+        for row in rows
+    ]
+
+
+@router.get("/top-items", response_model=List[ItemSalesRead])
+@query_budget(2)
+def top_items(
+    session: ReadSessionDep,
+    start: Optional[date] = Query(None, description="First day (inclusive), defaults to 90 days ago"),
+    end: Optional[date] = Query(None, description="Last day (inclusive), defaults to today"),
+    limit: int = Query(10, ge=1, le=100, description="Number of items to return")
+) -> List[ItemSalesRead]:
+    """Best-selling shop items by revenue
+    
+    Driven from the catalog so each item's date range is a primary key
+    seek; deleted items drop out here but still count in /revenue.
+    """
+    start, end = _date_range(start, end)
+    quantity = func.sum(DailyItemSales.quantity)
+    revenue = func.sum(DailyItemSales.revenue)
+    rows = session.exec(
+        select(ShopItem.id, ShopItem.title, quantity, revenue)
+        .join(DailyItemSales, and_(
+            DailyItemSales.shop_item_id == ShopItem.id,
+            DailyItemSales.day >= start,
+            DailyItemSales.day <= end
+        ))
+        .where(ShopItem.deleted_at.is_(None))
+        .group_by(ShopItem.id)
+        .having(quantity > 0)
+        .order_by(revenue.desc(), ShopItem.id)
+        .limit(limit)
+    ).all()
+    return [
+        ItemSalesRead(shop_item_id=item_id, title=title, quantity=units, revenue=round(amount, 2))
+        for item_id, title, units, amount in rows
+    ]
+
+
+@router.get("/top-categories", response_model=List[CategorySalesRead])
+@query_budget(2)
+def top_categories(
+    session: ReadSessionDep,
+    start: Optional[date] = Query(None, description="First day (inclusive), defaults to 90 days ago"),
+    end: Optional[date] = Query(None, description="Last day (inclusive), defaults to today"),
+    limit: int = Query(10, ge=1, le=100, description="Number of categories to return")
+) -> List[CategorySalesRead]:
+    """Best-selling categories by revenue; deleted categories drop out"""
+    start, end = _date_range(start, end)
+    quantity = func.sum(DailyCategorySales.quantity)
+    revenue = func.sum(DailyCategorySales.revenue)
+    rows = session.exec(
+        select(ShopItemCategory.id, ShopItemCategory.title, quantity, revenue)
+        .join(DailyCategorySales, and_(
+            DailyCategorySales.category_id == ShopItemCategory.id,
+            DailyCategorySales.day >= start,
+            DailyCategorySales.day <= end
+        ))
+        .where(ShopItemCategory.deleted_at.is_(None))
+        .group_by(ShopItemCategory.id)
+        .having(quantity > 0)
+        .order_by(revenue.desc(), ShopItemCategory.id)
+        .limit(limit)
+    ).all()
+    return [
+        CategorySalesRead(category_id=category_id, title=title, quantity=units, revenue=round(amount, 2))
+        for category_id, title, units, amount in rows
+    ]
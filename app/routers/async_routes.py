@@ -0,0 +1,106 @@
+"""
+Async variants of the CRUD routers
+
+Each handler keeps a single implementation written against a sync
+``Session``. The async variant receives an ``AsyncSession`` and runs the
+same handler through ``AsyncSession.run_sync``, so the database I/O goes
+through aiosqlite/asyncpg on the event loop instead of FastAPI's threadpool.
+Handlers on ``ReadSessionDep`` get the async read-only session.
+"""
+import functools
+import inspect
+from typing import Any, Callable, Optional
+from fastapi import APIRouter, Response
+from fastapi.datastructures import DefaultPlaceholder
+from fastapi.responses import StreamingResponse
+from fastapi.routing import APIRoute
+from pydantic import TypeAdapter
+from app.database import SessionDep, ReadSessionDep, AsyncSessionDep, AsyncReadSessionDep
+
+
+# Async dependency standing in for each sync session dependency
+ASYNC_SESSION_DEPS = [(SessionDep, AsyncSessionDep), (ReadSessionDep, AsyncReadSessionDep)]
+
+
+def _async_session_dep(annotation: Any) -> Optional[Any]:
+    """The async dependency for a session parameter's annotation, if it is one"""
+    for sync_dep, async_dep in ASYNC_SESSION_DEPS:
+        if annotation is sync_dep:
+            return async_dep
+    return None
+
+
+def _make_async_endpoint(endpoint: Callable, response_model: Optional[Any]) -> Callable:
+    """Wrap a sync handler so it runs on an async session"""
+    signature = inspect.signature(endpoint)
+    session_params = [
+        name for name, param in signature.parameters.items()
+        if _async_session_dep(param.annotation) is not None
+    ]
+    if len(session_params) != 1:
+        raise ValueError(f"{endpoint.__name__} must take exactly one session parameter")
+    session_param = session_params[0]
+    
+    adapter = TypeAdapter(response_model) if response_model is not None else None
+    
+    def call_with_sync_session(sync_session, kwargs: dict) -> Any:
+        result = endpoint(**kwargs, **{session_param: sync_session})
+        # Serialize while still inside the session's greenlet so relationship
+        # loads never happen on the event loop
+        if adapter is not None and not isinstance(result, Response):
+            result = adapter.validate_python(result, from_attributes=True)
+        return result
+    
+    @functools.wraps(endpoint)
+    async def async_endpoint(**kwargs):
+        session = kwargs.pop(session_param)
+        return await session.run_sync(call_with_sync_session, kwargs)
+    
+    async_endpoint.__signature__ = signature.replace(parameters=[
+        param.replace(annotation=_async_session_dep(param.annotation)) if name == session_param else param
+        for name, param in signature.parameters.items()
+    ])
+    return async_endpoint
+
+
+def make_async_router(router: APIRouter) -> APIRouter:
+    """Build a router whose database-backed routes use async sessions"""
+    async_router = APIRouter()
+    
+    for route in router.routes:
+        if not isinstance(route, APIRoute):
+            async_router.routes.append(route)
+            continue
+        
+        uses_session = any(
+            _async_session_dep(param.annotation) is not None
+            for param in inspect.signature(route.endpoint).parameters.values()
+        )
+        # Streaming exports iterate their own sync session in the threadpool
+        response_class = route.response_class
+        if isinstance(response_class, DefaultPlaceholder):
+            response_class = response_class.value
+        streams = issubclass(response_class, StreamingResponse)
+        
+        endpoint = (
+            _make_async_endpoint(route.endpoint, route.response_model)
+            if uses_session and not streams else route.endpoint
+        )
+        
+        async_router.add_api_route(
+            route.path,
+            endpoint,
+            response_model=route.response_model,
+            status_code=route.status_code,
+            tags=route.tags,
+            dependencies=route.dependencies,
+            summary=route.summary,
+            description=route.description,
+            response_description=route.response_description,
+            responses=route.responses,
+            methods=route.methods,
+            name=route.name,
+            response_class=route.response_class,
+        )
+    
+    return async_router
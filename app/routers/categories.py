@@ -1,74 +1,203 @@
 """
 Category CRUD endpoints
 """
-from typing import List
-from fastapi import APIRouter, HTTPException, Query
-from sqlmodel import select
-from app.database import SessionDep
-from app.models import ShopItemCategory, CategoryCreate, CategoryUpdate, CategoryRead
+from typing import Any, Dict, List, Optional
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import Response
+from pydantic import TypeAdapter
+from sqlmodel import Session, select, insert, update, delete
+from app.database import SessionDep, ReadSessionDep
+from app.database.soft_delete import delete_rows
+from app.models import (
+    ShopItemCategory, CategoryCreate, CategoryUpdate, CategoryRead, ShopItemCategoryAssociation
+)
+from app.utils.bulk import chunked
+from app.utils.cache import cacheable, catalog_cache, invalidate_category
+from app.utils.conditional import make_etag, not_modified, conditional_response
+from app.utils.fast_json import encode_json, fast_list_responses
+from app.utils.pagination import paginate, next_cursor
+from app.utils.query_log import query_budget
+from app.utils.responses import BulkDeleteResponse, BulkResponse, BulkRowResult
 
 
 router = APIRouter(prefix="/categories", tags=["categories"])
 
+# Serializes ORM rows once, when a listing page is cached
+_category_list_adapter = TypeAdapter(List[CategoryRead])
+
+# CategoryRead's fields in order; returned by writes
+READ_COLUMNS = [ShopItemCategory.title, ShopItemCategory.description, ShopItemCategory.id]
+# Listing columns on the fast path: CategoryRead's fields, then version
+LIST_COLUMNS = [*READ_COLUMNS, ShopItemCategory.version]
+
 
 @router.get("/", response_model=List[CategoryRead])
+@query_budget(3)
 def list_categories(
-    session: SessionDep,
+    session: ReadSessionDep,
     skip: int = Query(0, ge=0, description="Number of records to skip"),
-    limit: int = Query(100, ge=1, le=1000, description="Number of records to return")
-) -> List[ShopItemCategory]:
+    limit: int = Query(100, ge=1, le=1000, description="Number of records to return"),
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+    if_none_match: Optional[str] = Header(None)
+) -> Response:
     """List all categories with pagination"""
-    categories = session.exec(select(ShopItemCategory).offset(skip).limit(limit)).all()
-    return categories
+    cache_key = ("categories", skip, limit, cursor)
+    entry = catalog_cache.get(cache_key)
+    
+    if entry is None:
+        generation = catalog_cache.generation
+        fast = fast_list_responses.value
+        query = select(*LIST_COLUMNS) if fast else select(ShopItemCategory)
+        query = paginate(query.where(ShopItemCategory.deleted_at.is_(None)), [ShopItemCategory.id], skip, limit, cursor)
+        categories = session.exec(query).all()
+        etag = make_etag("categories", [(category.id, category.version) for category in categories])
+        page_cursor = next_cursor(categories, limit, lambda category: [category.id])
+        
+        # The client's copy is current: skip serializing the page
+        response = not_modified(if_none_match, etag, page_cursor)
+        if response is not None:
+            return response
+        
+        if fast:
+            records = [
+                {"title": title, "description": description, "id": category_id}
+                for title, description, category_id, _ in categories
+            ]
+            entry = {"body": records, "json": encode_json(records)}
+        else:
+            entry = {
+                "body": _category_list_adapter.dump_python(
+                    _category_list_adapter.validate_python(categories, from_attributes=True),
+                    mode="json"
+                )
+            }
+        entry.update(etag=etag, next_cursor=page_cursor)
+        if cacheable(session):
+            catalog_cache.set(cache_key, entry, generation)
+    
+    return conditional_response(entry, if_none_match)
 
 
 @router.get("/{category_id}", response_model=CategoryRead)
-def get_category(category_id: int, session: SessionDep) -> ShopItemCategory:
+@query_budget(3)
+def get_category(
+    category_id: int,
+    session: ReadSessionDep,
+    if_none_match: Optional[str] = Header(None)
+) -> Response:
     """Get a category by ID"""
-    category = session.get(ShopItemCategory, category_id)
-    if not category:
-        raise HTTPException(status_code=404, detail="Category not found")
-    return category
+    cache_key = ("category", category_id)
+    entry = catalog_cache.get(cache_key)
+    
+    if entry is None:
+        generation = catalog_cache.generation
+        category = session.get(ShopItemCategory, category_id)
+        if not category or category.deleted_at:
+            raise HTTPException(status_code=404, detail="Category not found")
+        
+        etag = make_etag("category", category.id, category.version)
+        response = not_modified(if_none_match, etag)
+        if response is not None:
+            return response
+        
+        entry = {"body": CategoryRead.model_validate(category).model_dump(mode="json"), "etag": etag}
+        if cacheable(session):
+            catalog_cache.set(cache_key, entry, generation)
+    
+    return conditional_response(entry, if_none_match)
 
 
 @router.post("/", response_model=CategoryRead, status_code=201)
-def create_category(category: CategoryCreate, session: SessionDep) -> ShopItemCategory:
+@query_budget(1)
+def create_category(category: CategoryCreate, session: SessionDep) -> Dict[str, Any]:
     """Create a new category"""
-    db_category = ShopItemCategory.model_validate(category)
-    session.add(db_category)
+    row = session.exec(
+        insert(ShopItemCategory).values(**category.model_dump()).returning(*READ_COLUMNS)
+    ).one()
+    session.commit()
+    invalidate_category()
+    return row._asdict()
+
+
+@router.post(":bulk", response_model=BulkResponse)
+def bulk_create_categories(categories: List[CategoryCreate], session: SessionDep) -> BulkResponse:
+    """Create many categories in a single transaction"""
+    rows = [category.model_dump() for category in categories]
+    
+    category_ids = []
+    for chunk in chunked(rows):
+        category_ids.extend(session.exec(
+            insert(ShopItemCategory).returning(ShopItemCategory.id, sort_by_parameter_order=True),
+            params=chunk
+        ).scalars().all())
+    
     session.commit()
-    session.refresh(db_category)
-    return db_category
+    invalidate_category()
+    return BulkResponse(
+        created=len(category_ids),
+        results=[
+            BulkRowResult(index=index, status="created", id=category_id)
+            for index, category_id in enumerate(category_ids)
+        ]
+    )
 
 
 @router.put("/{category_id}", response_model=CategoryRead)
+@query_budget(1)
 def update_category(
     category_id: int,
     category: CategoryUpdate,
     session: SessionDep
-) -> ShopItemCategory:
+) -> Dict[str, Any]:
     """Update a category"""
-    db_category = session.get(ShopItemCategory, category_id)
-    if not db_category:
+    # One statement both writes the row and tells us whether it exists
+    row = session.exec(
+        update(ShopItemCategory)
+        .where(ShopItemCategory.id == category_id, ShopItemCategory.deleted_at.is_(None))
+        .values(**category.model_dump(exclude_unset=True), version=ShopItemCategory.version + 1)
+        .returning(*READ_COLUMNS)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if row is None:
         raise HTTPException(status_code=404, detail="Category not found")
     
-    category_data = category.model_dump(exclude_unset=True)
-    for field, value in category_data.items():
-        setattr(db_category, field, value)
+    session.commit()
+    invalidate_category(category_id)
+    return row._asdict()
+
+
+def _delete_categories(session: Session, category_ids: List[int]) -> List[int]:
+    """Delete categories and their item links with set-based statements; returns the IDs deleted"""
+    session.exec(
+        delete(ShopItemCategoryAssociation)
+        .where(ShopItemCategoryAssociation.category_id.in_(category_ids))
+    )
+    return delete_rows(session, ShopItemCategory, ShopItemCategory.id.in_(category_ids))
+
+
+@router.post(":bulk-delete", response_model=BulkDeleteResponse)
+def bulk_delete_categories(category_ids: List[int], session: SessionDep) -> BulkDeleteResponse:
+    """Delete many categories in a single transaction"""
+    deleted_ids = []
+    for chunk in chunked(sorted(set(category_ids))):
+        deleted_ids.extend(_delete_categories(session, chunk))
     
-    session.add(db_category)
     session.commit()
-    session.refresh(db_category)
-    return db_category
+    for category_id in deleted_ids:
+        invalidate_category(category_id)
+    return BulkDeleteResponse(
+        deleted=len(deleted_ids),
+        not_found=sorted(set(category_ids) - set(deleted_ids))
+    )
 
 
 @router.delete("/{category_id}")
+@query_budget(2)
 def delete_category(category_id: int, session: SessionDep) -> dict:
     """Delete a category"""
-    category = session.get(ShopItemCategory, category_id)
-    if not category:
+    if not _delete_categories(session, [category_id]):
         raise HTTPException(status_code=404, detail="Category not found")
     
-    session.delete(category)
     session.commit()
+    invalidate_category(category_id)
     return {"message": "Category deleted successfully"}
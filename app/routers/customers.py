@@ -1,90 +1,264 @@
 """
 Customer CRUD endpoints
 """
-from typing import List, Optional
-from fastapi import APIRouter, HTTPException, Query
-from sqlmodel import select
-from app.database import SessionDep
-from app.models import Customer, CustomerCreate, CustomerUpdate, CustomerRead
+from typing import Any, Dict, List, Optional, Union
+from fastapi import APIRouter, HTTPException, Query, Response
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select, insert, update
+from app.database import SessionDep, ReadSessionDep
+from app.database.soft_delete import delete_rows, soft_delete
+from app.models import Customer, CustomerCreate, CustomerUpdate, CustomerRead, Order, OrderRead
+from app.models.customer import EMAIL_INDEX
+from app.routers.orders import list_order_page
+from app.utils.bulk import chunked
+from app.utils.fast_json import FastJSONResponse, fast_list_responses
+from app.utils.pagination import paginate, next_cursor, set_next_cursor, cursor_headers
+from app.utils.query_log import query_budget
+from app.utils.responses import BulkDeleteResponse, BulkResponse, BulkRowResult
 
 
 router = APIRouter(prefix="/customers", tags=["customers"])
 
+# CustomerRead's fields in order; selected on the fast list path and
+# returned by writes
+READ_COLUMNS = [Customer.name, Customer.surname, Customer.email, Customer.id]
+
+
+def _email_taken(error: IntegrityError) -> bool:
+    """Whether a write was rejected by the unique email index"""
+    constraint = getattr(getattr(error.orig, "diag", None), "constraint_name", None)
+    return constraint == EMAIL_INDEX or f"index '{EMAIL_INDEX}'" in str(error.orig)
+
 
 @router.get("/", response_model=List[CustomerRead])
+@query_budget(3)
 def list_customers(
-    session: SessionDep,
+    session: ReadSessionDep,
+    response: Response,
     skip: int = Query(0, ge=0, description="Number of records to skip"),
-    limit: int = Query(100, ge=1, le=1000, description="Number of records to return")
-) -> List[Customer]:
+    limit: int = Query(100, ge=1, le=1000, description="Number of records to return"),
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page")
+) -> Union[List[Customer], Response]:
     """List all customers with pagination"""
-    customers = session.exec(select(Customer).offset(skip).limit(limit)).all()
+    if fast_list_responses.value:
+        query = select(*READ_COLUMNS).where(Customer.deleted_at.is_(None))
+        rows = session.exec(paginate(query, [Customer.id], skip, limit, cursor)).all()
+        return FastJSONResponse(
+            [
+                {"name": name, "surname": surname, "email": email, "id": customer_id}
+                for name, surname, email, customer_id in rows
+            ],
+            headers=cursor_headers(next_cursor(rows, limit, lambda row: [row.id]))
+        )
+    
+    query = paginate(select(Customer).where(Customer.deleted_at.is_(None)), [Customer.id], skip, limit, cursor)
+    customers = session.exec(query).all()
+    set_next_cursor(response, customers, limit, lambda customer: [customer.id])
     return customers
 
 
 @router.get("/{customer_id}", response_model=CustomerRead)
-def get_customer(customer_id: int, session: SessionDep) -> Customer:
+@query_budget(3)
+def get_customer(customer_id: int, session: ReadSessionDep) -> Customer:
     """Get a customer by ID"""
     customer = session.get(Customer, customer_id)
-    if not customer:
+    if not customer or customer.deleted_at:
         raise HTTPException(status_code=404, detail="Customer not found")
     return customer
 
 
+@router.get("/{customer_id}/orders", response_model=List[OrderRead])
+@query_budget(5)
+def list_customer_orders(
+    customer_id: int,
+    session: ReadSessionDep,
+    response: Response,
+    skip: int = Query(0, ge=0, description="Number of records to skip"),
+    limit: int = Query(100, ge=1, le=1000, description="Number of records to return"),
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page")
+) -> Union[List[Order], Response]:
+    """List a customer's orders, oldest first"""
+    customer = session.get(Customer, customer_id)
+    if not customer or customer.deleted_at:
+        raise HTTPException(status_code=404, detail="Customer not found")
+    return list_order_page(session, response, customer_id, skip, limit, cursor)
+
+
 @router.post("/", response_model=CustomerRead, status_code=201)
-def create_customer(customer: CustomerCreate, session: SessionDep) -> Customer:
+@query_budget(1)
+def create_customer(customer: CustomerCreate, session: SessionDep) -> Dict[str, Any]:
     """Create a new customer"""
-    # Check if email already exists
-    existing_customer = session.exec(
-        select(Customer).where(Customer.email == customer.email)
+    # The unique email index settles concurrent signups; a taken email
+    # inserts nothing and returns no row
+    dialect_insert = postgresql.insert if session.get_bind().dialect.name == "postgresql" else sqlite.insert
+    row = session.exec(
+        dialect_insert(Customer)
+        .values(**customer.model_dump())
+        .on_conflict_do_nothing()
+        .returning(*READ_COLUMNS)
     ).first()
-    
-    if existing_customer:
+    if row is None:
+        session.rollback()
         raise HTTPException(status_code=409, detail="Email already exists")
-    
-    db_customer = Customer.model_validate(customer)
-    session.add(db_customer)
     session.commit()
-    session.refresh(db_customer)
-    return db_customer
+    return row._asdict()
+
+
+@router.post(":bulk", response_model=BulkResponse)
+def bulk_create_customers(
+    customers: List[CustomerCreate],
+    session: SessionDep,
+    on_conflict: str = Query(
+        "error",
+        pattern="^(error|update)$",
+        description="Report existing emails as conflicts or update those customers"
+    )
+) -> BulkResponse:
+    """Create or upsert many customers in a single transaction"""
+    # Look up every existing email with set-based queries, matching the
+    # case-insensitive unique index
+    emails = list({customer.email.lower() for customer in customers})
+    existing_ids = {}
+    for chunk in chunked(emails):
+        existing_ids.update(session.exec(
+            select(func.lower(Customer.email), Customer.id)
+            .where(func.lower(Customer.email).in_(chunk), Customer.deleted_at.is_(None))
+        ).all())
+    
+    results = [None] * len(customers)
+    to_insert = []
+    to_update = []
+    seen_emails = set()
+    for index, customer in enumerate(customers):
+        email = customer.email.lower()
+        if email in seen_emails:
+            results[index] = BulkRowResult(
+                index=index, status="conflict", detail="Duplicate email in request"
+            )
+            continue
+        seen_emails.add(email)
+        
+        existing_id = existing_ids.get(email)
+        if existing_id is None:
+            to_insert.append((index, customer.model_dump()))
+        elif on_conflict == "update":
+            to_update.append((index, {"id": existing_id, **customer.model_dump()}))
+        else:
+            results[index] = BulkRowResult(
+                index=index, status="conflict", id=existing_id, detail="Email already exists"
+            )
+    
+    try:
+        for chunk in chunked(to_insert):
+            customer_ids = session.exec(
+                insert(Customer).returning(Customer.id, sort_by_parameter_order=True),
+                params=[row for _, row in chunk]
+            ).scalars().all()
+            for (index, _), customer_id in zip(chunk, customer_ids):
+                results[index] = BulkRowResult(index=index, status="created", id=customer_id)
+        
+        for chunk in chunked(to_update):
+            session.exec(update(Customer), params=[row for _, row in chunk])
+            for index, row in chunk:
+                results[index] = BulkRowResult(index=index, status="updated", id=row["id"])
+        
+        session.commit()
+    except IntegrityError as error:
+        session.rollback()
+        if not _email_taken(error):
+            raise
+        # A concurrent request took one of the emails after the lookup
+        raise HTTPException(status_code=409, detail="Email already exists")
+    return BulkResponse(
+        created=len(to_insert),
+        updated=len(to_update),
+        failed=len(customers) - len(to_insert) - len(to_update),
+        results=results
+    )
 
 
 @router.put("/{customer_id}", response_model=CustomerRead)
+@query_budget(1)
 def update_customer(
     customer_id: int, 
     customer: CustomerUpdate, 
     session: SessionDep
-) -> Customer:
+) -> Dict[str, Any]:
     """Update a customer"""
-    db_customer = session.get(Customer, customer_id)
-    if not db_customer:
-        raise HTTPException(status_code=404, detail="Customer not found")
+    customer_data = customer.model_dump(exclude_unset=True)
+    null_fields = [field for field, value in customer_data.items() if value is None]
+    if null_fields:
+        raise HTTPException(status_code=422, detail=f"Fields can't be null: {', '.join(null_fields)}")
+    if customer_data:
+        # One statement both writes the row and tells us whether it exists
+        query = (
+            update(Customer)
+            .where(Customer.id == customer_id, Customer.deleted_at.is_(None))
+            .values(**customer_data)
+            .returning(*READ_COLUMNS)
+            .execution_options(synchronize_session=False)
+        )
+    else:
+        query = select(*READ_COLUMNS).where(Customer.id == customer_id, Customer.deleted_at.is_(None))
     
-    # Check if email is being updated and already exists
-    if customer.email and customer.email != db_customer.email:
-        existing_customer = session.exec(
-            select(Customer).where(Customer.email == customer.email)
-        ).first()
-        if existing_customer:
-            raise HTTPException(status_code=409, detail="Email already exists")
+    try:
+        row = session.exec(query).first()
+    except IntegrityError as error:
+        session.rollback()
+        if not _email_taken(error):
+            raise
+        raise HTTPException(status_code=409, detail="Email already exists")
+    if row is None:
+        raise HTTPException(status_code=404, detail="Customer not found")
+    session.commit()
+    return row._asdict()
+
+
+def _delete_customers(session: Session, customer_ids: List[int]) -> List[int]:
+    """Delete customers in one statement; returns the IDs deleted
     
-    customer_data = customer.model_dump(exclude_unset=True)
-    for field, value in customer_data.items():
-        setattr(db_customer, field, value)
+    Orders are sales history, so a customer who has any can only be soft
+    deleted; a hard delete answers 409 rather than touching their orders,
+    stock or the sales rollups.
+    """
+    if not soft_delete.value:
+        with_orders = session.exec(
+            select(Order.customer_id)
+            .join(Customer, Customer.id == Order.customer_id)
+            .where(Order.customer_id.in_(customer_ids), Customer.deleted_at.is_(None))
+            .distinct()
+            .order_by(Order.customer_id)
+        ).all()
+        if with_orders:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Customers with orders can't be deleted: {', '.join(map(str, with_orders))}"
+            )
+    return delete_rows(session, Customer, Customer.id.in_(customer_ids))
+
+
+@router.post(":bulk-delete", response_model=BulkDeleteResponse)
+def bulk_delete_customers(customer_ids: List[int], session: SessionDep) -> BulkDeleteResponse:
+    """Delete many customers in a single transaction"""
+    deleted_ids = []
+    for chunk in chunked(sorted(set(customer_ids))):
+        deleted_ids.extend(_delete_customers(session, chunk))
     
-    session.add(db_customer)
     session.commit()
-    session.refresh(db_customer)
-    return db_customer
+    return BulkDeleteResponse(
+        deleted=len(deleted_ids),
+        not_found=sorted(set(customer_ids) - set(deleted_ids))
+    )
 
 
 @router.delete("/{customer_id}")
+@query_budget(2)
 def delete_customer(customer_id: int, session: SessionDep) -> dict:
     """Delete a customer"""
-    customer = session.get(Customer, customer_id)
-    if not customer:
+    if not _delete_customers(session, [customer_id]):
         raise HTTPException(status_code=404, detail="Customer not found")
     
-    session.delete(customer)
     session.commit()
     return {"message": "Customer deleted successfully"}
@@ -1,32 +1,378 @@
 """
 Order CRUD endpoints
 """
-from typing import List
-from fastapi import APIRouter, HTTPException, Query
-from sqlmodel import select
-from app.database import SessionDep
+from collections import defaultdict
+from itertools import groupby
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple, Union
+from fastapi import APIRouter, Header, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import case
+from sqlmodel import Session, select, insert, update, delete
+from app.database import SessionDep, ReadSessionDep
+from app.database.idempotency import (
+    claim_idempotency_key, store_idempotent_response, release_idempotency_key
+)
+from app.database.rollups import (
+    OrderLine, category_lines, release_categories, snapshot_categories,
+    record_order_change, record_orders_removed
+)
 from app.models import (
     Order, OrderCreate, OrderUpdate, OrderRead,
-    OrderItem, Customer, ShopItem
+    OrderItem, OrderItemCreate, Customer, ShopItem
+)
+from app.utils.cache import invalidate_shop_item
+from app.utils.bulk import chunked
+from app.utils.export import (
+    EXPORT_FORMAT_PATTERN, iter_rows, encode_ndjson, encode_csv, export_response
 )
+from app.utils.fast_json import FastJSONResponse, fast_list_responses
+from app.utils.metrics import unbudgeted_queries
+from app.utils.pagination import paginate, next_cursor, set_next_cursor, cursor_headers
+from app.utils.query_log import query_budget
+from app.utils.responses import BulkDeleteResponse
 
 
 router = APIRouter(prefix="/orders", tags=["orders"])
 
+# Keyset order of a customer's history, matching ix_orders_customer_id_created_at_id
+CUSTOMER_ORDER_KEY = [Order.customer_id, Order.created_at, Order.id]
+
+# OrderRead's and OrderItemRead's columns in order; selected on the fast
+# list path and returned by writes
+LIST_COLUMNS = [Order.customer_id, Order.id, Order.created_at, Order.total_amount, Order.item_count]
+LIST_ITEM_COLUMNS = [
+    OrderItem.shop_item_id, OrderItem.quantity, OrderItem.id, OrderItem.order_id, OrderItem.unit_price
+]
+
+
+def _load_item_prices(
+    session: Session,
+    items: List[OrderItemCreate]
+) -> Tuple[Dict[int, float], Set[int]]:
+    """Check that every referenced shop item exists and return current prices
+    
+    Uses a single IN query for the whole order. Also returns the IDs of the
+    items whose stock is tracked.
+    """
+    requested_ids = {item.shop_item_id for item in items}
+    if not requested_ids:
+        return {}, set()
+    
+    rows = session.exec(
+        select(ShopItem.id, ShopItem.price, ShopItem.stock)
+        .where(ShopItem.id.in_(requested_ids), ShopItem.deleted_at.is_(None))
+    ).all()
+    prices = {item_id: price for item_id, price, _ in rows}
+    stocked_ids = {item_id for item_id, _, stock in rows if stock is not None}
+    
+    # Report the first missing item in request order
+    for item in items:
+        if item.shop_item_id not in prices:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Shop item with ID {item.shop_item_id} not found"
+            )
+    return prices, stocked_ids
+
+
+def _stock_delta(before: List[OrderLine], after: List[OrderLine]) -> Dict[int, int]:
+    """Net units each shop item gives up when an order's lines change from before to after"""
+    delta: Dict[int, int] = defaultdict(int)
+    for item_id, quantity, _ in after:
+        delta[item_id] += quantity
+    for item_id, quantity, _ in before:
+        delta[item_id] -= quantity
+    return delta
+
+
+def _adjust_stock(session: Session, delta: Dict[int, int], stocked_ids: Set[int]) -> List[int]:
+    """Apply net stock changes for tracked items and return the IDs that changed
+    
+    Units are taken with one conditional UPDATE whose ``stock >= quantity``
+    check and decrement are a single statement, so concurrent orders can't
+    both take the last units and no application lock is needed. If any item
+    falls short the transaction is rolled back and a 409 raised.
+    """
+    taken = {item_id: units for item_id, units in delta.items() if units > 0 and item_id in stocked_ids}
+    returned = {item_id: -units for item_id, units in delta.items() if units < 0}
+    changed = []
+    
+    if taken:
+        quantity = case(taken, value=ShopItem.id)
+        changed.extend(session.exec(
+            update(ShopItem)
+            .where(ShopItem.id.in_(taken), ShopItem.stock >= quantity)
+            .values(stock=ShopItem.stock - quantity, version=ShopItem.version + 1)
+            .returning(ShopItem.id)
+            .execution_options(synchronize_session=False)
+        ).scalars().all())
+        
+        if len(changed) < len(taken):
+            session.rollback()
+            stock = dict(session.exec(
+                select(ShopItem.id, ShopItem.stock).where(ShopItem.id.in_(taken))
+            ).all())
+            short = next(
+                (item_id for item_id, units in taken.items()
+                 if stock.get(item_id) is not None and stock[item_id] < units),
+                next(item_id for item_id in taken if item_id not in changed)
+            )
+            raise HTTPException(
+                status_code=409,
+                detail=f"Insufficient stock for shop item with ID {short}"
+            )
+    
+    if returned:
+        # Items that stopped tracking stock (or were deleted) are skipped
+        quantity = case(returned, value=ShopItem.id)
+        changed.extend(session.exec(
+            update(ShopItem)
+            .where(ShopItem.id.in_(returned), ShopItem.stock.is_not(None))
+            .values(stock=ShopItem.stock + quantity, version=ShopItem.version + 1)
+            .returning(ShopItem.id)
+            .execution_options(synchronize_session=False)
+        ).scalars().all())
+    
+    return changed
+
+
+def _invalidate_stock(item_ids: List[int]) -> None:
+    """Drop cached catalog reads that show the stock of these items"""
+    for item_id in item_ids:
+        invalidate_shop_item(item_id)
+
+
+def cancel_orders(session: Session, condition) -> Tuple[List[int], List[int]]:
+    """Delete the orders matching ``condition`` and their items, without committing
+    
+    Like cancelling each one, their units go back on the shelf and they
+    leave the sales rollups; the deletes are set-based, so the statement
+    count doesn't grow with the number of orders. Returns the deleted order
+    IDs and the items whose stock changed.
+    """
+    rows = session.exec(
+        select(
+            Order.id, Order.created_at,
+            OrderItem.shop_item_id, OrderItem.quantity, OrderItem.unit_price, OrderItem.id
+        )
+        .outerjoin(OrderItem, OrderItem.order_id == Order.id)
+        .where(condition)
+        .order_by(Order.id)
+    ).all()
+    if not rows:
+        return [], []
+    
+    order_ids = sorted({row[0] for row in rows})
+    released: Dict[int, List[int]] = defaultdict(list)
+    for chunk in chunked(order_ids):
+        for order_item_id, category_id in release_categories(session, chunk):
+            released[order_item_id].append(category_id)
+    
+    orders = []
+    for order_id, order_rows in groupby(rows, key=lambda row: row[0]):
+        order_rows = list(order_rows)
+        lines = {row[5]: tuple(row[2:5]) for row in order_rows if row[2] is not None}
+        pairs = [
+            (order_item_id, category_id)
+            for order_item_id in lines for category_id in released[order_item_id]
+        ]
+        orders.append((order_id, order_rows[0][1].date(), list(lines.values()), category_lines(pairs, lines)))
+    
+    all_lines = [line for _, _, lines, _ in orders for line in lines]
+    changed_ids = _adjust_stock(session, _stock_delta(all_lines, []), set())
+    record_orders_removed(session, [(day, lines, categories) for _, day, lines, categories in orders])
+    
+    for chunk in chunked(order_ids):
+        session.exec(delete(OrderItem).where(OrderItem.order_id.in_(chunk)))
+        session.exec(delete(Order).where(Order.id.in_(chunk)))
+    return order_ids, changed_ids
+
+
+def _export_statement():
+    """Orders joined with their items, ordered so each order's lines are adjacent"""
+    return (
+        select(
+            Order.id, Order.customer_id, Order.created_at,
+            Order.total_amount, Order.item_count,
+            OrderItem.id, OrderItem.shop_item_id, OrderItem.quantity, OrderItem.unit_price
+        )
+        .outerjoin(OrderItem, OrderItem.order_id == Order.id)
+        .order_by(Order.id, OrderItem.id)
+    )
+
+
+def _export_records(rows: Iterator[Any]) -> Iterator[Dict[str, Any]]:
+    """Fold joined order rows into OrderRead-shaped records"""
+    for order_id, order_rows in groupby(rows, key=lambda row: row[0]):
+        first = next(order_rows)
+        lines = [first, *order_rows] if first[5] is not None else []
+        yield {
+            "customer_id": first[1],
+            "id": order_id,
+            "created_at": first[2],
+            "total_amount": first[3],
+            "item_count": first[4],
+            "items": [
+                {
+                    "shop_item_id": row[6], "quantity": row[7], "id": row[5],
+                    "order_id": order_id, "unit_price": row[8]
+                }
+                for row in lines
+            ]
+        }
+
+
+def _order_totals(items: List[OrderItemCreate], prices: Dict[int, float]) -> Dict[str, Any]:
+    """The denormalized order totals for the items and their snapshotted prices"""
+    return {
+        "total_amount": round(sum(prices[item.shop_item_id] * item.quantity for item in items), 2),
+        "item_count": sum(item.quantity for item in items),
+    }
+
+
+def _priced_lines(items: List[OrderItemCreate], prices: Dict[int, float]) -> List[OrderLine]:
+    """Rollup lines for items being written at the given prices"""
+    return [(item.shop_item_id, item.quantity, prices[item.shop_item_id]) for item in items]
+
+
+def _lines_by_id(items: List[Dict[str, Any]]) -> Dict[int, OrderLine]:
+    """Rollup lines of inserted order item records, keyed by order item ID"""
+    return {item["id"]: (item["shop_item_id"], item["quantity"], item["unit_price"]) for item in items}
+
+
+def _insert_order_items(
+    session: Session,
+    order_id: int,
+    items: List[OrderItemCreate],
+    prices: Dict[int, float]
+) -> List[Dict[str, Any]]:
+    """Bulk insert order items (executemany, no per-row flush), snapshotting prices
+    
+    Returns the inserted rows as OrderItemRead-shaped records in id order,
+    as a fresh load would list them. RETURNING is left unordered so SQLite
+    keeps the rows in one batched statement.
+    """
+    if not items:
+        return []
+    
+    rows = session.exec(
+        insert(OrderItem).returning(*LIST_ITEM_COLUMNS),
+        params=[
+            {
+                "order_id": order_id,
+                "shop_item_id": item.shop_item_id,
+                "quantity": item.quantity,
+                "unit_price": prices[item.shop_item_id]
+            }
+            for item in items
+        ]
+    ).all()
+    return [row._asdict() for row in sorted(rows, key=lambda row: row.id)]
+
+
+def _fast_order_page(session: Session, rows: List[Any], page_cursor: Optional[str]) -> Response:
+    """Encode a page of LIST_COLUMNS rows as OrderRead JSON, loading the items in one query"""
+    lines: Dict[int, List[Dict[str, Any]]] = defaultdict(list)
+    floats = [row.total_amount for row in rows]
+    for chunk in chunked([row.id for row in rows]):
+        item_rows = session.exec(
+            select(*LIST_ITEM_COLUMNS)
+            .where(OrderItem.order_id.in_(chunk))
+            .order_by(OrderItem.order_id, OrderItem.id)
+        ).all()
+        for shop_item_id, quantity, item_id, order_id, unit_price in item_rows:
+            lines[order_id].append({
+                "shop_item_id": shop_item_id, "quantity": quantity, "id": item_id,
+                "order_id": order_id, "unit_price": unit_price
+            })
+            floats.append(unit_price)
+    
+    return FastJSONResponse(
+        [
+            {
+                "customer_id": customer_id,
+                "id": order_id,
+                "created_at": created_at,
+                "total_amount": total_amount,
+                "item_count": item_count,
+                "items": lines.get(order_id, [])
+            }
+            for customer_id, order_id, created_at, total_amount, item_count in rows
+        ],
+        floats=floats,
+        headers=cursor_headers(page_cursor)
+    )
+
+
+def list_order_page(
+    session: Session,
+    response: Response,
+    customer_id: Optional[int],
+    skip: int,
+    limit: int,
+    cursor: Optional[str]
+) -> Union[List[Order], Response]:
+    """One page of orders, keyed by (customer_id, created_at, id) for a single customer"""
+    fast = fast_list_responses.value
+    query = select(*LIST_COLUMNS) if fast else select(Order)
+    if customer_id is None:
+        key = [Order.id]
+    else:
+        query = query.where(Order.customer_id == customer_id)
+        key = CUSTOMER_ORDER_KEY
+    
+    orders = session.exec(paginate(query, key, skip, limit, cursor)).all()
+    if fast:
+        return _fast_order_page(
+            session, orders,
+            next_cursor(orders, limit, lambda order: [getattr(order, column.key) for column in key])
+        )
+    set_next_cursor(
+        response, orders, limit, lambda order: [getattr(order, column.key) for column in key]
+    )
+    return orders
+
 
 @router.get("/", response_model=List[OrderRead])
+@query_budget(4)
 def list_orders(
-    session: SessionDep,
+    session: ReadSessionDep,
+    response: Response,
+    customer_id: Optional[int] = Query(None, description="Only this customer's orders, oldest first"),
     skip: int = Query(0, ge=0, description="Number of records to skip"),
-    limit: int = Query(100, ge=1, le=1000, description="Number of records to return")
-) -> List[Order]:
+    limit: int = Query(100, ge=1, le=1000, description="Number of records to return"),
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page")
+) -> Union[List[Order], Response]:
     """List all orders with pagination"""
-    orders = session.exec(select(Order).offset(skip).limit(limit)).all()
-    return orders
+    return list_order_page(session, response, customer_id, skip, limit, cursor)
+
+
+@router.get("/export", response_class=StreamingResponse)
+def export_orders(
+    session: ReadSessionDep,
+    export_format: str = Query("ndjson", alias="format", pattern=EXPORT_FORMAT_PATTERN,
+                               description="ndjson (one order per line) or csv (one line per order item)")
+) -> StreamingResponse:
+    """Stream every order with its items without materializing the table"""
+    rows = iter_rows(session.get_bind(), _export_statement())
+    
+    if export_format == "csv":
+        chunks = encode_csv(
+            [
+                "order_id", "customer_id", "created_at", "total_amount", "item_count",
+                "order_item_id", "shop_item_id", "quantity", "unit_price"
+            ],
+            rows
+        )
+    else:
+        chunks = encode_ndjson(_export_records(rows))
+    
+    return export_response(chunks, export_format, "orders")
 
 
 @router.get("/{order_id}", response_model=OrderRead)
-def get_order(order_id: int, session: SessionDep) -> Order:
+@query_budget(4)
+def get_order(order_id: int, session: ReadSessionDep) -> Order:
     """Get an order by ID"""
     order = session.get(Order, order_id)
     if not order:
@@ -34,44 +380,79 @@ def get_order(order_id: int, session: SessionDep) -> Order:
     return order
 
 
-@router.post("/", response_model=OrderRead, status_code=201)
-def create_order(order: OrderCreate, session: SessionDep) -> Order:
-    """Create a new order"""
+def _place_order(session: Session, order: OrderCreate) -> Tuple[Dict[str, Any], List[int]]:
+    """Write an order without committing
+    
+    Returns the order as an OrderRead-shaped record, read back with
+    RETURNING, and the items whose stock changed.
+    """
     # Verify customer exists
     customer = session.get(Customer, order.customer_id)
-    if not customer:
+    if not customer or customer.deleted_at:
         raise HTTPException(status_code=404, detail="Customer not found")
     
-    # Create the order
-    order_data = order.model_dump(exclude={"items"})
-    db_order = Order(**order_data)
-    session.add(db_order)
-    session.commit()
-    session.refresh(db_order)
+    # Verify all shop items exist before writing anything
+    prices, stocked_ids = _load_item_prices(session, order.items)
+    lines = _priced_lines(order.items, prices)
     
-    # Create order items
-    for item_data in order.items:
-        # Verify shop item exists
-        shop_item = session.get(ShopItem, item_data.shop_item_id)
-        if not shop_item:
-            raise HTTPException(
-                status_code=404, 
-                detail=f"Shop item with ID {item_data.shop_item_id} not found"
+    # Reserve stock first, then create the order and its items, all in a
+    # single transaction
+    changed_ids = _adjust_stock(session, _stock_delta([], lines), stocked_ids)
+    row = session.exec(
+        insert(Order)
+        .values(**order.model_dump(exclude={"items"}), **_order_totals(order.items, prices))
+        .returning(*LIST_COLUMNS)
+    ).one()
+    
+    items = _insert_order_items(session, row.id, order.items, prices)
+    categories = category_lines(snapshot_categories(session, [row.id]), _lines_by_id(items)) if items else []
+    record_order_change(session, row.created_at.date(), None, lines, categories_after=categories)
+    return {**row._asdict(), "items": items}, changed_ids
+
+
+# Worst case: a retry's claim taken over mid-request, after the full write,
+# then its release
+@router.post("/", response_model=OrderRead, status_code=201)
+@query_budget(11)
+def create_order(
+    order: OrderCreate,
+    session: SessionDep,
+    idempotency_key: Optional[str] = Header(
+        None, max_length=255, description="Retries with the same key get the first response back"
+    )
+) -> Union[Dict[str, Any], Response]:
+    """Create a new order
+    
+    A retry carrying the same Idempotency-Key replays the stored response
+    instead of creating another order; one that arrives while the first is
+    still running waits for it.
+    """
+    if idempotency_key is not None:
+        # A retry waits on the first request by polling, however long that takes
+        with unbudgeted_queries():
+            replay = claim_idempotency_key(session, "orders", idempotency_key, order)
+        if replay is not None:
+            return replay
+    
+    try:
+        record, changed_ids = _place_order(session, order)
+        if idempotency_key is not None:
+            store_idempotent_response(
+                session, "orders", idempotency_key, 201, OrderRead.model_validate(record)
             )
-        
-        order_item = OrderItem(
-            order_id=db_order.id,
-            shop_item_id=item_data.shop_item_id,
-            quantity=item_data.quantity
-        )
-        session.add(order_item)
+        session.commit()
+    except Exception:
+        if idempotency_key is not None:
+            release_idempotency_key(session, "orders", idempotency_key)
+        raise
     
-    session.commit()
-    session.refresh(db_order)
-    return db_order
+    _invalidate_stock(changed_ids)
+    return record
 
 
+# Worst case: a new customer and new lines that both take and return stock
 @router.put("/{order_id}", response_model=OrderRead)
+@query_budget(16)
 def update_order(
     order_id: int,
     order: OrderUpdate,
@@ -82,51 +463,73 @@ def update_order(
     if not db_order:
         raise HTTPException(status_code=404, detail="Order not found")
     
+    # Column changes are set on db_order only at the end, so they go out in
+    # the commit's single UPDATE rather than in autoflushes along the way
+    changes: Dict[str, Any] = {}
+    
     # Update customer if provided
     if order.customer_id:
         customer = session.get(Customer, order.customer_id)
-        if not customer:
+        if not customer or customer.deleted_at:
             raise HTTPException(status_code=404, detail="Customer not found")
-        db_order.customer_id = order.customer_id
+        changes["customer_id"] = order.customer_id
     
     # Update items if provided
+    changed_ids = []
     if order.items is not None:
-        # Delete existing order items
-        existing_items = session.exec(
-            select(OrderItem).where(OrderItem.order_id == order_id)
-        ).all()
-        for item in existing_items:
-            session.delete(item)
+        prices, stocked_ids = _load_item_prices(session, order.items)
+        previous = {item.id: (item.shop_item_id, item.quantity, item.unit_price) for item in db_order.items}
+        previous_lines = list(previous.values())
+        lines = _priced_lines(order.items, prices)
+        changed_ids = _adjust_stock(session, _stock_delta(previous_lines, lines), stocked_ids)
         
-        # Create new order items
-        for item_data in order.items:
-            shop_item = session.get(ShopItem, item_data.shop_item_id)
-            if not shop_item:
-                raise HTTPException(
-                    status_code=404,
-                    detail=f"Shop item with ID {item_data.shop_item_id} not found"
-                )
-            
-            order_item = OrderItem(
-                order_id=db_order.id,
-                shop_item_id=item_data.shop_item_id,
-                quantity=item_data.quantity
-            )
-            session.add(order_item)
+        # Replace existing order items and their category snapshot; drop the
+        # loaded collection first so the bulk DELETE doesn't leave deleted
+        # rows in db_order.items
+        session.expire(db_order, ["items"])
+        previous_categories = category_lines(release_categories(session, [order_id]), previous)
+        session.exec(delete(OrderItem).where(OrderItem.order_id == order_id))
+        items = _insert_order_items(session, order_id, order.items, prices)
+        categories = category_lines(snapshot_categories(session, [order_id]), _lines_by_id(items))
+        changes.update(_order_totals(order.items, prices))
+        record_order_change(
+            session, db_order.created_at.date(), previous_lines, lines, previous_categories, categories
+        )
     
+    for field, value in changes.items():
+        setattr(db_order, field, value)
     session.add(db_order)
     session.commit()
+    _invalidate_stock(changed_ids)
     session.refresh(db_order)
     return db_order
 
 
+@router.post(":bulk-delete", response_model=BulkDeleteResponse)
+def bulk_delete_orders(order_ids: List[int], session: SessionDep) -> BulkDeleteResponse:
+    """Delete many orders in a single transaction, putting their units back on the shelf"""
+    deleted_ids, changed_ids = [], set()
+    for chunk in chunked(sorted(set(order_ids))):
+        chunk_deleted, chunk_changed = cancel_orders(session, Order.id.in_(chunk))
+        deleted_ids.extend(chunk_deleted)
+        changed_ids.update(chunk_changed)
+    session.commit()
+    _invalidate_stock(list(changed_ids))
+    return BulkDeleteResponse(
+        deleted=len(deleted_ids),
+        not_found=sorted(set(order_ids) - set(deleted_ids))
+    )
+
+
+# Worst case: lines whose units go back on the shelf, in every rollup
 @router.delete("/{order_id}")
+@query_budget(8)
 def delete_order(order_id: int, session: SessionDep) -> dict:
     """Delete an order"""
-    order = session.get(Order, order_id)
-    if not order:
+    # Cancelling an order puts its units back on the shelf
+    order_ids, changed_ids = cancel_orders(session, Order.id == order_id)
+    if not order_ids:
         raise HTTPException(status_code=404, detail="Order not found")
-    
-    session.delete(order)
     session.commit()
+    _invalidate_stock(changed_ids)
     return {"message": "Order deleted successfully"}
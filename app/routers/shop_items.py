@@ -1,129 +1,477 @@
 """
 Shop item CRUD endpoints
 """
-from typing import List, Optional
-from fastapi import APIRouter, HTTPException, Query
-from sqlmodel import select
-from app.database import SessionDep
+from collections import defaultdict
+from itertools import groupby
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+from fastapi import APIRouter, Header, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
+from sqlmodel import Session, select, insert, update, delete, func
+from app.database import SessionDep, ReadSessionDep
+from app.database.soft_delete import delete_rows, soft_delete
+from app.database.search import (
+    search_table, search_rank, search_snippet, search_match,
+    search_supported, build_match_query
+)
 from app.models import (
-    ShopItem, ShopItemCreate, ShopItemUpdate, ShopItemRead,
-    ShopItemCategory, ShopItemCategoryAssociation
+    ShopItem, ShopItemCreate, ShopItemUpdate, ShopItemRead, ShopItemSearchResult,
+    ShopItemCategory, ShopItemCategoryAssociation, OrderItem
+)
+from app.utils.bulk import chunked
+from app.utils.cache import cacheable, catalog_cache, invalidate_shop_item
+from app.utils.conditional import make_etag, not_modified, conditional_response
+from app.utils.export import (
+    EXPORT_FORMAT_PATTERN, iter_rows, encode_ndjson, encode_csv, export_response
 )
+from app.utils.fast_json import encode_json, fast_list_responses
+from app.utils.pagination import paginate, next_cursor, set_next_cursor
+from app.utils.query_log import query_budget
+from app.utils.responses import BulkDeleteResponse, BulkResponse, BulkRowResult
 
 
 router = APIRouter(prefix="/items", tags=["items"])
 
+# Keyset columns for each sort option; id breaks ties so the order is total
+SORT_COLUMNS = {
+    "id": [ShopItem.id],
+    "price": [ShopItem.price, ShopItem.id],
+    "title": [ShopItem.title, ShopItem.id],
+}
+
+# Serializes ORM rows once, when a listing page is cached
+_shop_item_list_adapter = TypeAdapter(List[ShopItemRead])
+
+# ShopItemRead's columns in order, then version; selected on the fast list
+# path and returned by writes
+LIST_COLUMNS = [
+    ShopItem.title, ShopItem.description, ShopItem.price, ShopItem.stock, ShopItem.id, ShopItem.version
+]
+
+
+def _existing_category_ids(session: Session, category_ids: Set[int]) -> Set[int]:
+    """Return the subset of category IDs that exist, using chunked IN queries"""
+    existing_ids = set()
+    for chunk in chunked(sorted(category_ids)):
+        existing_ids.update(session.exec(
+            select(ShopItemCategory.id)
+            .where(ShopItemCategory.id.in_(chunk), ShopItemCategory.deleted_at.is_(None))
+        ).all())
+    return existing_ids
+
+
+def _link_categories(session: Session, item_id: int, category_ids: List[int]) -> None:
+    """Link an item to the given categories with one bulk insert; unknown IDs are skipped"""
+    existing_ids = _existing_category_ids(session, set(category_ids))
+    rows = [
+        {"shop_item_id": item_id, "category_id": category_id}
+        for category_id in dict.fromkeys(category_ids)
+        if category_id in existing_ids
+    ]
+    if rows:
+        session.exec(insert(ShopItemCategoryAssociation), params=rows)
+
+
+def _item_version(item: ShopItem) -> tuple:
+    """Everything an item's representation depends on: its version and its categories'"""
+    return (item.id, item.version, [(category.id, category.version) for category in item.categories])
+
+
+def _item_records(session: Session, rows: List[Any]) -> Tuple[List[Dict[str, Any]], List[tuple]]:
+    """ShopItemRead-shaped records and ``_item_version`` tuples for LIST_COLUMNS rows
+    
+    The categories of all the rows are loaded with one query.
+    """
+    categories: Dict[int, List[tuple]] = defaultdict(list)
+    if rows:
+        links = session.exec(
+            select(
+                ShopItemCategoryAssociation.shop_item_id, ShopItemCategory.title,
+                ShopItemCategory.description, ShopItemCategory.id, ShopItemCategory.version
+            )
+            .join(ShopItemCategory, ShopItemCategory.id == ShopItemCategoryAssociation.category_id)
+            .where(ShopItemCategoryAssociation.shop_item_id.in_([row.id for row in rows]))
+            .order_by(ShopItemCategoryAssociation.shop_item_id, ShopItemCategory.id)
+        ).all()
+        for item_id, *category in links:
+            categories[item_id].append(category)
+    
+    records = []
+    versions = []
+    for title, description, price, stock, item_id, version in rows:
+        item_categories = categories.get(item_id, [])
+        records.append({
+            "title": title,
+            "description": description,
+            "price": price,
+            "stock": stock,
+            "id": item_id,
+            "categories": [
+                {"title": category_title, "description": category_description, "id": category_id}
+                for category_title, category_description, category_id, _ in item_categories
+            ]
+        })
+        versions.append((
+            item_id, version,
+            [(category_id, category_version) for _, _, category_id, category_version in item_categories]
+        ))
+    return records, versions
+
+
+def _export_statement():
+    """Items joined with their categories, ordered so each item's rows are adjacent"""
+    return (
+        select(
+            ShopItem.id, ShopItem.title, ShopItem.description, ShopItem.price, ShopItem.stock,
+            ShopItemCategory.id, ShopItemCategory.title, ShopItemCategory.description
+        )
+        .outerjoin(
+            ShopItemCategoryAssociation,
+            ShopItemCategoryAssociation.shop_item_id == ShopItem.id
+        )
+        .outerjoin(
+            ShopItemCategory,
+            ShopItemCategory.id == ShopItemCategoryAssociation.category_id
+        )
+        .where(ShopItem.deleted_at.is_(None))
+        .order_by(ShopItem.id, ShopItemCategory.id)
+    )
+
+
+def _export_records(rows: Iterator[Any]) -> Iterator[Dict[str, Any]]:
+    """Fold joined item rows into ShopItemRead-shaped records"""
+    for item_id, item_rows in groupby(rows, key=lambda row: row[0]):
+        first = next(item_rows)
+        categories = [first, *item_rows] if first[5] is not None else []
+        yield {
+            "title": first[1],
+            "description": first[2],
+            "price": first[3],
+            "stock": first[4],
+            "id": item_id,
+            "categories": [
+                {"title": row[6], "description": row[7], "id": row[5]}
+                for row in categories
+            ]
+        }
+
+
+def _filter_by_categories(query, category_ids: List[int], match_all: bool):
+    """Keep items linked to any (or all) of the categories"""
+    linked_items = select(ShopItemCategoryAssociation.shop_item_id).where(
+        ShopItemCategoryAssociation.category_id.in_(category_ids)
+    )
+    if match_all:
+        linked_items = linked_items.group_by(ShopItemCategoryAssociation.shop_item_id).having(
+            func.count() == len(category_ids)
+        )
+    return query.where(ShopItem.id.in_(linked_items))
+
 
 @router.get("/", response_model=List[ShopItemRead])
+@query_budget(4)
 def list_shop_items(
-    session: SessionDep,
+    session: ReadSessionDep,
     category_id: Optional[int] = Query(None, description="Filter by category ID"),
+    category_ids: Optional[List[int]] = Query(None, description="Filter by several category IDs"),
+    category_match: str = Query("any", pattern="^(any|all)$", description="Items in any or in all of category_ids"),
+    min_price: Optional[float] = Query(None, ge=0, description="Minimum price (inclusive)"),
+    max_price: Optional[float] = Query(None, ge=0, description="Maximum price (inclusive)"),
+    sort: str = Query("id", pattern="^(id|price|title)$", description="Sort order"),
     skip: int = Query(0, ge=0, description="Number of records to skip"),
-    limit: int = Query(100, ge=1, le=1000, description="Number of records to return")
-) -> List[ShopItem]:
-    """List all shop items with optional category filter and pagination"""
-    query = select(ShopItem)
-    
+    limit: int = Query(100, ge=1, le=1000, description="Number of records to return"),
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+    if_none_match: Optional[str] = Header(None)
+) -> Response:
+    """List shop items with category and price filters, sorting and pagination"""
+    category_filter = set(category_ids or [])
     if category_id:
-        query = query.join(ShopItemCategoryAssociation).where(
-            ShopItemCategoryAssociation.category_id == category_id
+        category_filter.add(category_id)
+    category_filter = sorted(category_filter)
+    cache_key = (
+        "items", tuple(category_filter), category_match, min_price, max_price, sort,
+        skip, limit, cursor
+    )
+    entry = catalog_cache.get(cache_key)
+    
+    if entry is None:
+        generation = catalog_cache.generation
+        fast = fast_list_responses.value
+        query = select(*LIST_COLUMNS) if fast else select(ShopItem)
+        # Lets the planner use the partial price and title indexes
+        query = query.where(ShopItem.deleted_at.is_(None))
+        
+        if category_filter:
+            query = _filter_by_categories(query, category_filter, category_match == "all")
+        if min_price is not None:
+            query = query.where(ShopItem.price >= min_price)
+        if max_price is not None:
+            query = query.where(ShopItem.price <= max_price)
+        
+        sort_columns = SORT_COLUMNS[sort]
+        query = paginate(query, sort_columns, skip, limit, cursor)
+        items = session.exec(query).all()
+        page_cursor = next_cursor(
+            items, limit, lambda item: [getattr(item, column.key) for column in sort_columns]
         )
+        if fast:
+            records, versions = _item_records(session, items)
+        else:
+            versions = [_item_version(item) for item in items]
+        etag = make_etag("items", versions)
+        
+        # The client's copy is current: skip serializing the page
+        response = not_modified(if_none_match, etag, page_cursor)
+        if response is not None:
+            return response
+        
+        if fast:
+            entry = {"body": records, "json": encode_json(records, [item.price for item in items])}
+        else:
+            entry = {
+                "body": _shop_item_list_adapter.dump_python(
+                    _shop_item_list_adapter.validate_python(items, from_attributes=True),
+                    mode="json"
+                )
+            }
+        entry.update(etag=etag, next_cursor=page_cursor)
+        if cacheable(session):
+            catalog_cache.set(cache_key, entry, generation)
     
-    items = session.exec(query.offset(skip).limit(limit)).all()
-    return items
+    return conditional_response(entry, if_none_match)
+
+
+@router.get("/search", response_model=List[ShopItemSearchResult])
+@query_budget(4)
+def search_shop_items(
+    response: Response,
+    session: ReadSessionDep,
+    q: str = Query(..., min_length=1, max_length=200, description="Words to search for in titles and descriptions"),
+    skip: int = Query(0, ge=0, description="Number of records to skip"),
+    limit: int = Query(20, ge=1, le=100, description="Number of records to return"),
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page")
+) -> List[Dict[str, Any]]:
+    """Full-text search over item titles and descriptions, best matches first"""
+    if not search_supported(session.get_bind().dialect.name):
+        raise HTTPException(status_code=501, detail="Search requires the SQLite FTS5 index")
+    
+    match_query = build_match_query(q)
+    if match_query is None:
+        return []
+    
+    query = (
+        select(ShopItem, search_rank, search_snippet)
+        .join(search_table, search_table.c.rowid == ShopItem.id)
+        .where(search_match(match_query), ShopItem.deleted_at.is_(None))
+    )
+    query = paginate(query, [search_rank, ShopItem.id], skip, limit, cursor)
+    rows = session.exec(query).all()
+    
+    set_next_cursor(response, rows, limit, lambda row: [row[1], row[0].id])
+    return [
+        {**ShopItemRead.model_validate(item).model_dump(), "rank": rank, "snippet": snippet}
+        for item, rank, snippet in rows
+    ]
+
+
+@router.get("/export", response_class=StreamingResponse)
+def export_shop_items(
+    session: ReadSessionDep,
+    export_format: str = Query("ndjson", alias="format", pattern=EXPORT_FORMAT_PATTERN,
+                               description="ndjson or csv (category IDs joined with ';')")
+) -> StreamingResponse:
+    """Stream the whole catalog without materializing the table"""
+    records = _export_records(iter_rows(session.get_bind(), _export_statement()))
+    
+    if export_format == "csv":
+        chunks = encode_csv(
+            ["id", "title", "description", "price", "stock", "category_ids"],
+            (
+                [
+                    record["id"], record["title"], record["description"], record["price"],
+                    record["stock"],
+                    ";".join(str(category["id"]) for category in record["categories"])
+                ]
+                for record in records
+            )
+        )
+    else:
+        chunks = encode_ndjson(records)
+    
+    return export_response(chunks, export_format, "items")
 
 
 @router.get("/{item_id}", response_model=ShopItemRead)
-def get_shop_item(item_id: int, session: SessionDep) -> ShopItem:
+@query_budget(4)
+def get_shop_item(
+    item_id: int,
+    session: ReadSessionDep,
+    if_none_match: Optional[str] = Header(None)
+) -> Response:
     """Get a shop item by ID"""
-    item = session.get(ShopItem, item_id)
-    if not item:
-        raise HTTPException(status_code=404, detail="Shop item not found")
-    return item
+    cache_key = ("item", item_id)
+    entry = catalog_cache.get(cache_key)
+    
+    if entry is None:
+        generation = catalog_cache.generation
+        item = session.get(ShopItem, item_id)
+        if not item or item.deleted_at:
+            raise HTTPException(status_code=404, detail="Shop item not found")
+        
+        etag = make_etag("item", *_item_version(item))
+        response = not_modified(if_none_match, etag)
+        if response is not None:
+            return response
+        
+        entry = {"body": ShopItemRead.model_validate(item).model_dump(mode="json"), "etag": etag}
+        if cacheable(session):
+            catalog_cache.set(cache_key, entry, generation)
+    
+    return conditional_response(entry, if_none_match)
 
 
 @router.post("/", response_model=ShopItemRead, status_code=201)
-def create_shop_item(item: ShopItemCreate, session: SessionDep) -> ShopItem:
+@query_budget(4)
+def create_shop_item(item: ShopItemCreate, session: SessionDep) -> Dict[str, Any]:
     """Create a new shop item"""
-    # Extract category IDs and create the shop item
-    category_ids = item.category_ids or []
-    item_data = item.model_dump(exclude={"category_ids"})
+    # Create the shop item and its category links in one transaction
+    row = session.exec(
+        insert(ShopItem).values(**item.model_dump(exclude={"category_ids"})).returning(*LIST_COLUMNS)
+    ).one()
+    if item.category_ids:
+        _link_categories(session, row.id, item.category_ids)
+        records, _ = _item_records(session, [row])
+        record = records[0]
+    else:
+        # Nothing to read back; response_model drops the version
+        record = {**row._asdict(), "categories": []}
     
-    # Create the shop item
-    db_item = ShopItem(**item_data)
-    session.add(db_item)
     session.commit()
-    session.refresh(db_item)
-    
-    # Add categories to association table
-    for category_id in category_ids:
-        category = session.get(ShopItemCategory, category_id)
-        if category:
-            # Create association record
-            association = ShopItemCategoryAssociation(
-                shop_item_id=db_item.id,
-                category_id=category_id
-            )
-            session.add(association)
+    invalidate_shop_item()
+    return record
+
+
+@router.post(":bulk", response_model=BulkResponse)
+def bulk_create_shop_items(items: List[ShopItemCreate], session: SessionDep) -> BulkResponse:
+    """Create many shop items and their category links in a single transaction"""
+    # Unknown category IDs are skipped, as in create_shop_item
+    requested_category_ids = {
+        category_id for item in items for category_id in item.category_ids or []
+    }
+    existing_category_ids = _existing_category_ids(session, requested_category_ids)
+    
+    rows = [item.model_dump(exclude={"category_ids"}) for item in items]
+    item_ids = []
+    for chunk in chunked(rows):
+        item_ids.extend(session.exec(
+            insert(ShopItem).returning(ShopItem.id, sort_by_parameter_order=True),
+            params=chunk
+        ).scalars().all())
+    
+    associations = [
+        {"shop_item_id": item_id, "category_id": category_id}
+        for item_id, item in zip(item_ids, items)
+        for category_id in dict.fromkeys(item.category_ids or [])
+        if category_id in existing_category_ids
+    ]
+    for chunk in chunked(associations):
+        session.exec(insert(ShopItemCategoryAssociation), params=chunk)
     
     session.commit()
-    session.refresh(db_item)
-    return db_item
+    invalidate_shop_item()
+    return BulkResponse(
+        created=len(item_ids),
+        results=[
+            BulkRowResult(index=index, status="created", id=item_id)
+            for index, item_id in enumerate(item_ids)
+        ]
+    )
 
 
+# Worst case: relinking categories (at most MAX_CATEGORY_IDS, one lookup)
 @router.put("/{item_id}", response_model=ShopItemRead)
+@query_budget(5)
 def update_shop_item(
     item_id: int,
     item: ShopItemUpdate,
     session: SessionDep
-) -> ShopItem:
+) -> Dict[str, Any]:
     """Update a shop item"""
-    db_item = session.get(ShopItem, item_id)
-    if not db_item:
+    # One statement both writes the row and tells us whether it exists
+    row = session.exec(
+        update(ShopItem)
+        .where(ShopItem.id == item_id, ShopItem.deleted_at.is_(None))
+        .values(**item.model_dump(exclude_unset=True, exclude={"category_ids"}), version=ShopItem.version + 1)
+        .returning(*LIST_COLUMNS)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if row is None:
         raise HTTPException(status_code=404, detail="Shop item not found")
     
-    # Extract category IDs
-    category_ids = item.category_ids
-    item_data = item.model_dump(exclude_unset=True, exclude={"category_ids"})
+    # Replace the category links if provided
+    if item.category_ids is not None:
+        session.exec(
+            delete(ShopItemCategoryAssociation)
+            .where(ShopItemCategoryAssociation.shop_item_id == item_id)
+        )
+        _link_categories(session, item_id, item.category_ids)
     
-    # Update item fields
-    for field, value in item_data.items():
-        setattr(db_item, field, value)
+    records, _ = _item_records(session, [row])
+    session.commit()
+    invalidate_shop_item(item_id)
+    return records[0]
+
+
+def _delete_shop_items(session: Session, item_ids: List[int]) -> List[int]:
+    """Delete items and their category links with set-based statements; returns the IDs deleted
     
-    # Update categories if provided
-    if category_ids is not None:
-        # Delete existing associations
-        existing_associations = session.exec(
-            select(ShopItemCategoryAssociation).where(
-                ShopItemCategoryAssociation.shop_item_id == item_id
-            )
+    Order lines reference their item, so like a customer, an item that was
+    ever ordered can only be soft deleted; a hard delete answers 409.
+    """
+    if not soft_delete.value:
+        ordered = session.exec(
+            select(OrderItem.shop_item_id)
+            .join(ShopItem, ShopItem.id == OrderItem.shop_item_id)
+            .where(OrderItem.shop_item_id.in_(item_ids), ShopItem.deleted_at.is_(None))
+            .distinct()
+            .order_by(OrderItem.shop_item_id)
         ).all()
-        for assoc in existing_associations:
-            session.delete(assoc)
-        
-        # Create new associations
-        for category_id in category_ids:
-            category = session.get(ShopItemCategory, category_id)
-            if category:
-                association = ShopItemCategoryAssociation(
-                    shop_item_id=item_id,
-                    category_id=category_id
-                )
-                session.add(association)
+        if ordered:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Shop items with orders can't be deleted: {', '.join(map(str, ordered))}"
+            )
+    session.exec(
+        delete(ShopItemCategoryAssociation)
+        .where(ShopItemCategoryAssociation.shop_item_id.in_(item_ids))
+    )
+    return delete_rows(session, ShopItem, ShopItem.id.in_(item_ids))
+
+
+@router.post(":bulk-delete", response_model=BulkDeleteResponse)
+def bulk_delete_shop_items(item_ids: List[int], session: SessionDep) -> BulkDeleteResponse:
+    """Delete many shop items in a single transaction"""
+    deleted_ids = []
+    for chunk in chunked(sorted(set(item_ids))):
+        deleted_ids.extend(_delete_shop_items(session, chunk))
     
-    session.add(db_item)
     session.commit()
-    session.refresh(db_item)
-    return db_item
+    for item_id in deleted_ids:
+        catalog_cache.invalidate(("item", item_id))
+    invalidate_shop_item()
+    return BulkDeleteResponse(
+        deleted=len(deleted_ids),
+        not_found=sorted(set(item_ids) - set(deleted_ids))
+    )
 
 
 @router.delete("/{item_id}")
+@query_budget(3)
 def delete_shop_item(item_id: int, session: SessionDep) -> dict:
     """Delete a shop item"""
-    item = session.get(ShopItem, item_id)
-    if not item:
+    if not _delete_shop_items(session, [item_id]):
         raise HTTPException(status_code=404, detail="Shop item not found")
     
-    session.delete(item)
     session.commit()
+    invalidate_shop_item(item_id)
     return {"message": "Shop item deleted successfully"}
@@ -1,6 +1,6 @@
 """
 Utils package initialization
 """
-from .responses import SuccessResponse, ErrorResponse
+from .responses import SuccessResponse, ErrorResponse, BulkRowResult, BulkResponse
 
-__all__ = ["SuccessResponse", "ErrorResponse"]
+__all__ = ["SuccessResponse", "ErrorResponse", "BulkRowResult", "BulkResponse"]
@@ -0,0 +1,16 @@
+"""
+Helpers for set-based bulk writes
+"""
+from typing import Iterator, List, Sequence, TypeVar
+
+
+T = TypeVar("T")
+
+# Rows per executemany batch; keeps statements under SQLite's variable limit
+BULK_CHUNK_SIZE = 1000
+
+
+def chunked(rows: Sequence[T], size: int = BULK_CHUNK_SIZE) -> Iterator[List[T]]:
+    """Split a sequence into lists of at most ``size`` rows"""
+    for start in range(0, len(rows), size):
+        yield list(rows[start:start + size])
@@ -0,0 +1,156 @@
+"""
+In-process read-through cache for catalog reads
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+from sqlmodel import Session
+from app.config import settings
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after a TTL
+    
+    Keys are tuples whose first element names a namespace (for example
+    ``("item", 42)`` or ``("items", category_ids, ..., limit, cursor)``)
+    so writes can drop a whole family of listing pages at once.
+    """
+    
+    def __init__(self, maxsize: int = 1024, ttl: float = 300.0, enabled: bool = True):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.enabled = enabled and maxsize > 0
+        self._entries: "OrderedDict[Tuple[Hashable, ...], Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        # Bumped on every invalidation so a read that started before a write
+        # can't store what it loaded after the write invalidated the key
+        self.generation = 0
+    
+    def get(self, key: Tuple[Hashable, ...]) -> Optional[Any]:
+        """Return the cached value, or None on a miss or an expired entry"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                    self.evictions += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+    
+    def set(self, key: Tuple[Hashable, ...], value: Any, generation: Optional[int] = None) -> None:
+        """Store a value, evicting the least recently used entry when full
+        
+        Pass the ``generation`` read before loading the value; the value is
+        dropped if anything was invalidated in the meantime.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def invalidate(self, key: Tuple[Hashable, ...]) -> None:
+        """Drop a single entry"""
+        with self._lock:
+            self.generation += 1
+            if self._entries.pop(key, None) is not None:
+                self.invalidations += 1
+    
+    def invalidate_namespace(self, namespace: str) -> None:
+        """Drop every entry whose key starts with the given namespace"""
+        self.invalidate_matching(lambda key, value: key[0] == namespace)
+    
+    def invalidate_matching(self, predicate: Callable[[Tuple[Hashable, ...], Any], bool]) -> None:
+        """Drop every entry for which ``predicate(key, value)`` is true"""
+        with self._lock:
+            self.generation += 1
+            stale = [key for key, (_, value) in self._entries.items() if predicate(key, value)]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+    
+    def clear(self) -> None:
+        """Drop all entries and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = self.invalidations = 0
+    
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+# Shared cache for shop item and category reads; entries are
+# {"body", "etag"} dicts, plus "next_cursor" for listing pages and the
+# encoded "json" for pages built on the fast list path
+catalog_cache = TTLCache(
+    maxsize=settings.catalog_cache_maxsize,
+    ttl=settings.catalog_cache_ttl,
+    enabled=settings.catalog_cache_enabled,
+)
+
+
+def cacheable(session: Session) -> bool:
+    """Whether rows read through the session may be cached
+    
+    A replica can lag the primary, and a cached copy of a lagging read
+    would outlive the invalidation that followed the write.
+    """
+    return not session.get_bind().get_execution_options().get("replica", False)
+
+
+def invalidate_shop_item(item_id: Optional[int] = None) -> None:
+    """Drop a cached shop item and every cached item listing page"""
+    if item_id is not None:
+        catalog_cache.invalidate(("item", item_id))
+    catalog_cache.invalidate_namespace("items")
+
+
+def invalidate_category(category_id: Optional[int] = None) -> None:
+    """Drop a cached category, the category listings and items embedding it"""
+    if category_id is None:
+        # A new category isn't embedded in any item yet
+        catalog_cache.invalidate_namespace("categories")
+        return
+    
+    def affected(key, value) -> bool:
+        if key[0] in ("categories", "category"):
+            return key[0] == "categories" or key[1] == category_id
+        if key[0] == "item":
+            return any(category["id"] == category_id for category in value["body"]["categories"])
+        if key[0] == "items":
+            return category_id in key[1] or any(
+                category["id"] == category_id
+                for item in value["body"]
+                for category in item["categories"]
+            )
+        return False
+    
+    catalog_cache.invalidate_matching(affected)
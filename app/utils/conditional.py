@@ -0,0 +1,60 @@
+"""
+Conditional GET support (ETag / If-None-Match) for catalog reads
+"""
+import hashlib
+from typing import Any, Dict, Optional
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from app.config import settings
+from app.utils.fast_json import FastJSONResponse
+from app.utils.pagination import cursor_headers
+
+
+def make_etag(*parts: Any) -> str:
+    """Build a strong ETag from row IDs and versions"""
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=16).hexdigest()
+    return f'"{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Compare an If-None-Match header against an ETag
+    
+    If-None-Match uses the weak comparison, so a ``W/`` prefix sent back by
+    a proxy still matches.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(
+        candidate.strip() in (etag, f"W/{etag}")
+        for candidate in if_none_match.split(",")
+    )
+
+
+def catalog_headers(etag: str, cursor: Optional[str] = None) -> Dict[str, str]:
+    """ETag, Cache-Control and pagination headers for a catalog response"""
+    return {
+        "ETag": etag,
+        "Cache-Control": settings.catalog_cache_control,
+        **cursor_headers(cursor)
+    }
+
+
+def not_modified(if_none_match: Optional[str], etag: str, cursor: Optional[str] = None) -> Optional[Response]:
+    """Return a 304 response if the client already has this version, else None"""
+    if not etag_matches(if_none_match, etag):
+        return None
+    return Response(status_code=304, headers=catalog_headers(etag, cursor))
+
+
+def conditional_response(entry: Dict[str, Any], if_none_match: Optional[str]) -> Response:
+    """Answer from a catalog cache entry, with a 304 if the client's copy is current"""
+    cursor = entry.get("next_cursor")
+    response = not_modified(if_none_match, entry["etag"], cursor)
+    if response is not None:
+        return response
+    # Pages built on the fast list path keep their encoded JSON as well
+    if "json" in entry:
+        return FastJSONResponse(entry["json"], headers=catalog_headers(entry["etag"], cursor))
+    return JSONResponse(entry["body"], headers=catalog_headers(entry["etag"], cursor))
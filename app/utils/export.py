@@ -0,0 +1,81 @@
+"""
+Streaming export helpers
+"""
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, Sequence
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Engine
+from sqlmodel import Session
+
+
+# Supported export formats and their media types
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+EXPORT_FORMAT_PATTERN = "^(ndjson|csv)$"
+
+# Rows fetched from the cursor per round trip, and records per written chunk
+EXPORT_BATCH_SIZE = 1000
+
+
+def iter_rows(bind: Engine, statement, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[Any]:
+    """Iterate over a query's rows with a dedicated session and yield_per
+    
+    The session outlives the request's own session, which is closed before
+    a streaming response body is sent. Rows are fetched in batches through
+    a server-side cursor so memory stays flat for any table size.
+    """
+    with Session(bind) as session:
+        result = session.exec(statement.execution_options(yield_per=batch_size))
+        yield from result
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def encode_ndjson(records: Iterable[Dict[str, Any]], batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[bytes]:
+    """Encode records as newline-delimited JSON in chunks"""
+    lines = []
+    for record in records:
+        lines.append(json.dumps(record, default=_json_default, separators=(",", ":")))
+        if len(lines) >= batch_size:
+            yield ("\n".join(lines) + "\n").encode()
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode()
+
+
+def encode_csv(
+    header: Sequence[str],
+    rows: Iterable[Sequence[Any]],
+    batch_size: int = EXPORT_BATCH_SIZE
+) -> Iterator[bytes]:
+    """Encode rows as CSV with a header line in chunks"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    pending = 0
+    for row in rows:
+        writer.writerow(
+            value.isoformat() if isinstance(value, datetime) else value for value in row
+        )
+        pending += 1
+        if pending >= batch_size:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    yield buffer.getvalue().encode()
+
+
+def export_response(chunks: Iterator[bytes], export_format: str, filename: str) -> StreamingResponse:
+    """Wrap encoded chunks in a streaming download response"""
+    return StreamingResponse(
+        chunks,
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{export_format}"'}
+    )
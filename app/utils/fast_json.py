@@ -0,0 +1,72 @@
+"""
+High-throughput JSON for list responses
+
+With ``SHOP_FAST_LIST_RESPONSES`` the list handlers select plain column
+rows, build the response dicts directly in the response model's field
+order and encode them with orjson, skipping ORM objects and the second
+round of response_model validation. The bytes sent are the same as on the
+default path. orjson is optional; without it the stdlib encoder is used.
+"""
+import json
+from datetime import datetime
+from typing import Any, Iterable
+from fastapi.responses import JSONResponse
+from app.config import RuntimeSetting
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# json.dumps writes floats outside this range in exponent form (1e+16,
+# 1e-05) and orjson doesn't (1e16, 0.00001); inside it the two agree
+PLAIN_FLOAT_MIN = 1e-4
+PLAIN_FLOAT_MAX = 1e16
+
+
+fast_list_responses = RuntimeSetting("fast_list_responses")
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _plain_floats(floats: Iterable[float]) -> bool:
+    """Whether json.dumps writes all of these floats without an exponent"""
+    magnitudes = [abs(value) for value in floats if value]
+    return not magnitudes or (min(magnitudes) >= PLAIN_FLOAT_MIN and max(magnitudes) < PLAIN_FLOAT_MAX)
+
+
+def encode_json(content: Any, floats: Iterable[float] = ()) -> bytes:
+    """Encode content exactly as JSONResponse would, with orjson when that's safe
+    
+    ``floats`` are the float values in ``content``; if any of them would be
+    written differently the stdlib encoder is used for the whole body.
+    Datetimes are written in ISO 8601, as pydantic writes them.
+    """
+    if orjson is not None and _plain_floats(floats):
+        return orjson.dumps(content)
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+        default=_json_default,
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse encoded with ``encode_json``; bytes are sent as they are"""
+    
+    def __init__(self, content: Any, floats: Iterable[float] = (), **kwargs):
+        self.floats = floats
+        super().__init__(content, **kwargs)
+    
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return encode_json(content, self.floats)
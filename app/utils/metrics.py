@@ -0,0 +1,250 @@
+"""
+Request and query metrics exported in Prometheus text format
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+from sqlalchemy import Engine, event
+from app.utils.query_log import check_query_budget, slow_query_log
+
+
+# Prometheus' default latency buckets (seconds)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100)
+
+# Label used for requests that matched no route, so 404 scans can't blow up
+# the number of series
+UNMATCHED_ROUTE = "unmatched"
+
+
+class Histogram:
+    """Bucketed observations with a running sum, rendered cumulatively"""
+    
+    __slots__ = ("buckets", "counts", "total", "count")
+    
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        # One slot per bucket plus the +Inf overflow
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+    
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class RequestStats:
+    """Queries run on behalf of the current request"""
+    
+    __slots__ = ("scope", "queries", "unbudgeted", "query_time", "query_start")
+    
+    def __init__(self, scope: Optional[dict] = None):
+        self.scope = scope or {}
+        self.queries = 0
+        # Counted in ``queries`` but left out of the route's query budget
+        self.unbudgeted = 0
+        self.query_time = 0.0
+        # A request runs its statements one at a time
+        self.query_start = 0.0
+
+
+# Set by the middleware for the duration of each request; handlers running
+# in the threadpool or an async session's greenlet see the same object
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+
+@contextmanager
+def unbudgeted_queries() -> Iterator[None]:
+    """Leave the statements run inside out of the request's query budget
+    
+    For loops whose length depends on other requests, such as polling for
+    a concurrent request to finish; they still show in the metrics.
+    """
+    stats = current_request.get()
+    start = stats.queries if stats is not None else 0
+    try:
+        yield
+    finally:
+        if stats is not None:
+            stats.unbudgeted += stats.queries - start
+
+
+class MetricsRegistry:
+    """Per-route request, latency and query metrics
+    
+    Series are keyed by the route template (``/api/v1/items/{item_id}``),
+    never the raw path.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+    
+    def reset(self) -> None:
+        """Drop every series"""
+        with self._lock:
+            self.requests: Dict[Tuple[str, str, int], int] = {}
+            self.latency: Dict[Tuple[str, str], Histogram] = {}
+            self.queries: Dict[Tuple[str, str], Histogram] = {}
+            self.query_time: Dict[Tuple[str, str], float] = {}
+    
+    def record(self, method: str, route: str, status: int, duration: float, stats: RequestStats) -> None:
+        """Record one finished request"""
+        key = (method, route)
+        with self._lock:
+            self.requests[(method, route, status)] = self.requests.get((method, route, status), 0) + 1
+            latency = self.latency.get(key)
+            if latency is None:
+                latency = self.latency[key] = Histogram(LATENCY_BUCKETS)
+                self.queries[key] = Histogram(QUERY_COUNT_BUCKETS)
+                self.query_time[key] = 0.0
+            latency.observe(duration)
+            self.queries[key].observe(stats.queries)
+            self.query_time[key] += stats.query_time
+    
+    def render(self) -> str:
+        """All series in the Prometheus text exposition format"""
+        lines: List[str] = []
+        with self._lock:
+            lines.append("# HELP http_requests_total HTTP requests by route and status code")
+            lines.append("# TYPE http_requests_total counter")
+            for (method, route, status), count in sorted(self.requests.items()):
+                lines.append(f'http_requests_total{{{_labels(method, route)},status="{status}"}} {count}')
+            
+            _render_histogram(
+                lines, "http_request_duration_seconds", "HTTP request latency by route", self.latency
+            )
+            _render_histogram(
+                lines, "http_request_db_queries", "SQL statements executed per request", self.queries
+            )
+            
+            lines.append("# HELP http_request_db_seconds_total Time spent executing SQL by route")
+            lines.append("# TYPE http_request_db_seconds_total counter")
+            for (method, route), seconds in sorted(self.query_time.items()):
+                lines.append(f"http_request_db_seconds_total{{{_labels(method, route)}}} {seconds:.6f}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(method: str, route: str) -> str:
+    route = route.replace("\\", "\\\\").replace('"', '\\"')
+    return f'method="{method}",route="{route}"'
+
+
+def _render_histogram(lines: List[str], name: str, help_text: str, series: Dict[Tuple[str, str], Histogram]) -> None:
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for (method, route), histogram in sorted(series.items()):
+        labels = _labels(method, route)
+        cumulative = 0
+        for bound, count in zip((*histogram.buckets, "+Inf"), histogram.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f"{name}_sum{{{labels}}} {histogram.total:.6f}")
+        lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+
+
+metrics = MetricsRegistry()
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware timing each HTTP request and counting its queries
+    
+    Unlike ``BaseHTTPMiddleware`` it doesn't wrap the response body in a
+    stream, so it costs a dict lookup and a few timer reads per request.
+    With ``expose_query_count`` the query count and time so far are sent
+    in ``X-Query-Count`` and ``X-Query-Time-Ms`` response headers.
+    
+    The route's query budget is checked when the response starts, so in
+    raise mode an overrun still becomes a regular 500 response.
+    """
+    
+    def __init__(self, app, registry: MetricsRegistry = metrics, expose_query_count: bool = False):
+        self.app = app
+        self.registry = registry
+        self.expose_query_count = expose_query_count
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        stats = RequestStats(scope)
+        token = current_request.set(stats)
+        status = 500
+        start = time.perf_counter()
+        
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                check_query_budget(scope["method"], scope.get("route"), stats.queries - stats.unbudgeted)
+                status = message["status"]
+                if self.expose_query_count:
+                    message["headers"] = [
+                        *message.get("headers", []),
+                        (b"x-query-count", str(stats.queries).encode()),
+                        (b"x-query-time-ms", f"{stats.query_time * 1000:.3f}".encode()),
+                    ]
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_request.reset(token)
+            self.registry.record(
+                scope["method"], _route_path(scope), status, time.perf_counter() - start, stats
+            )
+
+
+def _route_path(scope: dict) -> str:
+    """Template of the route that matched; the router stores it in the scope"""
+    return getattr(scope.get("route"), "path", UNMATCHED_ROUTE)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = current_request.get()
+    if stats is not None:
+        stats.query_start = time.perf_counter()
+    else:
+        conn.info["query_start"] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    now = time.perf_counter()
+    stats = current_request.get()
+    if stats is not None:
+        duration = now - stats.query_start
+        stats.queries += 1
+        stats.query_time += duration
+    else:
+        duration = now - conn.info.pop("query_start", now)
+    
+    if duration >= slow_query_log.threshold:
+        if stats is not None:
+            slow_query_log.record(
+                statement, parameters, duration, stats.scope.get("method"), _route_path(stats.scope)
+            )
+        else:
+            slow_query_log.record(statement, parameters, duration)
+
+
+def install_query_metrics(target=Engine) -> None:
+    """Count and time SQL statements on every engine (or just ``target``)
+    
+    Statements are attributed to the request that ran them, and slow ones
+    are kept in the slow-query log.
+    """
+    if not event.contains(target, "before_cursor_execute", _before_cursor_execute):
+        event.listen(target, "before_cursor_execute", _before_cursor_execute)
+        event.listen(target, "after_cursor_execute", _after_cursor_execute)
+
+
+def remove_query_metrics(target=Engine) -> None:
+    """Undo ``install_query_metrics``"""
+    if event.contains(target, "before_cursor_execute", _before_cursor_execute):
+        event.remove(target, "before_cursor_execute", _before_cursor_execute)
+        event.remove(target, "after_cursor_execute", _after_cursor_execute)
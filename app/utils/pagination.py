@@ -0,0 +1,102 @@
+"""
+Keyset (cursor) pagination helpers
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, Callable, List, Optional, Sequence
+from fastapi import HTTPException, Response
+from sqlalchemy import tuple_
+
+
+# Response header carrying the cursor for the next page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(*values: Any) -> str:
+    """Encode key values of the last returned row into an opaque cursor"""
+    raw = json.dumps(
+        [value.isoformat() if isinstance(value, datetime) else value for value in values],
+        separators=(",", ":")
+    )
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, columns: Sequence[Any]) -> List[Any]:
+    """Decode a cursor into values typed like the given key columns"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError("cursor does not match the sort key")
+        
+        decoded = []
+        for column, value in zip(columns, values):
+            try:
+                python_type = column.type.python_type
+            except NotImplementedError:
+                # Types such as AutoString don't declare one; keep the JSON value
+                if not isinstance(value, (str, int, float)):
+                    raise ValueError("cursor value is not a scalar")
+                decoded.append(value)
+                continue
+            if python_type is datetime:
+                decoded.append(datetime.fromisoformat(value))
+            elif isinstance(value, python_type):
+                decoded.append(value)
+            else:
+                decoded.append(python_type(value))
+        return decoded
+    except (ValueError, TypeError, binascii.Error, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def paginate(query, columns: Sequence[Any], skip: int, limit: int, cursor: Optional[str]):
+    """Order a query by its key columns and apply offset or keyset paging
+    
+    With a cursor the query seeks past the last returned key instead of
+    skipping rows, so every page costs the same regardless of its depth.
+    """
+    if cursor is not None and skip:
+        raise HTTPException(status_code=400, detail="Use either skip or cursor, not both")
+    
+    query = query.order_by(*columns)
+    if cursor is not None:
+        values = decode_cursor(cursor, columns)
+        if len(columns) == 1:
+            query = query.where(columns[0] > values[0])
+        else:
+            query = query.where(tuple_(*columns) > tuple_(*values))
+    elif skip:
+        query = query.offset(skip)
+    
+    return query.limit(limit)
+
+
+def next_cursor(
+    rows: Sequence[Any],
+    limit: int,
+    key: Callable[[Any], Sequence[Any]]
+) -> Optional[str]:
+    """Cursor for the page after ``rows``, or None when this is the last page"""
+    if rows and len(rows) == limit:
+        return encode_cursor(*key(rows[-1]))
+    return None
+
+
+def set_next_cursor(
+    response: Response,
+    rows: Sequence[Any],
+    limit: int,
+    key: Callable[[Any], Sequence[Any]]
+) -> None:
+    """Expose the cursor for the next page when the current page is full"""
+    cursor = next_cursor(rows, limit, key)
+    if cursor is not None:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
+
+
+def cursor_headers(cursor: Optional[str]) -> dict:
+    """Headers for a response built directly rather than through FastAPI"""
+    return {NEXT_CURSOR_HEADER: cursor} if cursor is not None else {}
@@ -0,0 +1,105 @@
+"""
+Slow-query log and per-route query budgets
+"""
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, List, Optional
+from pydantic import BaseModel
+from app.config import RuntimeSetting, settings
+
+
+logger = logging.getLogger(__name__)
+
+# Parameters are stored as a repr cut to this length, so a bulk insert's
+# executemany batch can't pin megabytes in the log
+MAX_PARAMETERS_LENGTH = 1000
+
+
+class SlowQuery(BaseModel):
+    """A statement that took longer than the slow-query threshold"""
+    statement: str
+    parameters: str
+    duration_ms: float
+    method: Optional[str] = None
+    route: Optional[str] = None
+    recorded_at: datetime
+
+
+class SlowQueryLog:
+    """Bounded ring buffer of the most recent slow statements"""
+    
+    def __init__(self, threshold_ms: float = 200.0, maxsize: int = 100):
+        self.threshold = threshold_ms / 1000
+        self._entries: "deque[SlowQuery]" = deque(maxlen=maxsize)
+        self._lock = threading.Lock()
+    
+    def record(
+        self,
+        statement: str,
+        parameters: Any,
+        duration: float,
+        method: Optional[str] = None,
+        route: Optional[str] = None
+    ) -> None:
+        """Keep a statement that ran for ``duration`` seconds"""
+        parameters = repr(parameters)
+        if len(parameters) > MAX_PARAMETERS_LENGTH:
+            parameters = parameters[:MAX_PARAMETERS_LENGTH] + "..."
+        entry = SlowQuery(
+            statement=statement,
+            parameters=parameters,
+            duration_ms=round(duration * 1000, 3),
+            method=method,
+            route=route,
+            recorded_at=datetime.utcnow(),
+        )
+        with self._lock:
+            self._entries.append(entry)
+    
+    def entries(self) -> List[SlowQuery]:
+        """Recorded statements, newest first"""
+        with self._lock:
+            return list(reversed(self._entries))
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+slow_query_log = SlowQueryLog(settings.slow_query_ms, settings.slow_query_log_size)
+
+
+class QueryBudgetExceeded(Exception):
+    """A handler issued more SQL statements than its budget allows"""
+
+
+def query_budget(max_queries: int) -> Callable[[Callable], Callable]:
+    """Declare how many SQL statements a route handler may issue per request
+    
+    Apply below the route decorator. The metrics middleware checks the
+    budget when the handler's response starts.
+    """
+    def decorator(endpoint: Callable) -> Callable:
+        endpoint.query_budget = max_queries
+        return endpoint
+    return decorator
+
+
+# What to do when a handler goes over its budget: "raise" (used by the
+# tests) fails the request with QueryBudgetExceeded, "log" logs a warning,
+# "off" skips the check
+query_budget_mode = RuntimeSetting("query_budget_mode")
+
+
+def check_query_budget(method: str, route: Any, queries: int) -> None:
+    """Enforce the budget of the route that served a request"""
+    budget = getattr(getattr(route, "endpoint", None), "query_budget", None)
+    if budget is None or queries <= budget or query_budget_mode.value == "off":
+        return
+    
+    message = f"{method} {route.path} issued {queries} queries, over its budget of {budget}"
+    if query_budget_mode.value == "raise":
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
@@ -1,7 +1,7 @@
 """
 Common response models
 """
-from typing import Any, Optional
+from typing import Any, List, Optional
 from pydantic import BaseModel
 
 
@@ -17,3 +17,25 @@ class ErrorResponse(BaseModel):
     success: bool = False
     error: str
     details: Optional[str] = None
+
+
+class BulkRowResult(BaseModel):
+    """Outcome of a single record in a bulk request"""
+    index: int
+    status: str
+    id: Optional[int] = None
+    detail: Optional[str] = None
+
+
+class BulkResponse(BaseModel):
+    """Bulk request response with per-row results in request order"""
+    created: int = 0
+    updated: int = 0
+    failed: int = 0
+    results: List[BulkRowResult]
+
+
+class BulkDeleteResponse(BaseModel):
+    """Bulk delete response: how many rows were deleted and the IDs that weren't found"""
+    deleted: int = 0
+    not_found: List[int] = []
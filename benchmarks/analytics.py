@@ -0,0 +1,134 @@
+"""
+90-day sales reports from rollups versus aggregating order lines directly
+
+Run with: python -m benchmarks.analytics [--lines 10000000]
+"""
+import argparse
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from fastapi.testclient import TestClient
+from sqlmodel import Session, SQLModel, create_engine, insert, select, func
+from app.main import app
+from app.database import get_session, get_read_session
+from app.database.rollups import backfill_rollups
+from app.models import (
+    Customer, Order, OrderItem, ShopItem, ShopItemCategory, ShopItemCategoryAssociation
+)
+
+
+ITEM_COUNT = 5_000
+CATEGORY_COUNT = 50
+LINES_PER_ORDER = 5
+DAYS = 365
+CHUNK_SIZE = 20_000
+REPEATS = 5
+
+
+def _seed(session: Session, lines: int) -> None:
+    """Bulk insert a catalog and a year of orders with the requested number of lines"""
+    rng = random.Random(42)
+    session.add(Customer(name="Bench", surname="User", email="bench@example.com"))
+    session.exec(insert(ShopItemCategory), params=[
+        {"title": f"Category {n}", "description": "Category"} for n in range(CATEGORY_COUNT)
+    ])
+    session.exec(insert(ShopItem), params=[
+        {"title": f"Item {n}", "description": "Item", "price": float(1 + n % 100)}
+        for n in range(ITEM_COUNT)
+    ])
+    session.exec(insert(ShopItemCategoryAssociation), params=[
+        {"shop_item_id": n + 1, "category_id": n % CATEGORY_COUNT + 1} for n in range(ITEM_COUNT)
+    ])
+    
+    first_day = datetime.utcnow() - timedelta(days=DAYS)
+    orders = lines // LINES_PER_ORDER
+    for start in range(0, orders, CHUNK_SIZE):
+        stop = min(start + CHUNK_SIZE, orders)
+        session.exec(insert(Order), params=[
+            {
+                "customer_id": 1,
+                "created_at": first_day + timedelta(seconds=DAYS * 86400 * n / orders),
+                "total_amount": 0.0, "item_count": LINES_PER_ORDER
+            }
+            for n in range(start, stop)
+        ])
+        session.exec(insert(OrderItem), params=[
+            {
+                "order_id": order_id + 1, "shop_item_id": rng.randrange(ITEM_COUNT) + 1,
+                "quantity": 1, "unit_price": 9.99
+            }
+            for order_id in range(start, stop)
+            for _ in range(LINES_PER_ORDER)
+        ])
+    session.commit()
+
+
+def _median_ms(run_once) -> float:
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        run_once()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def run(lines: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = create_engine(f"sqlite:///{Path(tmp_dir) / 'bench.db'}")
+        SQLModel.metadata.create_all(engine)
+        start = time.perf_counter()
+        with Session(engine) as session:
+            _seed(session, lines)
+        print(f"seeded {lines} order lines in {time.perf_counter() - start:.1f} s")
+        
+        start = time.perf_counter()
+        with Session(engine) as session:
+            backfill_rollups(session)
+        print(f"backfilled rollups in {time.perf_counter() - start:.1f} s")
+        
+        def get_session_override():
+            with Session(engine) as session:
+                yield session
+        
+        app.dependency_overrides[get_session] = get_session_override
+        app.dependency_overrides[get_read_session] = get_session_override
+        client = TestClient(app)
+        
+        since = datetime.utcnow() - timedelta(days=90)
+        day = func.date(Order.created_at)
+        direct_queries = {
+            "revenue": select(day, func.count(func.distinct(Order.id)), func.sum(OrderItem.quantity * OrderItem.unit_price))
+            .join(OrderItem, OrderItem.order_id == Order.id)
+            .where(Order.created_at >= since).group_by(day),
+            "top-items": select(OrderItem.shop_item_id, func.sum(OrderItem.quantity * OrderItem.unit_price).label("revenue"))
+            .join(Order, Order.id == OrderItem.order_id)
+            .where(Order.created_at >= since)
+            .group_by(OrderItem.shop_item_id).order_by(func.sum(OrderItem.quantity * OrderItem.unit_price).desc()).limit(10),
+        }
+        
+        print(f"{'report':>15} {'rollup ms':>10} {'direct ms':>10}")
+        for report in ("revenue", "top-items", "top-categories"):
+            def rollup_report():
+                response = client.get(f"/api/v1/analytics/{report}")
+                assert response.status_code == 200, response.text
+            
+            direct = direct_queries.get(report)
+            
+            def direct_report():
+                with Session(engine) as session:
+                    session.exec(direct).all()
+            
+            direct_ms = f"{_median_ms(direct_report):>10.2f}" if direct is not None else f"{'-':>10}"
+            print(f"{report:>15} {_median_ms(rollup_report):>10.2f} {direct_ms}")
+        
+        app.dependency_overrides.clear()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lines", type=int, default=10_000_000, help="Number of order lines to seed")
+    run(parser.parse_args().lines)
@@ -0,0 +1,122 @@
+"""
+Sync versus async database stack under the same load generator
+
+Each stack serves item reads, list pages and price updates with the
+catalog cache off, so every request reaches the database.
+
+Run with: python -m benchmarks.async_stack [--requests 2000] [--concurrency 64]
+"""
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from dataclasses import replace
+from pathlib import Path
+import httpx
+from fastapi import FastAPI
+from sqlmodel import Session, SQLModel, insert
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.config import settings
+from app.database import (
+    create_db_engine, create_async_db_engine,
+    get_session, get_read_session, get_async_session, get_async_read_session
+)
+from app.models import ShopItem
+from app.routers import shop_items_router, make_async_router
+from app.utils.cache import catalog_cache
+
+
+ITEM_COUNT = 1000
+
+# Request for the n-th call of each workload
+WORKLOADS = {
+    "get": lambda client, n: client.get(f"/api/v1/items/{n % ITEM_COUNT + 1}"),
+    "list": lambda client, n: client.get(f"/api/v1/items/?skip={n % (ITEM_COUNT - 20)}&limit=20"),
+    "update": lambda client, n: client.put(
+        f"/api/v1/items/{n % ITEM_COUNT + 1}", json={"price": 9.99 + n % 100 / 100}
+    ),
+}
+
+
+def _build_apps(db_path: Path):
+    """Build one app per stack, both backed by the same database file"""
+    config = replace(settings, database_url=f"sqlite:///{db_path}", db_pool_size=40)
+    sync_engine = create_db_engine(config)
+    SQLModel.metadata.create_all(sync_engine)
+    with Session(sync_engine) as session:
+        session.exec(
+            insert(ShopItem),
+            params=[
+                {"title": f"Item {i}", "description": "Benchmark item", "price": 9.99}
+                for i in range(ITEM_COUNT)
+            ]
+        )
+        session.commit()
+    async_engine = create_async_db_engine(config)
+    
+    def get_session_override():
+        with Session(sync_engine) as session:
+            yield session
+    
+    async def get_async_session_override():
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            yield session
+    
+    sync_app = FastAPI()
+    sync_app.include_router(shop_items_router, prefix="/api/v1")
+    sync_app.dependency_overrides[get_session] = get_session_override
+    sync_app.dependency_overrides[get_read_session] = get_session_override
+    
+    async_app = FastAPI()
+    async_app.include_router(make_async_router(shop_items_router), prefix="/api/v1")
+    async_app.dependency_overrides[get_async_session] = get_async_session_override
+    async_app.dependency_overrides[get_async_read_session] = get_async_session_override
+    
+    return {"sync": sync_app, "async": async_app}
+
+
+async def _load(app: FastAPI, workload: str, requests: int, concurrency: int):
+    """Issue one workload's requests with a fixed number of concurrent clients"""
+    timings = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def worker(worker_id: int):
+            for n in range(worker_id, requests, concurrency):
+                start = time.perf_counter()
+                response = await WORKLOADS[workload](client, n)
+                timings.append((time.perf_counter() - start) * 1000)
+                assert response.status_code == 200, response.text
+        
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(n) for n in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    
+    timings.sort()
+    return requests / elapsed, statistics.median(timings), timings[int(len(timings) * 0.99) - 1]
+
+
+def run(requests: int, concurrency: int) -> None:
+    # Both stacks share the process-wide cache; with it on, whichever runs
+    # second would mostly measure cache hits
+    cache_enabled = catalog_cache.enabled
+    catalog_cache.enabled = False
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            apps = _build_apps(Path(tmp_dir) / "bench.db")
+            print(f"{'workload':>8} {'stack':>6} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8}")
+            for workload in WORKLOADS:
+                for name, app in apps.items():
+                    catalog_cache.clear()
+                    rps, p50, p99 = asyncio.run(_load(app, workload, requests, concurrency))
+                    print(f"{workload:>8} {name:>6} {rps:>8.0f} {p50:>8.2f} {p99:>8.2f}")
+    finally:
+        catalog_cache.enabled = cache_enabled
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000, help="Total requests per stack")
+    parser.add_argument("--concurrency", type=int, default=64, help="Concurrent clients")
+    args = parser.parse_args()
+    run(args.requests, args.concurrency)
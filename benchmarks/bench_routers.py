@@ -0,0 +1,338 @@
+"""
+Microbenchmarks for every router function, for comparing branches
+
+Each benchmark calls a handler directly on a fresh session, as one request
+would, against a generated "small" dataset; HTTP and middleware costs are
+left out. The catalog cache is disabled so reads hit the database.
+
+Run with: pytest benchmarks/bench_routers.py [--benchmark-autosave]
+Compare:  pytest benchmarks/bench_routers.py --benchmark-compare
+"""
+from datetime import date, timedelta
+from itertools import count
+import pytest
+from fastapi import Response
+from sqlmodel import Session
+from app.models import (
+    CustomerCreate, CustomerUpdate, CategoryCreate, CategoryUpdate,
+    ShopItemCreate, ShopItemUpdate, OrderCreate, OrderUpdate
+)
+from app.routers import analytics, categories, customers, orders, shop_items
+from app.utils.cache import catalog_cache
+from benchmarks.generator import SCALES, create_database
+
+
+pytest.importorskip("pytest_benchmark")
+
+SCALE = SCALES["small"]
+REPORT_START = date.today() - timedelta(days=89)
+
+# Keeps generated emails and titles unique across benchmark rounds
+_serial = count()
+
+
+@pytest.fixture(scope="module")
+def engine(tmp_path_factory):
+    """A generated dataset shared by every benchmark in the module"""
+    engine = create_database(f"sqlite:///{tmp_path_factory.mktemp('bench') / 'bench.db'}", SCALE)
+    cache_enabled = catalog_cache.enabled
+    catalog_cache.enabled = False
+    yield engine
+    catalog_cache.enabled = cache_enabled
+    engine.dispose()
+
+
+@pytest.fixture
+def call(engine):
+    """Run a handler on its own session, like a request would"""
+    def call_handler(handler, **kwargs):
+        with Session(engine) as session:
+            return handler(session=session, **kwargs)
+    return call_handler
+
+
+def _new_customer(call) -> int:
+    return call(customers.create_customer, customer=CustomerCreate(
+        name="Bench", surname="User", email=f"bench{next(_serial)}@example.com"
+    ))["id"]
+
+
+def _created_ids(response) -> tuple:
+    """Handler arguments for a bulk delete of the rows a bulk create made"""
+    return ([result.id for result in response.results],), {}
+
+
+def _order(item_ids):
+    return OrderCreate(
+        customer_id=1, items=[{"shop_item_id": item_id, "quantity": 1} for item_id in item_ids]
+    )
+
+
+# Customers
+
+@pytest.mark.benchmark(group="customers")
+def test_list_customers(benchmark, call):
+    benchmark(call, customers.list_customers, response=Response(), skip=0, limit=100, cursor=None)
+
+
+@pytest.mark.benchmark(group="customers")
+def test_get_customer(benchmark, call):
+    benchmark(call, customers.get_customer, customer_id=SCALE.customers // 2)
+
+
+@pytest.mark.benchmark(group="customers")
+def test_list_customer_orders(benchmark, call):
+    benchmark(
+        call, customers.list_customer_orders,
+        customer_id=42, response=Response(), skip=0, limit=20, cursor=None
+    )
+
+
+@pytest.mark.benchmark(group="customers")
+def test_create_customer(benchmark, call):
+    benchmark(_new_customer, call)
+
+
+@pytest.mark.benchmark(group="customers")
+def test_bulk_create_customers(benchmark, call):
+    def bulk_create():
+        call(customers.bulk_create_customers, on_conflict="error", customers=[
+            CustomerCreate(name="Bulk", surname="User", email=f"bulk{next(_serial)}@example.com")
+            for _ in range(100)
+        ])
+    benchmark(bulk_create)
+
+
+@pytest.mark.benchmark(group="customers")
+def test_update_customer(benchmark, call):
+    benchmark(call, customers.update_customer, customer_id=1, customer=CustomerUpdate(name="Renamed"))
+
+
+@pytest.mark.benchmark(group="customers")
+def test_delete_customer(benchmark, call):
+    benchmark.pedantic(
+        lambda customer_id: call(customers.delete_customer, customer_id=customer_id),
+        setup=lambda: ((_new_customer(call),), {}),
+        rounds=100
+    )
+
+
+@pytest.mark.benchmark(group="customers")
+def test_bulk_delete_customers(benchmark, call):
+    def new_customers():
+        return _created_ids(call(customers.bulk_create_customers, on_conflict="error", customers=[
+            CustomerCreate(name="Doomed", surname="User", email=f"doomed{next(_serial)}@example.com")
+            for _ in range(100)
+        ]))
+    benchmark.pedantic(
+        lambda customer_ids: call(customers.bulk_delete_customers, customer_ids=customer_ids),
+        setup=new_customers,
+        rounds=20
+    )
+
+
+# Categories
+
+@pytest.mark.benchmark(group="categories")
+def test_list_categories(benchmark, call):
+    benchmark(call, categories.list_categories, skip=0, limit=100, cursor=None, if_none_match=None)
+
+
+@pytest.mark.benchmark(group="categories")
+def test_get_category(benchmark, call):
+    benchmark(call, categories.get_category, category_id=1, if_none_match=None)
+
+
+@pytest.mark.benchmark(group="categories")
+def test_create_category(benchmark, call):
+    benchmark(call, categories.create_category, category=CategoryCreate(title="Bench", description="Bench"))
+
+
+@pytest.mark.benchmark(group="categories")
+def test_bulk_create_categories(benchmark, call):
+    benchmark(call, categories.bulk_create_categories, categories=[
+        CategoryCreate(title=f"Bulk {n}", description="Bulk") for n in range(100)
+    ])
+
+
+@pytest.mark.benchmark(group="categories")
+def test_update_category(benchmark, call):
+    benchmark(call, categories.update_category, category_id=1, category=CategoryUpdate(description="Edited"))
+
+
+@pytest.mark.benchmark(group="categories")
+def test_delete_category(benchmark, call):
+    def new_category():
+        category = call(categories.create_category, category=CategoryCreate(title="Doomed", description="Doomed"))
+        return (category["id"],), {}
+    benchmark.pedantic(
+        lambda category_id: call(categories.delete_category, category_id=category_id),
+        setup=new_category,
+        rounds=100
+    )
+
+
+@pytest.mark.benchmark(group="categories")
+def test_bulk_delete_categories(benchmark, call):
+    def new_categories():
+        return _created_ids(call(categories.bulk_create_categories, categories=[
+            CategoryCreate(title=f"Doomed {n}", description="Doomed") for n in range(100)
+        ]))
+    benchmark.pedantic(
+        lambda category_ids: call(categories.bulk_delete_categories, category_ids=category_ids),
+        setup=new_categories,
+        rounds=20
+    )
+
+
+# Shop items
+
+def _list_items(call, **filters):
+    params = {
+        "category_id": None, "category_ids": None, "category_match": "any",
+        "min_price": None, "max_price": None, "sort": "id",
+        "skip": 0, "limit": 20, "cursor": None, "if_none_match": None,
+    }
+    return call(shop_items.list_shop_items, **{**params, **filters})
+
+
+@pytest.mark.benchmark(group="items")
+def test_list_shop_items(benchmark, call):
+    benchmark(_list_items, call)
+
+
+@pytest.mark.benchmark(group="items")
+def test_list_shop_items_by_category_and_price(benchmark, call):
+    benchmark(_list_items, call, category_ids=[3], min_price=10.0, max_price=100.0, sort="price")
+
+
+@pytest.mark.benchmark(group="items")
+def test_search_shop_items(benchmark, call):
+    benchmark(
+        call, shop_items.search_shop_items,
+        response=Response(), q="wireless lamp", skip=0, limit=20, cursor=None
+    )
+
+
+@pytest.mark.benchmark(group="items")
+def test_get_shop_item(benchmark, call):
+    benchmark(call, shop_items.get_shop_item, item_id=SCALE.items // 2, if_none_match=None)
+
+
+@pytest.mark.benchmark(group="items")
+def test_create_shop_item(benchmark, call):
+    benchmark(call, shop_items.create_shop_item, item=ShopItemCreate(
+        title="Bench item", description="Bench", price=9.99, category_ids=[1, 2, 3]
+    ))
+
+
+@pytest.mark.benchmark(group="items")
+def test_bulk_create_shop_items(benchmark, call):
+    benchmark(call, shop_items.bulk_create_shop_items, items=[
+        ShopItemCreate(title=f"Bulk {n}", description="Bulk", price=1.0, category_ids=[1])
+        for n in range(100)
+    ])
+
+
+@pytest.mark.benchmark(group="items")
+def test_update_shop_item(benchmark, call):
+    benchmark(call, shop_items.update_shop_item, item_id=1, item=ShopItemUpdate(
+        price=19.99, category_ids=[1, 2, 3]
+    ))
+
+
+@pytest.mark.benchmark(group="items")
+def test_delete_shop_item(benchmark, call):
+    def new_item():
+        item = call(shop_items.create_shop_item, item=ShopItemCreate(title="Doomed", description="Doomed", price=1.0))
+        return (item["id"],), {}
+    benchmark.pedantic(
+        lambda item_id: call(shop_items.delete_shop_item, item_id=item_id),
+        setup=new_item,
+        rounds=100
+    )
+
+
+@pytest.mark.benchmark(group="items")
+def test_bulk_delete_shop_items(benchmark, call):
+    def new_items():
+        return _created_ids(call(shop_items.bulk_create_shop_items, items=[
+            ShopItemCreate(title=f"Doomed {n}", description="Doomed", price=1.0, category_ids=[1])
+            for n in range(100)
+        ]))
+    benchmark.pedantic(
+        lambda item_ids: call(shop_items.bulk_delete_shop_items, item_ids=item_ids),
+        setup=new_items,
+        rounds=20
+    )
+
+
+# Orders
+
+@pytest.mark.benchmark(group="orders")
+def test_list_orders(benchmark, call):
+    benchmark(call, orders.list_orders, response=Response(), customer_id=None, skip=0, limit=100, cursor=None)
+
+
+@pytest.mark.benchmark(group="orders")
+def test_get_order(benchmark, call):
+    benchmark(call, orders.get_order, order_id=SCALE.orders // 2)
+
+
+@pytest.mark.benchmark(group="orders")
+def test_create_order(benchmark, call):
+    benchmark(call, orders.create_order, order=_order(range(1, 11)), idempotency_key=None)
+
+
+@pytest.mark.benchmark(group="orders")
+def test_create_order_idempotent_replay(benchmark, call):
+    order = _order(range(1, 11))
+    call(orders.create_order, order=order, idempotency_key="bench-replay")
+    benchmark(call, orders.create_order, order=order, idempotency_key="bench-replay")
+
+
+@pytest.mark.benchmark(group="orders")
+def test_update_order(benchmark, call):
+    benchmark(call, orders.update_order, order_id=1, order=OrderUpdate(items=_order(range(1, 11)).items))
+
+
+@pytest.mark.benchmark(group="orders")
+def test_delete_order(benchmark, call):
+    def new_order():
+        return (call(orders.create_order, order=_order([1, 2, 3]), idempotency_key=None)["id"],), {}
+    benchmark.pedantic(
+        lambda order_id: call(orders.delete_order, order_id=order_id),
+        setup=new_order,
+        rounds=100
+    )
+
+
+@pytest.mark.benchmark(group="orders")
+def test_bulk_delete_orders(benchmark, call):
+    def new_orders():
+        return ([
+            call(orders.create_order, order=_order([1, 2, 3]), idempotency_key=None)["id"]
+            for _ in range(20)
+        ],), {}
+    benchmark.pedantic(
+        lambda order_ids: call(orders.bulk_delete_orders, order_ids=order_ids),
+        setup=new_orders,
+        rounds=20
+    )
+
+
+# Analytics
+
+@pytest.mark.benchmark(group="analytics")
+def test_revenue_by_day(benchmark, call):
+    benchmark(call, analytics.revenue_by_day, start=REPORT_START, end=None)
+
+
+@pytest.mark.benchmark(group="analytics")
+def test_top_items(benchmark, call):
+    benchmark(call, analytics.top_items, start=REPORT_START, end=None, limit=10)
+
+
+@pytest.mark.benchmark(group="analytics")
+def test_top_categories(benchmark, call):
+    benchmark(call, analytics.top_categories, start=REPORT_START, end=None, limit=10)
@@ -0,0 +1,69 @@
+"""
+Catalog import time: one POST per item versus the bulk endpoint
+
+Run with: python -m benchmarks.bulk_import [--items 100000] [--batch 10000]
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+from fastapi.testclient import TestClient
+from sqlmodel import Session, SQLModel, create_engine
+from app.main import app
+from app.database import get_session, get_read_session
+
+
+CATEGORY_COUNT = 20
+SINGLE_SAMPLE = 500
+
+
+def _item(n: int) -> dict:
+    return {
+        "title": f"Item {n}",
+        "description": "Imported item",
+        "price": 1.0 + n % 100,
+        "category_ids": [n % CATEGORY_COUNT + 1, (n + 1) % CATEGORY_COUNT + 1]
+    }
+
+
+def run(items: int, batch: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = create_engine(f"sqlite:///{Path(tmp_dir) / 'bench.db'}")
+        SQLModel.metadata.create_all(engine)
+        
+        def get_session_override():
+            with Session(engine) as session:
+                yield session
+        
+        app.dependency_overrides[get_session] = get_session_override
+        app.dependency_overrides[get_read_session] = get_session_override
+        client = TestClient(app)
+        client.post("/api/v1/categories:bulk", json=[
+            {"title": f"Category {n}", "description": "Category"} for n in range(CATEGORY_COUNT)
+        ])
+        
+        start = time.perf_counter()
+        for n in range(SINGLE_SAMPLE):
+            assert client.post("/api/v1/items/", json=_item(n)).status_code == 201
+        single_rate = SINGLE_SAMPLE / (time.perf_counter() - start)
+        
+        start = time.perf_counter()
+        for offset in range(0, items, batch):
+            payload = [_item(n) for n in range(offset, min(offset + batch, items))]
+            response = client.post("/api/v1/items:bulk", json=payload)
+            assert response.status_code == 200, response.text
+        bulk_seconds = time.perf_counter() - start
+        
+        print(f"single POST: {single_rate:.0f} items/s, {items / single_rate:.1f} s projected for {items} items")
+        print(f"bulk import: {items / bulk_seconds:.0f} items/s, {bulk_seconds:.1f} s for {items} items")
+        
+        app.dependency_overrides.clear()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=100_000, help="Items to import")
+    parser.add_argument("--batch", type=int, default=10_000, help="Items per bulk request")
+    args = parser.parse_args()
+    run(args.items, args.batch)
@@ -0,0 +1,86 @@
+"""
+Catalog read latency with the read-through cache off and on
+
+Run with: python -m benchmarks.catalog_cache [--requests 5000]
+"""
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+from fastapi.testclient import TestClient
+from sqlmodel import Session, SQLModel, create_engine
+from app.main import app
+from app.database import get_session, get_read_session
+from app.utils.cache import catalog_cache
+
+
+ITEM_COUNT = 10_000
+CATEGORY_COUNT = 50
+
+
+def _percentile(timings, fraction: float) -> float:
+    return timings[min(len(timings) - 1, int(len(timings) * fraction))]
+
+
+def _read_mix(client: TestClient, requests: int, seed: int = 42):
+    """Item lookups, category lookups and category listings, skewed to hot rows"""
+    rng = random.Random(seed)
+    timings = []
+    for _ in range(requests):
+        roll = rng.random()
+        if roll < 0.6:
+            path = f"/api/v1/items/{int(rng.paretovariate(1.2)) % ITEM_COUNT + 1}"
+        elif roll < 0.8:
+            path = f"/api/v1/categories/{rng.randrange(CATEGORY_COUNT) + 1}"
+        else:
+            path = f"/api/v1/items/?category_id={rng.randrange(CATEGORY_COUNT) + 1}&limit=50"
+        start = time.perf_counter()
+        response = client.get(path)
+        timings.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200, response.text
+    timings.sort()
+    return timings
+
+
+def run(requests: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = create_engine(f"sqlite:///{Path(tmp_dir) / 'bench.db'}")
+        SQLModel.metadata.create_all(engine)
+        
+        def get_session_override():
+            with Session(engine) as session:
+                yield session
+        
+        app.dependency_overrides[get_session] = get_session_override
+        app.dependency_overrides[get_read_session] = get_session_override
+        client = TestClient(app)
+        client.post("/api/v1/categories:bulk", json=[
+            {"title": f"Category {n}", "description": "Category"} for n in range(CATEGORY_COUNT)
+        ])
+        client.post("/api/v1/items:bulk", json=[
+            {
+                "title": f"Item {n}", "description": "Benchmark item", "price": 9.99,
+                "category_ids": [n % CATEGORY_COUNT + 1]
+            }
+            for n in range(ITEM_COUNT)
+        ])
+        
+        print(f"{'cache':>6} {'p50 ms':>8} {'p99 ms':>8} {'hit ratio':>10}")
+        for enabled in (False, True):
+            catalog_cache.clear()
+            catalog_cache.enabled = enabled
+            timings = _read_mix(client, requests)
+            print(
+                f"{'on' if enabled else 'off':>6} {_percentile(timings, 0.5):>8.2f}"
+                f" {_percentile(timings, 0.99):>8.2f} {catalog_cache.stats()['hit_ratio']:>10.2f}"
+            )
+        
+        app.dependency_overrides.clear()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=5000, help="Requests per run")
+    run(parser.parse_args().requests)
@@ -0,0 +1,68 @@
+"""
+Concurrent writer throughput for the default and the tuned SQLite setup
+
+Run with: python -m benchmarks.concurrent_writes [--writers 8] [--commits 200]
+"""
+import argparse
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from pathlib import Path
+from sqlmodel import Session, SQLModel
+from app.config import settings
+from app.database import create_db_engine
+from app.models import Customer
+
+
+# Rollback journal with full fsync, as the engine behaved before tuning
+BASELINE = {"sqlite_journal_mode": "DELETE", "sqlite_synchronous": "FULL"}
+TUNED = {}
+
+
+def _writer(engine, writer_id: int, commits: int) -> None:
+    """Insert and commit one customer at a time, like create_customer"""
+    for i in range(commits):
+        with Session(engine) as session:
+            session.add(Customer(
+                name="Writer", surname=str(writer_id),
+                email=f"writer{writer_id}-{i}@example.com"
+            ))
+            session.commit()
+
+
+def _throughput(db_path: Path, overrides: dict, writers: int, commits: int) -> float:
+    config = replace(
+        settings,
+        database_url=f"sqlite:///{db_path}",
+        db_pool_size=writers,
+        **overrides
+    )
+    engine = create_db_engine(config)
+    SQLModel.metadata.create_all(engine)
+    
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=writers) as pool:
+        futures = [pool.submit(_writer, engine, n, commits) for n in range(writers)]
+        for future in futures:
+            future.result()
+    elapsed = time.perf_counter() - start
+    
+    engine.dispose()
+    return writers * commits / elapsed
+
+
+def run(writers: int, commits: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        print(f"{'setup':>10} {'commits/s':>10}")
+        for name, overrides in (("baseline", BASELINE), ("tuned", TUNED)):
+            rate = _throughput(Path(tmp_dir) / f"{name}.db", overrides, writers, commits)
+            print(f"{name:>10} {rate:>10.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--writers", type=int, default=8, help="Concurrent writer threads")
+    parser.add_argument("--commits", type=int, default=200, help="Commits per writer")
+    args = parser.parse_args()
+    run(args.writers, args.commits)
@@ -0,0 +1,146 @@
+"""
+Memory and throughput of streaming exports versus paging through /orders/
+
+Run with: python -m benchmarks.export [--orders 1000000]
+
+Requests are driven straight through the ASGI interface and response
+bodies are discarded as they arrive, so the numbers reflect the server.
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from sqlmodel import Session, SQLModel, create_engine, insert
+from app.main import app
+from app.database import get_session, get_read_session
+from app.models import Customer, Order, OrderItem, ShopItem
+from app.utils.pagination import NEXT_CURSOR_HEADER
+
+
+CHUNK_SIZE = 50_000
+LINES_PER_ORDER = 2
+PAGE_SIZE = 1000
+
+
+def _seed(session: Session, orders: int) -> None:
+    """Bulk insert orders with a fixed number of lines each"""
+    session.add(Customer(name="Bench", surname="User", email="bench@example.com"))
+    session.add(ShopItem(title="Item", description="Benchmark item", price=9.99))
+    created_at = datetime(2024, 1, 1)
+    for start in range(0, orders, CHUNK_SIZE):
+        stop = min(start + CHUNK_SIZE, orders)
+        session.exec(
+            insert(Order),
+            params=[
+                {
+                    "customer_id": 1, "created_at": created_at,
+                    "total_amount": round(9.99 * LINES_PER_ORDER, 2), "item_count": LINES_PER_ORDER
+                }
+                for _ in range(start, stop)
+            ]
+        )
+        session.exec(
+            insert(OrderItem),
+            params=[
+                {"order_id": order_id + 1, "shop_item_id": 1, "quantity": 1, "unit_price": 9.99}
+                for order_id in range(start, stop)
+                for _ in range(LINES_PER_ORDER)
+            ]
+        )
+    session.commit()
+
+
+async def _get(path: str, query: str = ""):
+    """Send one GET request through the ASGI app and discard the body"""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": path, "raw_path": path.encode(),
+        "query_string": query.encode(), "headers": [], "client": ("bench", 0),
+        "server": ("bench", 80), "root_path": "",
+    }
+    state = {"bytes": 0, "headers": {}}
+    requested = asyncio.Event()
+    
+    async def receive():
+        # Deliver the empty request body once, then never disconnect
+        if requested.is_set():
+            await asyncio.Event().wait()
+        requested.set()
+        return {"type": "http.request", "body": b"", "more_body": False}
+    
+    async def send(message):
+        if message["type"] == "http.response.start":
+            state["headers"] = {
+                name.decode().lower(): value.decode() for name, value in message["headers"]
+            }
+        elif message["type"] == "http.response.body":
+            state["bytes"] += len(message.get("body", b""))
+    
+    await app(scope, receive, send)
+    return state
+
+
+async def _paged_json():
+    """Walk /orders/ page by page with the keyset cursor"""
+    total = 0
+    query = f"limit={PAGE_SIZE}"
+    while True:
+        state = await _get("/api/v1/orders/", query)
+        total += state["bytes"]
+        cursor = state["headers"].get(NEXT_CURSOR_HEADER.lower())
+        if not cursor:
+            return total
+        query = f"limit={PAGE_SIZE}&cursor={cursor}"
+
+
+async def _export(export_format: str):
+    state = await _get("/api/v1/orders/export", f"format={export_format}")
+    return state["bytes"]
+
+
+def _measure(label: str, make_coroutine, orders: int) -> None:
+    start = time.perf_counter()
+    body_bytes = asyncio.run(make_coroutine())
+    elapsed = time.perf_counter() - start
+    
+    tracemalloc.start()
+    asyncio.run(make_coroutine())
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    print(
+        f"{label:>12} {orders / elapsed:>10.0f} {body_bytes / elapsed / 2**20:>8.1f}"
+        f" {peak / 2**20:>10.1f}"
+    )
+
+
+def run(orders: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = create_engine(f"sqlite:///{Path(tmp_dir) / 'bench.db'}")
+        SQLModel.metadata.create_all(engine)
+        with Session(engine) as session:
+            _seed(session, orders)
+        
+        def get_session_override():
+            with Session(engine) as session:
+                yield session
+        
+        app.dependency_overrides[get_session] = get_session_override
+        app.dependency_overrides[get_read_session] = get_session_override
+        
+        print(f"{'mode':>12} {'orders/s':>10} {'MiB/s':>8} {'peak MiB':>10}")
+        _measure("paged json", _paged_json, orders)
+        _measure("ndjson", lambda: _export("ndjson"), orders)
+        _measure("csv", lambda: _export("csv"), orders)
+        
+        app.dependency_overrides.clear()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=1_000_000, help="Orders to seed")
+    run(parser.parse_args().orders)
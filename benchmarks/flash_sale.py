@@ -0,0 +1,90 @@
+"""
+Order throughput on a few hot items with and without stock tracking
+
+Run with: python -m benchmarks.flash_sale [--writers 16] [--orders 2000]
+"""
+import argparse
+import random
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from pathlib import Path
+from fastapi.testclient import TestClient
+from sqlmodel import Session, SQLModel, func, insert, select
+from app.config import settings
+from app.main import app
+from app.database import create_db_engine, get_session, get_read_session
+from app.models import Customer, OrderItem, ShopItem
+
+
+HOT_ITEMS = 5
+
+
+def _seed(session: Session, stock) -> None:
+    """One customer and a handful of hot items sharing the given stock"""
+    session.add(Customer(name="Bench", surname="User", email="bench@example.com"))
+    session.exec(insert(ShopItem), params=[
+        {"title": f"Hot item {i}", "description": "Flash sale", "price": 9.99, "stock": stock}
+        for i in range(HOT_ITEMS)
+    ])
+    session.commit()
+
+
+def _run_sale(db_path: Path, stock, writers: int, orders: int):
+    """Place orders concurrently; returns (orders/s, created, refused, units left)"""
+    engine = create_db_engine(replace(settings, database_url=f"sqlite:///{db_path}", db_pool_size=writers))
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        _seed(session, stock)
+    
+    def get_session_override():
+        with Session(engine) as session:
+            yield session
+    
+    app.dependency_overrides[get_session] = get_session_override
+    app.dependency_overrides[get_read_session] = get_session_override
+    client = TestClient(app)
+    
+    def place_order(n: int) -> int:
+        item_id = random.Random(n).randint(1, HOT_ITEMS)
+        return client.post("/api/v1/orders/", json={
+            "customer_id": 1,
+            "items": [{"shop_item_id": item_id, "quantity": 1}]
+        }).status_code
+    
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=writers) as pool:
+        statuses = list(pool.map(place_order, range(orders)))
+    elapsed = time.perf_counter() - start
+    app.dependency_overrides.clear()
+    
+    with Session(engine) as session:
+        left = session.exec(select(func.sum(ShopItem.stock))).one()
+        sold = session.exec(select(func.sum(OrderItem.quantity))).one() or 0
+    engine.dispose()
+    
+    if stock is not None:
+        assert sold + left == stock * HOT_ITEMS, "stock was oversold"
+    return orders / elapsed, statuses.count(201), statuses.count(409), left
+
+
+def run(writers: int, orders: int) -> None:
+    scenarios = [
+        ("untracked", None),
+        ("stocked", orders),
+        ("sell-out", orders // (4 * HOT_ITEMS)),
+    ]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        print(f"{'scenario':>10} {'orders/s':>10} {'created':>8} {'409':>6} {'left':>6}")
+        for name, stock in scenarios:
+            rate, created, refused, left = _run_sale(Path(tmp_dir) / f"{name}.db", stock, writers, orders)
+            print(f"{name:>10} {rate:>10.0f} {created:>8} {refused:>6} {str(left):>6}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--writers", type=int, default=16, help="Concurrent client threads")
+    parser.add_argument("--orders", type=int, default=2000, help="Orders to place per scenario")
+    args = parser.parse_args()
+    run(args.writers, args.orders)
@@ -0,0 +1,189 @@
+"""
+Deterministic bulk data generator for benchmarks
+
+The same scale and seed always produce the same rows, so numbers from
+different runs (and different branches) are comparable. Rows are written
+with chunked executemany inserts and explicit IDs; memory stays flat at
+any scale.
+
+Run with: python -m benchmarks.generator bench.db [--scale medium] [--seed 0]
+"""
+import argparse
+import random
+import time
+from dataclasses import dataclass, replace
+from datetime import datetime, timedelta
+from itertools import accumulate
+from typing import Dict, Iterator, List, Tuple
+from sqlmodel import Session, SQLModel, insert
+from app.config import settings
+from app.database import create_db_engine
+from app.database.rollups import backfill_rollups
+from app.models import (
+    Customer, ShopItemCategory, ShopItem, ShopItemCategoryAssociation, Order, OrderItem
+)
+
+
+CHUNK_SIZE = 20_000
+
+FIRST_NAMES = ["Ada", "Ben", "Chloe", "Dan", "Eva", "Finn", "Grace", "Hugo", "Iris", "Jack"]
+SURNAMES = ["Smith", "Jones", "Brown", "Taylor", "Wilson", "Evans", "Thomas", "Roberts"]
+ADJECTIVES = ["Classic", "Compact", "Deluxe", "Eco", "Light", "Pro", "Smart", "Vintage", "Wireless"]
+NOUNS = ["Backpack", "Blender", "Camera", "Chair", "Headphones", "Jacket", "Kettle", "Lamp",
+         "Novel", "Speaker", "Sneakers", "Tent", "Watch"]
+DESCRIPTION_WORDS = ["durable", "cotton", "steel", "portable", "waterproof", "handmade",
+                     "rechargeable", "organic", "ergonomic", "foldable", "bluetooth", "leather"]
+
+
+@dataclass(frozen=True)
+class Scale:
+    """Row counts for one generated dataset"""
+    customers: int
+    categories: int
+    items: int
+    orders: int
+    max_lines: int = 5
+    # Orders are spread evenly over this many days, ending today
+    days: int = 365
+
+
+SCALES = {
+    "tiny": Scale(customers=100, categories=10, items=200, orders=500),
+    "small": Scale(customers=10_000, categories=50, items=5_000, orders=50_000),
+    "medium": Scale(customers=200_000, categories=200, items=50_000, orders=1_000_000),
+    "large": Scale(customers=2_000_000, categories=1_000, items=500_000, orders=10_000_000),
+}
+
+
+def _chunks(rows: Iterator[Dict], size: int = CHUNK_SIZE) -> Iterator[List[Dict]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _insert(session: Session, model: type, rows: Iterator[Dict]) -> None:
+    for chunk in _chunks(rows):
+        session.exec(insert(model), params=chunk)
+
+
+def _customers(rng: random.Random, scale: Scale) -> Iterator[Dict]:
+    for n in range(1, scale.customers + 1):
+        yield {
+            "id": n,
+            "name": rng.choice(FIRST_NAMES),
+            "surname": rng.choice(SURNAMES),
+            "email": f"customer{n}@example.com",
+        }
+
+
+def _categories(scale: Scale) -> Iterator[Dict]:
+    for n in range(1, scale.categories + 1):
+        yield {"id": n, "title": f"Category {n}", "description": f"Generated category {n}"}
+
+
+def _item_price(n: int) -> float:
+    """Price of item ``n``, a pure function so order lines can snapshot it"""
+    return round(1 + (n * 7919) % 50_000 / 100, 2)
+
+
+def _items(rng: random.Random, scale: Scale) -> Iterator[Dict]:
+    for n in range(1, scale.items + 1):
+        yield {
+            "id": n,
+            "title": f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {n}",
+            "description": " ".join(rng.choices(DESCRIPTION_WORDS, k=6)),
+            "price": _item_price(n),
+            "stock": None,
+            "version": 1,
+        }
+
+
+def _item_categories(rng: random.Random, scale: Scale) -> Iterator[Dict]:
+    for n in range(1, scale.items + 1):
+        for category_id in sorted(set(rng.choices(range(1, scale.categories + 1), k=rng.randint(1, 3)))):
+            yield {"shop_item_id": n, "category_id": category_id}
+
+
+def _orders(rng: random.Random, scale: Scale, end: datetime) -> Iterator[Tuple[List[Dict], List[Dict]]]:
+    """Orders and their lines, one chunk of orders at a time"""
+    # Item popularity follows a Zipf-like curve, so a few items sell far more
+    cum_weights = list(accumulate(1 / rank for rank in range(1, scale.items + 1)))
+    item_ids = range(1, scale.items + 1)
+    step = timedelta(days=scale.days) / max(scale.orders, 1)
+    first_order_at = end - timedelta(days=scale.days)
+    orders: List[Dict] = []
+    lines: List[Dict] = []
+    
+    for order_id in range(1, scale.orders + 1):
+        chosen = set(rng.choices(item_ids, cum_weights=cum_weights, k=rng.randint(1, scale.max_lines)))
+        total = 0.0
+        count = 0
+        for item_id in sorted(chosen):
+            quantity = rng.randint(1, 3)
+            price = _item_price(item_id)
+            total += price * quantity
+            count += quantity
+            lines.append({
+                "order_id": order_id, "shop_item_id": item_id,
+                "quantity": quantity, "unit_price": price,
+            })
+        orders.append({
+            "id": order_id,
+            "customer_id": rng.randint(1, scale.customers),
+            "created_at": first_order_at + step * order_id,
+            "total_amount": round(total, 2),
+            "item_count": count,
+        })
+        if len(orders) >= CHUNK_SIZE:
+            yield orders, lines
+            orders, lines = [], []
+    if orders:
+        yield orders, lines
+
+
+def generate(session: Session, scale: Scale, seed: int = 0) -> None:
+    """Insert a complete dataset in one transaction and rebuild the sales rollups
+    
+    Order timestamps end at the start of the current UTC day, so the
+    analytics endpoints' default range always covers generated sales.
+    """
+    rng = random.Random(seed)
+    _insert(session, Customer, _customers(rng, scale))
+    _insert(session, ShopItemCategory, _categories(scale))
+    _insert(session, ShopItem, _items(rng, scale))
+    _insert(session, ShopItemCategoryAssociation, _item_categories(rng, scale))
+    
+    end = datetime.combine(datetime.utcnow().date(), datetime.min.time())
+    for orders, lines in _orders(rng, scale, end):
+        session.exec(insert(Order), params=orders)
+        session.exec(insert(OrderItem), params=lines)
+    
+    # Commits the whole dataset together with the rollups
+    backfill_rollups(session)
+
+
+def create_database(url: str, scale: Scale, seed: int = 0):
+    """Create the schema at ``url``, fill it and return the engine"""
+    engine = create_db_engine(replace(settings, database_url=url))
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        generate(session, scale, seed)
+    return engine
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("database", help="SQLite file to create")
+    parser.add_argument("--scale", choices=SCALES, default="small", help="Dataset size")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    args = parser.parse_args()
+    
+    scale = SCALES[args.scale]
+    start = time.perf_counter()
+    create_database(f"sqlite:///{args.database}", scale, args.seed).dispose()
+    print(f"generated {scale} in {time.perf_counter() - start:.1f} s")
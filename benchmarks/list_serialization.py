@@ -0,0 +1,74 @@
+"""
+Per-page cost of large list responses on the default and the fast path
+
+Each page is fetched through the app with the catalog cache off, so the
+time covers the query, loading rows and building and encoding the body.
+
+Run with: python -m benchmarks.list_serialization [--scale small] [--pages 50]
+"""
+import argparse
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+from app.main import app
+from app.database import get_session, get_read_session
+from app.utils.cache import catalog_cache
+from app.utils.fast_json import fast_list_responses
+from benchmarks.generator import SCALES, create_database
+
+
+PAGES = ["/api/v1/orders/?limit=1000", "/api/v1/items/?limit=1000", "/api/v1/customers/?limit=1000"]
+
+
+def _page_cost(client: TestClient, url: str, pages: int):
+    """Median request time in ms and the page size in bytes"""
+    client.get(url)
+    timings = []
+    for _ in range(pages):
+        start = time.perf_counter()
+        response = client.get(url)
+        timings.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200, response.text
+    return statistics.median(timings), len(response.content)
+
+
+def run(scale_name: str, pages: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = create_database(f"sqlite:///{Path(tmp_dir) / 'bench.db'}", SCALES[scale_name])
+        
+        def get_session_override():
+            with Session(engine) as session:
+                yield session
+        
+        app.dependency_overrides[get_session] = get_session_override
+        app.dependency_overrides[get_read_session] = get_session_override
+        client = TestClient(app)
+        cache_enabled = catalog_cache.enabled
+        catalog_cache.enabled = False
+        
+        print(f"{'page':>28} {'default ms':>11} {'fast ms':>8} {'speedup':>8} {'KiB':>6}")
+        try:
+            for url in PAGES:
+                fast_list_responses.value = False
+                default_ms, size = _page_cost(client, url, pages)
+                fast_list_responses.value = True
+                fast_ms, fast_size = _page_cost(client, url, pages)
+                assert fast_size == size
+                print(f"{url:>28} {default_ms:>11.2f} {fast_ms:>8.2f} {default_ms / fast_ms:>7.1f}x "
+                      f"{size / 1024:>6.0f}")
+        finally:
+            fast_list_responses.value = False
+            catalog_cache.enabled = cache_enabled
+            app.dependency_overrides.clear()
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=SCALES, default="small", help="Dataset size")
+    parser.add_argument("--pages", type=int, default=50, help="Pages fetched per endpoint and path")
+    args = parser.parse_args()
+    run(args.scale, args.pages)
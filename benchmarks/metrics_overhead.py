@@ -0,0 +1,79 @@
+"""
+Per-request and per-query cost of the metrics middleware and query hooks
+
+Run with: python -m benchmarks.metrics_overhead [--requests 20000] [--queries 20000]
+"""
+import argparse
+import asyncio
+import time
+from sqlalchemy import create_engine, text
+from app.utils.metrics import (
+    MetricsMiddleware, MetricsRegistry, RequestStats, current_request,
+    install_query_metrics, remove_query_metrics
+)
+
+
+ROUNDS = 5
+
+
+async def _plain_app(scope, receive, send):
+    """Smallest possible ASGI app, so only the middleware is measured"""
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+async def _receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def _send(message):
+    pass
+
+
+async def _requests_us(app, requests: int) -> float:
+    """Mean microseconds per request through an ASGI app"""
+    scope = {"type": "http", "method": "GET", "path": "/bench", "headers": []}
+    start = time.perf_counter()
+    for _ in range(requests):
+        await app(dict(scope), _receive, _send)
+    return (time.perf_counter() - start) * 1e6 / requests
+
+
+def _queries_us(engine, queries: int) -> float:
+    """Mean microseconds per SELECT 1 inside a request context"""
+    token = current_request.set(RequestStats())
+    with engine.connect() as connection:
+        statement = text("SELECT 1")
+        start = time.perf_counter()
+        for _ in range(queries):
+            connection.execute(statement)
+        elapsed = time.perf_counter() - start
+    current_request.reset(token)
+    return elapsed * 1e6 / queries
+
+
+def run(requests: int, queries: int) -> None:
+    # Best of several interleaved rounds, to keep timer noise out of the difference
+    middleware = MetricsMiddleware(_plain_app, MetricsRegistry())
+    bare = min(asyncio.run(_requests_us(_plain_app, requests)) for _ in range(ROUNDS))
+    wrapped = min(asyncio.run(_requests_us(middleware, requests)) for _ in range(ROUNDS))
+    print(f"request: {bare:.2f} us bare, {wrapped:.2f} us with middleware (+{wrapped - bare:.2f} us)")
+    
+    engine = create_engine("sqlite://")
+    timings = {"bare": [], "hooked": []}
+    for _ in range(ROUNDS):
+        remove_query_metrics()
+        timings["bare"].append(_queries_us(engine, queries))
+        install_query_metrics()
+        timings["hooked"].append(_queries_us(engine, queries))
+    bare, hooked = min(timings["bare"]), min(timings["hooked"])
+    print(f"query:   {bare:.2f} us bare, {hooked:.2f} us with hooks (+{hooked - bare:.2f} us)")
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=20_000, help="Requests through the middleware")
+    parser.add_argument("--queries", type=int, default=20_000, help="Queries through the hooks")
+    args = parser.parse_args()
+    run(args.requests, args.queries)
@@ -0,0 +1,73 @@
+"""
+Order creation latency against cart size
+
+Run with: python -m benchmarks.order_create
+"""
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from fastapi.testclient import TestClient
+from sqlmodel import Session, SQLModel, create_engine, insert
+from app.main import app
+from app.database import get_session, get_read_session
+from app.models import Customer, ShopItem
+
+
+CART_SIZES = [1, 10, 100, 1000]
+REPEATS = 20
+
+
+def _seed(session: Session, item_count: int) -> None:
+    """Create one customer and enough shop items for the largest cart"""
+    session.add(Customer(name="Bench", surname="User", email="bench@example.com"))
+    session.exec(
+        insert(ShopItem),
+        params=[
+            {"title": f"Item {i}", "description": "Benchmark item", "price": 9.99}
+            for i in range(item_count)
+        ]
+    )
+    session.commit()
+
+
+def run() -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = create_engine(f"sqlite:///{Path(tmp_dir) / 'bench.db'}")
+        SQLModel.metadata.create_all(engine)
+        with Session(engine) as session:
+            _seed(session, max(CART_SIZES))
+        
+        def get_session_override():
+            with Session(engine) as session:
+                yield session
+        
+        app.dependency_overrides[get_session] = get_session_override
+        app.dependency_overrides[get_read_session] = get_session_override
+        client = TestClient(app)
+        
+        print(f"{'lines':>6} {'median ms':>10} {'p95 ms':>10}")
+        for size in CART_SIZES:
+            payload = {
+                "customer_id": 1,
+                "items": [
+                    {"shop_item_id": i + 1, "quantity": 1} for i in range(size)
+                ]
+            }
+            timings = []
+            for _ in range(REPEATS):
+                start = time.perf_counter()
+                response = client.post("/api/v1/orders/", json=payload)
+                timings.append((time.perf_counter() - start) * 1000)
+                assert response.status_code == 201, response.text
+            
+            timings.sort()
+            p95 = timings[int(len(timings) * 0.95) - 1]
+            print(f"{size:>6} {statistics.median(timings):>10.2f} {p95:>10.2f}")
+        
+        app.dependency_overrides.clear()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,104 @@
+"""
+Customer order history latency with and without the composite index
+
+Run with: python -m benchmarks.order_history [--orders 1000000]
+"""
+import argparse
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from fastapi.testclient import TestClient
+from sqlmodel import Session, SQLModel, create_engine, insert
+from app.main import app
+from app.database import get_session, get_read_session
+from app.models import Customer, Order
+
+
+CUSTOMER_COUNT = 10_000
+CHUNK_SIZE = 50_000
+PAGE_SIZE = 20
+REPEATS = 20
+# Every customer needs more than one page for the second-page timing
+MIN_ORDERS = CUSTOMER_COUNT * (PAGE_SIZE + 1)
+
+
+def _seed(session: Session, orders: int) -> None:
+    """Bulk insert customers and orders spread evenly across them"""
+    session.exec(insert(Customer), params=[
+        {"name": "Bench", "surname": "User", "email": f"bench{n}@example.com"}
+        for n in range(CUSTOMER_COUNT)
+    ])
+    first_order_at = datetime(2024, 1, 1)
+    for start in range(0, orders, CHUNK_SIZE):
+        session.exec(insert(Order), params=[
+            {
+                "customer_id": n % CUSTOMER_COUNT + 1,
+                "created_at": first_order_at + timedelta(minutes=n),
+                "total_amount": 0.0, "item_count": 0
+            }
+            for n in range(start, min(start + CHUNK_SIZE, orders))
+        ])
+    session.commit()
+
+
+def _history_ms(client: TestClient) -> float:
+    """Median latency of a customer's first and second history pages"""
+    timings = []
+    for n in range(REPEATS):
+        customer_id = n * 97 % CUSTOMER_COUNT + 1
+        start = time.perf_counter()
+        response = client.get(f"/api/v1/customers/{customer_id}/orders?limit={PAGE_SIZE}")
+        cursor = response.headers.get("X-Next-Cursor")
+        assert cursor is not None, f"customer {customer_id} has a single page of orders"
+        response = client.get(f"/api/v1/customers/{customer_id}/orders?limit={PAGE_SIZE}&cursor={cursor}")
+        timings.append((time.perf_counter() - start) * 1000 / 2)
+        assert response.status_code == 200, response.text
+    return statistics.median(timings)
+
+
+def run(orders: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = create_engine(f"sqlite:///{Path(tmp_dir) / 'bench.db'}")
+        SQLModel.metadata.create_all(engine)
+        with Session(engine) as session:
+            _seed(session, orders)
+        
+        def get_session_override():
+            with Session(engine) as session:
+                yield session
+        
+        app.dependency_overrides[get_session] = get_session_override
+        app.dependency_overrides[get_read_session] = get_session_override
+        client = TestClient(app)
+        
+        indexed_ms = _history_ms(client)
+        with engine.begin() as connection:
+            connection.exec_driver_sql("DROP INDEX ix_orders_customer_id_created_at_id")
+        unindexed_ms = _history_ms(client)
+        
+        print(f"history page, {orders} orders: {unindexed_ms:.2f} ms without index, "
+              f"{indexed_ms:.2f} ms with (customer_id, created_at, id)")
+        
+        app.dependency_overrides.clear()
+        engine.dispose()
+
+
+def _order_count(value: str) -> int:
+    """argparse type for --orders: enough for two history pages per customer"""
+    orders = int(value)
+    if orders < MIN_ORDERS:
+        raise argparse.ArgumentTypeError(
+            f"needs at least {MIN_ORDERS} orders ({PAGE_SIZE + 1} for each of {CUSTOMER_COUNT} customers)"
+        )
+    return orders
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--orders", type=_order_count, default=1_000_000,
+        help=f"Number of orders to seed (at least {MIN_ORDERS})"
+    )
+    run(parser.parse_args().orders)
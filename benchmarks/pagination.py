@@ -0,0 +1,82 @@
+"""
+Offset versus keyset page latency on the orders listing
+
+Run with: python -m benchmarks.pagination [--rows 1000000]
+"""
+import argparse
+import statistics
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from fastapi.testclient import TestClient
+from sqlmodel import Session, SQLModel, create_engine, insert
+from app.main import app
+from app.database import get_session, get_read_session
+from app.models import Customer, Order
+from app.utils.pagination import encode_cursor
+
+
+PAGE_SIZE = 100
+REPEATS = 5
+CHUNK_SIZE = 50_000
+
+
+def _seed(session: Session, rows: int) -> None:
+    """Bulk insert one customer and the requested number of orders"""
+    session.add(Customer(name="Bench", surname="User", email="bench@example.com"))
+    created_at = datetime(2024, 1, 1)
+    for start in range(0, rows, CHUNK_SIZE):
+        session.exec(
+            insert(Order),
+            params=[
+                {"customer_id": 1, "created_at": created_at}
+                for _ in range(start, min(start + CHUNK_SIZE, rows))
+            ]
+        )
+    session.commit()
+
+
+def _median_ms(client: TestClient, url: str) -> float:
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        response = client.get(url)
+        timings.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200, response.text
+    return statistics.median(timings)
+
+
+def run(rows: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = create_engine(f"sqlite:///{Path(tmp_dir) / 'bench.db'}")
+        SQLModel.metadata.create_all(engine)
+        with Session(engine) as session:
+            _seed(session, rows)
+        
+        def get_session_override():
+            with Session(engine) as session:
+                yield session
+        
+        app.dependency_overrides[get_session] = get_session_override
+        app.dependency_overrides[get_read_session] = get_session_override
+        client = TestClient(app)
+        
+        print(f"{'page':>6} {'offset ms':>10} {'keyset ms':>10}")
+        last_page = rows // PAGE_SIZE - 1
+        for page in sorted({0, 10, 100, last_page // 2, last_page}):
+            skip = page * PAGE_SIZE
+            offset_ms = _median_ms(client, f"/api/v1/orders/?skip={skip}&limit={PAGE_SIZE}")
+            # Order ids are dense, so the cursor for page N is the id ending page N-1
+            cursor_query = f"&cursor={encode_cursor(skip)}" if skip else ""
+            keyset_ms = _median_ms(client, f"/api/v1/orders/?limit={PAGE_SIZE}{cursor_query}")
+            print(f"{page:>6} {offset_ms:>10.2f} {keyset_ms:>10.2f}")
+        
+        app.dependency_overrides.clear()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Number of orders to seed")
+    run(parser.parse_args().rows)
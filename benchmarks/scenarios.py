@@ -0,0 +1,187 @@
+"""
+Load scenarios against the ASGI app: catalog browsing, checkout and admin updates
+
+Each scenario runs a weighted mix of requests from concurrent clients
+through httpx's ASGI transport (no network, no server) and reports
+throughput and latency percentiles.
+
+Run with: python -m benchmarks.scenarios [--scale small] [--requests 2000] [--concurrency 16]
+          [--scenario browse] [--database bench.db]
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import tempfile
+import time
+from dataclasses import replace
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+import httpx
+from sqlmodel import Session
+from app.config import settings
+from app.database import create_db_engine, get_session, get_read_session
+from app.main import app
+from app.utils.cache import catalog_cache
+from benchmarks.generator import SCALES, Scale, create_database
+
+
+# One request of a scenario: (client, rng, request number) -> response
+Step = Callable[[httpx.AsyncClient, random.Random, int], Awaitable[httpx.Response]]
+
+SEARCH_TERMS = ["lamp", "wireless speaker", "leather", "waterproof tent", "camera"]
+
+
+def _hot_id(rng: random.Random, count: int) -> int:
+    """IDs skewed towards the low end, like real traffic on popular rows"""
+    return min(int(rng.paretovariate(1.2)), count)
+
+
+def browse_steps(scale: Scale) -> List[Tuple[float, Step]]:
+    """Catalog reads: item pages, filtered listings, search and categories"""
+    return [
+        (0.40, lambda client, rng, n: client.get(f"/api/v1/items/{_hot_id(rng, scale.items)}")),
+        (0.25, lambda client, rng, n: client.get(
+            "/api/v1/items/",
+            params={"category_ids": rng.randint(1, scale.categories), "sort": "price", "limit": 20}
+        )),
+        (0.10, lambda client, rng, n: client.get(
+            "/api/v1/items/", params={"min_price": 10, "max_price": 50, "limit": 20}
+        )),
+        (0.15, lambda client, rng, n: client.get(
+            "/api/v1/items/search", params={"q": rng.choice(SEARCH_TERMS), "limit": 20}
+        )),
+        (0.10, lambda client, rng, n: client.get(f"/api/v1/categories/{rng.randint(1, scale.categories)}")),
+    ]
+
+
+def checkout_steps(scale: Scale) -> List[Tuple[float, Step]]:
+    """Order placement, with an Idempotency-Key as mobile clients send it"""
+    def place_order(client, rng, n):
+        items = {_hot_id(rng, scale.items) for _ in range(rng.randint(1, 4))}
+        return client.post(
+            "/api/v1/orders/",
+            json={
+                "customer_id": rng.randint(1, scale.customers),
+                "items": [{"shop_item_id": item_id, "quantity": rng.randint(1, 2)} for item_id in items]
+            },
+            headers={"Idempotency-Key": f"bench-{n}"}
+        )
+    
+    return [
+        (0.80, place_order),
+        (0.20, lambda client, rng, n: client.get(
+            f"/api/v1/customers/{rng.randint(1, scale.customers)}/orders", params={"limit": 10}
+        )),
+    ]
+
+
+def admin_steps(scale: Scale) -> List[Tuple[float, Step]]:
+    """Back-office writes: repricing, restocking and category edits"""
+    return [
+        (0.50, lambda client, rng, n: client.put(
+            f"/api/v1/items/{rng.randint(1, scale.items)}",
+            json={"price": round(rng.uniform(1, 500), 2)}
+        )),
+        (0.30, lambda client, rng, n: client.put(
+            f"/api/v1/items/{rng.randint(1, scale.items)}", json={"stock": rng.randint(0, 1000)}
+        )),
+        (0.20, lambda client, rng, n: client.put(
+            f"/api/v1/categories/{rng.randint(1, scale.categories)}",
+            json={"description": f"Edited {n}"}
+        )),
+    ]
+
+
+SCENARIOS = {"browse": browse_steps, "checkout": checkout_steps, "admin": admin_steps}
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    steps: List[Tuple[float, Step]],
+    requests: int,
+    concurrency: int,
+    seed: int = 0
+) -> Dict[str, float]:
+    """Run ``requests`` steps from ``concurrency`` clients; returns RPS and percentiles"""
+    weights = [weight for weight, _ in steps]
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(requests))
+    
+    async def worker(worker_id: int) -> None:
+        nonlocal errors
+        rng = random.Random(seed * 1000 + worker_id)
+        for n in counter:
+            _, step = rng.choices(steps, weights)[0]
+            start = time.perf_counter()
+            response = await step(client, rng, n)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+    
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(n) for n in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    
+    cuts = statistics.quantiles(latencies, n=100)
+    return {
+        "rps": requests / elapsed,
+        "p50": cuts[49] * 1000,
+        "p95": cuts[94] * 1000,
+        "p99": cuts[98] * 1000,
+        "errors": errors,
+    }
+
+
+async def _run_all(names: List[str], scale: Scale, requests: int, concurrency: int) -> None:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        print(f"{'scenario':>10} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+        for name in names:
+            catalog_cache.clear()
+            result = await run_scenario(client, SCENARIOS[name](scale), requests, concurrency)
+            print(f"{name:>10} {result['rps']:>8.0f} {result['p50']:>8.2f} {result['p95']:>8.2f} "
+                  f"{result['p99']:>8.2f} {result['errors']:>7}")
+
+
+def run(
+    names: List[str],
+    scale_name: str,
+    requests: int,
+    concurrency: int,
+    database: Optional[str] = None
+) -> None:
+    scale = SCALES[scale_name]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if database:
+            # A file made by benchmarks.generator with the same scale
+            engine = create_db_engine(replace(settings, database_url=f"sqlite:///{database}"))
+        else:
+            start = time.perf_counter()
+            engine = create_database(f"sqlite:///{Path(tmp_dir) / 'bench.db'}", scale)
+            print(f"generated {scale_name} dataset in {time.perf_counter() - start:.1f} s")
+        
+        def get_session_override():
+            with Session(engine) as session:
+                yield session
+        
+        app.dependency_overrides[get_session] = get_session_override
+        app.dependency_overrides[get_read_session] = get_session_override
+        try:
+            asyncio.run(_run_all(names, scale, requests, concurrency))
+        finally:
+            app.dependency_overrides.clear()
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", choices=SCENARIOS, action="append",
+                        help="Scenario to run (repeatable; default: all)")
+    parser.add_argument("--scale", choices=SCALES, default="small", help="Dataset size")
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients")
+    parser.add_argument("--database", help="Reuse a database made by benchmarks.generator")
+    args = parser.parse_args()
+    run(args.scenario or list(SCENARIOS), args.scale, args.requests, args.concurrency, args.database)
@@ -0,0 +1,99 @@
+"""
+Item search latency: FTS5 index versus a LIKE '%q%' scan
+
+Run with: python -m benchmarks.search [--items 1000000]
+"""
+import argparse
+import itertools
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from fastapi.testclient import TestClient
+from sqlalchemy import or_
+from sqlmodel import Session, SQLModel, create_engine, insert, select
+from app.main import app
+from app.database import get_session, get_read_session
+from app.models import ShopItem
+
+
+CHUNK_SIZE = 50_000
+PAGE_SIZE = 20
+REPEATS = 5
+VOCABULARY = [f"word{n}" for n in range(20_000)]
+# Zipf-like word frequencies, as in natural text
+CUMULATIVE_WEIGHTS = list(itertools.accumulate(1 / rank for rank in range(1, len(VOCABULARY) + 1)))
+# From a term in most items down to one in none
+QUERIES = ["word0", "word100", "word5000", "missing"]
+
+
+def _seed(session: Session, items: int) -> None:
+    """Insert items whose text draws words from a skewed vocabulary"""
+    rng = random.Random(42)
+    
+    def words(count: int) -> str:
+        return " ".join(rng.choices(VOCABULARY, cum_weights=CUMULATIVE_WEIGHTS, k=count))
+    
+    for start in range(0, items, CHUNK_SIZE):
+        session.exec(insert(ShopItem), params=[
+            {"title": words(4), "description": words(20), "price": 1.0}
+            for _ in range(start, min(start + CHUNK_SIZE, items))
+        ])
+    session.commit()
+
+
+def _median_ms(run_once) -> float:
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        run_once()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def run(items: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = create_engine(f"sqlite:///{Path(tmp_dir) / 'bench.db'}")
+        SQLModel.metadata.create_all(engine)
+        start = time.perf_counter()
+        with Session(engine) as session:
+            _seed(session, items)
+        print(f"seeded and indexed {items} items in {time.perf_counter() - start:.1f} s")
+        
+        def get_session_override():
+            with Session(engine) as session:
+                yield session
+        
+        app.dependency_overrides[get_session] = get_session_override
+        app.dependency_overrides[get_read_session] = get_session_override
+        client = TestClient(app)
+        
+        print(f"{'query':>10} {'LIKE ms':>10} {'FTS5 ms':>10}")
+        for q in QUERIES:
+            pattern = f"%{q}%"
+            like_query = (
+                select(ShopItem)
+                .where(or_(ShopItem.title.like(pattern), ShopItem.description.like(pattern)))
+                .order_by(ShopItem.id)
+                .limit(PAGE_SIZE)
+            )
+            
+            def like_scan():
+                with Session(engine) as session:
+                    return session.exec(like_query).all()
+            
+            def fts_search():
+                response = client.get(f"/api/v1/items/search?q={q}&limit={PAGE_SIZE}")
+                assert response.status_code == 200, response.text
+            
+            print(f"{q:>10} {_median_ms(like_scan):>10.2f} {_median_ms(fts_search):>10.2f}")
+        
+        app.dependency_overrides.clear()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=1_000_000, help="Number of items to seed")
+    run(parser.parse_args().items)
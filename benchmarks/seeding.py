@@ -0,0 +1,105 @@
+"""
+Startup seeding: per-row commits versus the bulk loader, and the cost of a
+restart once the database is seeded
+
+Run with: python -m benchmarks.seeding [--items 100000]
+"""
+import argparse
+import json
+import tempfile
+import time
+from dataclasses import replace
+from pathlib import Path
+from sqlmodel import Session, SQLModel
+from app.config import settings
+from app.database import create_db_engine
+from app.database.init_data import initialize_test_data, iter_fixture
+from app.models import Customer, ShopItemCategory, ShopItem, ShopItemCategoryAssociation
+
+
+CATEGORY_COUNT = 50
+ROW_SAMPLE = 2000
+
+
+def _write_fixture(path: Path, items: int) -> None:
+    """A JSON Lines fixture with one customer per item"""
+    with open(path, "w") as f:
+        for n in range(CATEGORY_COUNT):
+            f.write(json.dumps({"section": "categories", "title": f"Category {n}", "description": "Seeded"}) + "\n")
+        for n in range(items):
+            f.write(json.dumps({
+                "section": "customers", "name": "Seed", "surname": f"Customer {n}",
+                "email": f"customer{n}@example.com"
+            }) + "\n")
+            f.write(json.dumps({
+                "section": "shop_items", "title": f"Item {n}", "description": "Seeded item",
+                "price": 1.0 + n % 100, "category_ids": [n % CATEGORY_COUNT + 1]
+            }) + "\n")
+
+
+def _seed_per_row(session: Session, path: Path, limit: int) -> None:
+    """The previous loader: a commit per customer batch and per shop item"""
+    categories = []
+    for section, record in iter_fixture(str(path)):
+        if section == "categories":
+            category = ShopItemCategory(**record)
+            session.add(category)
+            session.commit()
+            categories.append(category.id)
+        elif section == "customers":
+            session.add(Customer(**record))
+        else:
+            category_ids = record.pop("category_ids")
+            item = ShopItem(**record)
+            session.add(item)
+            session.commit()
+            session.refresh(item)
+            for position in category_ids:
+                session.add(ShopItemCategoryAssociation(shop_item_id=item.id, category_id=categories[position - 1]))
+            session.commit()
+            limit -= 1
+            if not limit:
+                return
+
+
+def _engine(path: Path):
+    engine = create_db_engine(replace(settings, database_url=f"sqlite:///{path}"))
+    SQLModel.metadata.create_all(engine)
+    return engine
+
+
+def run(items: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        fixture = Path(tmp_dir) / "fixture.jsonl"
+        _write_fixture(fixture, items)
+        
+        engine = _engine(Path(tmp_dir) / "per_row.db")
+        start = time.perf_counter()
+        with Session(engine) as session:
+            _seed_per_row(session, fixture, ROW_SAMPLE)
+        per_row_rate = ROW_SAMPLE / (time.perf_counter() - start)
+        engine.dispose()
+        
+        engine = _engine(Path(tmp_dir) / "bulk.db")
+        start = time.perf_counter()
+        with Session(engine) as session:
+            initialize_test_data(session, str(fixture))
+        bulk_seconds = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        with Session(engine) as session:
+            initialize_test_data(session, str(fixture))
+        restart_ms = (time.perf_counter() - start) * 1000
+        engine.dispose()
+        
+        print(f"per-row commits: {per_row_rate:.0f} items/s, {items / per_row_rate:.1f} s projected for {items} items")
+        print(f"bulk loader:     {items / bulk_seconds:.0f} items/s, {bulk_seconds:.1f} s for {items} items "
+              f"and {items} customers")
+        print(f"already seeded:  {restart_ms:.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=100_000, help="Items (and customers) in the fixture")
+    args = parser.parse_args()
+    run(args.items)
@@ -1,12 +1,21 @@
 """
 Pytest configuration and fixtures
 """
+from dataclasses import replace
 import pytest
 from fastapi.testclient import TestClient
+from sqlalchemy import event
 from sqlmodel import Session, SQLModel, create_engine
 from sqlmodel.pool import StaticPool
+from app.config import settings
 from app.main import app
-from app.database import get_session
+from app.database import create_db_engine, create_read_engine, get_session, get_read_session
+from app.utils.cache import catalog_cache
+from app.utils.query_log import query_budget_mode
+
+
+# Fail any request whose handler goes over its query budget
+query_budget_mode.value = "raise"
 
 
 # Test database URL
@@ -40,8 +49,69 @@ def client(session):
     """Test client fixture"""
     def get_session_override():
         return session
-
+    
     app.dependency_overrides[get_session] = get_session_override
+    app.dependency_overrides[get_read_session] = get_session_override
+    catalog_cache.clear()
     client = TestClient(app)
     yield client
     app.dependency_overrides.clear()
+    catalog_cache.clear()
+
+
+@pytest.fixture
+def file_client(tmp_path):
+    """Test client on a file-backed SQLite database, for concurrent requests
+    
+    GET handlers read through a read-only engine on the same file.
+    """
+    config = replace(
+        settings, database_url=f"sqlite:///{tmp_path / 'shop.db'}",
+        db_pool_size=20, db_read_pool_size=20
+    )
+    engine = create_db_engine(config)
+    SQLModel.metadata.create_all(engine)
+    read_engine = create_read_engine(config)
+    
+    def get_session_override():
+        with Session(engine) as session:
+            yield session
+    
+    def get_read_session_override():
+        with Session(read_engine) as session:
+            yield session
+    
+    app.dependency_overrides[get_session] = get_session_override
+    app.dependency_overrides[get_read_session] = get_read_session_override
+    yield TestClient(app), engine
+    app.dependency_overrides.clear()
+    read_engine.dispose()
+    engine.dispose()
+
+
+@pytest.fixture
+def query_counter():
+    """Collect SQL statements executed on the test engine"""
+    statements = []
+    
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    
+    event.listen(test_engine, "before_cursor_execute", before_cursor_execute)
+    yield statements
+    event.remove(test_engine, "before_cursor_execute", before_cursor_execute)
+
+
+@pytest.fixture
+def query_plans():
+    """Collect the EXPLAIN QUERY PLAN details of SELECTs run on the test engine"""
+    plans = []
+    
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            rows = cursor.connection.execute(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+            plans.append([row[3] for row in rows])
+    
+    event.listen(test_engine, "before_cursor_execute", before_cursor_execute)
+    yield plans
+    event.remove(test_engine, "before_cursor_execute", before_cursor_execute)
@@ -0,0 +1,132 @@
+"""
+Sales analytics endpoint tests
+"""
+import pytest
+from fastapi.testclient import TestClient
+from app.database.rollups import backfill_rollups
+
+
+def _seed_catalog(client: TestClient) -> dict:
+    """Create a customer, two categories and two items"""
+    customer_id = client.post("/api/v1/customers/", json={
+        "name": "Report", "surname": "User", "email": "report@test.com"
+    }).json()["id"]
+    books, gifts = [
+        category["id"] for category in client.post("/api/v1/categories:bulk", json=[
+            {"title": "Books", "description": "Books"},
+            {"title": "Gifts", "description": "Gifts"}
+        ]).json()["results"]
+    ]
+    novel = client.post("/api/v1/items/", json={
+        "title": "Novel", "description": "Book", "price": 10.0, "category_ids": [books, gifts]
+    }).json()["id"]
+    mug = client.post("/api/v1/items/", json={
+        "title": "Mug", "description": "Mug", "price": 4.5, "category_ids": [gifts]
+    }).json()["id"]
+    return {"customer": customer_id, "books": books, "gifts": gifts, "novel": novel, "mug": mug}
+
+
+def _reports(client: TestClient) -> tuple:
+    return (
+        client.get("/api/v1/analytics/revenue").json(),
+        client.get("/api/v1/analytics/top-items").json(),
+        client.get("/api/v1/analytics/top-categories").json()
+    )
+
+
+def test_analytics_follow_order_writes(client: TestClient):
+    """Test that rollups follow order creates, updates and deletes"""
+    ids = _seed_catalog(client)
+    first = client.post("/api/v1/orders/", json={
+        "customer_id": ids["customer"],
+        "items": [{"shop_item_id": ids["novel"], "quantity": 2}, {"shop_item_id": ids["mug"], "quantity": 1}]
+    }).json()
+    client.post("/api/v1/orders/", json={
+        "customer_id": ids["customer"],
+        "items": [{"shop_item_id": ids["mug"], "quantity": 4}]
+    })
+    
+    revenue, items, categories = _reports(client)
+    assert len(revenue) == 1
+    assert revenue[0]["order_count"] == 2
+    assert revenue[0]["item_count"] == 7
+    assert revenue[0]["revenue"] == 42.5
+    assert [(item["title"], item["quantity"], item["revenue"]) for item in items] == [
+        ("Mug", 5, 22.5), ("Novel", 2, 20.0)
+    ]
+    assert [(category["title"], category["revenue"]) for category in categories] == [
+        ("Gifts", 42.5), ("Books", 20.0)
+    ]
+    
+    client.put(f"/api/v1/orders/{first['id']}", json={
+        "items": [{"shop_item_id": ids["mug"], "quantity": 1}]
+    })
+    revenue, items, categories = _reports(client)
+    assert revenue[0]["order_count"] == 2
+    assert revenue[0]["revenue"] == 22.5
+    assert [item["title"] for item in items] == ["Mug"]
+    assert [category["title"] for category in categories] == ["Gifts"]
+    
+    client.delete(f"/api/v1/orders/{first['id']}")
+    revenue, items, _ = _reports(client)
+    assert revenue[0]["order_count"] == 1
+    assert items[0]["quantity"] == 4
+
+
+def test_backfill_matches_incremental_rollups(client: TestClient, session):
+    """Test that rebuilding the rollups reproduces the incremental ones"""
+    ids = _seed_catalog(client)
+    for quantity in range(1, 4):
+        client.post("/api/v1/orders/", json={
+            "customer_id": ids["customer"],
+            "items": [{"shop_item_id": ids["novel"], "quantity": quantity}]
+        })
+    client.post("/api/v1/orders/", json={"customer_id": ids["customer"], "items": []})
+    
+    incremental = _reports(client)
+    backfill_rollups(session)
+    
+    assert _reports(client) == incremental
+    assert incremental[0][0]["order_count"] == 4
+
+
+def test_category_rollups_use_the_order_time_snapshot(client: TestClient, session):
+    """Test that orders leave the category rollups as they entered them, whatever the item's links now"""
+    ids = _seed_catalog(client)
+    first, second = [
+        client.post("/api/v1/orders/", json={
+            "customer_id": ids["customer"], "items": [{"shop_item_id": ids["novel"], "quantity": 2}]
+        }).json()["id"]
+        for _ in range(2)
+    ]
+    # The novel moves from Books and Gifts to Gifts only
+    client.put(f"/api/v1/items/{ids['novel']}", json={"category_ids": [ids["gifts"]]})
+    
+    client.put(f"/api/v1/orders/{first}", json={"items": [{"shop_item_id": ids["novel"], "quantity": 1}]})
+    client.delete(f"/api/v1/orders/{second}")
+    
+    _, _, categories = _reports(client)
+    assert [(category["title"], category["quantity"], category["revenue"]) for category in categories] == [
+        ("Gifts", 1, 10.0)
+    ]
+    incremental = _reports(client)
+    backfill_rollups(session)
+    assert _reports(client) == incremental
+
+
+def test_analytics_invalid_range(client: TestClient):
+    """Test that an inverted date range is rejected"""
+    response = client.get("/api/v1/analytics/revenue?start=2024-02-01&end=2024-01-01")
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("report", ["revenue", "top-items", "top-categories"])
+def test_analytics_reports_seek_rollups(client: TestClient, query_plans, report):
+    """Test that reports seek the rollup tables by key instead of scanning them"""
+    response = client.get(f"/api/v1/analytics/{report}")
+    assert response.status_code == 200
+    
+    details = [detail for plan in query_plans for detail in plan]
+    rollup_steps = [detail for detail in details if "daily_" in detail]
+    assert rollup_steps
+    assert all(detail.startswith("SEARCH") for detail in rollup_steps)
@@ -0,0 +1,173 @@
+"""
+Catalog cache tests
+"""
+from dataclasses import replace
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session, SQLModel
+from app.config import settings
+from app.database import create_db_engine, create_read_engine, get_session, get_read_session
+from app.main import app
+from app.utils.cache import TTLCache, catalog_cache
+
+
+def test_ttl_cache_lru_eviction():
+    """Test that the least recently used entry is evicted first"""
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set(("item", 1), "one")
+    cache.set(("item", 2), "two")
+    assert cache.get(("item", 1)) == "one"
+    
+    cache.set(("item", 3), "three")
+    assert cache.get(("item", 2)) is None
+    assert cache.get(("item", 1)) == "one"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_ttl_cache_expiry():
+    """Test that entries expire after the TTL"""
+    cache = TTLCache(maxsize=10, ttl=-1)
+    cache.set(("item", 1), "one")
+    assert cache.get(("item", 1)) is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_ttl_cache_skips_stale_generation():
+    """Test that a value loaded before an invalidation is not stored"""
+    cache = TTLCache(maxsize=10, ttl=60)
+    generation = cache.generation
+    cache.invalidate(("item", 1))
+    cache.set(("item", 1), "stale", generation)
+    assert cache.get(("item", 1)) is None
+
+
+def test_get_shop_item_served_from_cache(client: TestClient, query_counter):
+    """Test that a repeated item lookup doesn't touch the database"""
+    item_id = client.post("/api/v1/items/", json={
+        "title": "Cached", "description": "Cached item", "price": 9.99
+    }).json()["id"]
+    
+    first = client.get(f"/api/v1/items/{item_id}")
+    query_counter.clear()
+    second = client.get(f"/api/v1/items/{item_id}")
+    
+    assert second.json() == first.json()
+    assert query_counter == []
+    
+    stats = client.get("/cache/stats").json()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+
+def test_update_shop_item_invalidates_cache(client: TestClient):
+    """Test that item writes drop the cached item and listing pages"""
+    item_id = client.post("/api/v1/items/", json={
+        "title": "Before", "description": "Cached item", "price": 9.99
+    }).json()["id"]
+    client.get(f"/api/v1/items/{item_id}")
+    client.get("/api/v1/items/")
+    
+    client.put(f"/api/v1/items/{item_id}", json={"title": "After"})
+    
+    assert client.get(f"/api/v1/items/{item_id}").json()["title"] == "After"
+    assert client.get("/api/v1/items/").json()[0]["title"] == "After"
+    
+    client.post("/api/v1/items/", json={
+        "title": "Second", "description": "Cached item", "price": 9.99
+    })
+    assert len(client.get("/api/v1/items/").json()) == 2
+    
+    client.delete(f"/api/v1/items/{item_id}")
+    assert client.get(f"/api/v1/items/{item_id}").status_code == 404
+
+
+def test_update_category_invalidates_embedding_items(client: TestClient):
+    """Test that category writes drop cached items embedding the category"""
+    category_id = client.post("/api/v1/categories/", json={
+        "title": "Before", "description": "Category"
+    }).json()["id"]
+    item_id = client.post("/api/v1/items/", json={
+        "title": "Item", "description": "Item", "price": 9.99,
+        "category_ids": [category_id]
+    }).json()["id"]
+    other_id = client.post("/api/v1/items/", json={
+        "title": "Other", "description": "Item", "price": 9.99
+    }).json()["id"]
+    for path in [
+        f"/api/v1/items/{item_id}", f"/api/v1/items/{other_id}",
+        f"/api/v1/items/?category_id={category_id}",
+        f"/api/v1/categories/{category_id}", "/api/v1/categories/"
+    ]:
+        client.get(path)
+    
+    client.put(f"/api/v1/categories/{category_id}", json={"title": "After"})
+    
+    assert client.get(f"/api/v1/categories/{category_id}").json()["title"] == "After"
+    assert client.get("/api/v1/categories/").json()[0]["title"] == "After"
+    item = client.get(f"/api/v1/items/{item_id}").json()
+    assert item["categories"][0]["title"] == "After"
+    listed = client.get(f"/api/v1/items/?category_id={category_id}").json()
+    assert listed[0]["categories"][0]["title"] == "After"
+    
+    # Items that don't embed the category stay cached
+    hits = catalog_cache.stats()["hits"]
+    client.get(f"/api/v1/items/{other_id}")
+    assert catalog_cache.stats()["hits"] == hits + 1
+
+
+@pytest.fixture
+def lagging_replica(tmp_path):
+    """Client whose GET handlers read a replica that only changes when told to
+    
+    Yields the client and a writable engine on the replica file, standing in
+    for replication.
+    """
+    config = replace(
+        settings, database_url=f"sqlite:///{tmp_path / 'primary.db'}",
+        read_database_url=f"sqlite:///{tmp_path / 'replica.db'}"
+    )
+    engine = create_db_engine(config)
+    replica_engine = create_db_engine(replace(config, database_url=config.read_database_url))
+    for db_engine in (engine, replica_engine):
+        SQLModel.metadata.create_all(db_engine)
+    read_engine = create_read_engine(config)
+    
+    def get_session_override():
+        with Session(engine) as session:
+            yield session
+    
+    def get_read_session_override():
+        with Session(read_engine) as session:
+            yield session
+    
+    app.dependency_overrides[get_session] = get_session_override
+    app.dependency_overrides[get_read_session] = get_read_session_override
+    catalog_cache.clear()
+    yield TestClient(app), replica_engine
+    app.dependency_overrides.clear()
+    for db_engine in (read_engine, replica_engine, engine):
+        db_engine.dispose()
+
+
+def test_lagging_replica_reads_are_not_cached(lagging_replica):
+    """Test that a stale replica read doesn't outlive the replica catching up"""
+    client, replica_engine = lagging_replica
+    item_id = client.post("/api/v1/items/", json={
+        "title": "Before", "description": "Replicated item", "price": 9.99
+    }).json()["id"]
+    with replica_engine.begin() as connection:
+        connection.exec_driver_sql(
+            "INSERT INTO shop_items (id, title, description, price, version) "
+            "VALUES (?, 'Before', 'Replicated item', 9.99, 1)", (item_id,)
+        )
+    
+    # The update lands on the primary; the replica hasn't seen it yet
+    client.put(f"/api/v1/items/{item_id}", json={"title": "After"})
+    assert client.get(f"/api/v1/items/{item_id}").json()["title"] == "Before"
+    assert client.get("/api/v1/items/").json()[0]["title"] == "Before"
+    
+    with replica_engine.begin() as connection:
+        connection.exec_driver_sql("UPDATE shop_items SET title = 'After', version = 2")
+    assert client.get(f"/api/v1/items/{item_id}").json()["title"] == "After"
+    assert client.get("/api/v1/items/").json()[0]["title"] == "After"
+    assert catalog_cache.stats()["size"] == 0
@@ -3,6 +3,8 @@ Category endpoint tests
 """
 import pytest
 from fastapi.testclient import TestClient
+from sqlmodel import select
+from app.models import ShopItemCategoryAssociation
 
 
 def test_create_category(client: TestClient):
@@ -65,6 +67,24 @@ def test_list_categories(client: TestClient):
     assert len(data) >= len(categories)
 
 
+def test_bulk_create_categories(client: TestClient):
+    """Test bulk creating categories"""
+    categories = [
+        {"title": f"Bulk {i}", "description": "Bulk category"} for i in range(3)
+    ]
+    
+    response = client.post("/api/v1/categories:bulk", json=categories)
+    assert response.status_code == 200
+    
+    data = response.json()
+    assert data["created"] == 3
+    assert [row["status"] for row in data["results"]] == ["created"] * 3
+    
+    listed = client.get("/api/v1/categories/").json()
+    assert [category["id"] for category in listed] == [row["id"] for row in data["results"]]
+    assert [category["title"] for category in listed] == ["Bulk 0", "Bulk 1", "Bulk 2"]
+
+
 def test_update_category(client: TestClient):
     """Test updating a category"""
     # Create category
@@ -121,3 +141,52 @@ def test_delete_category_not_found(client: TestClient):
     """Test deleting non-existent category"""
     response = client.delete("/api/v1/categories/999")
     assert response.status_code == 404
+
+
+def test_category_writes_query_count(client: TestClient, query_counter):
+    """Test that creates and updates write and read back in one statement"""
+    query_counter.clear()
+    created = client.post("/api/v1/categories/", json={"title": "Electronics", "description": "Devices"})
+    assert len(query_counter) == 1
+    
+    query_counter.clear()
+    updated = client.put(f"/api/v1/categories/{created.json()['id']}", json={"title": "Gadgets"})
+    assert len(query_counter) == 1
+    assert updated.json() == {**created.json(), "title": "Gadgets"}
+    
+    query_counter.clear()
+    assert client.put("/api/v1/categories/999", json={"title": "Gadgets"}).status_code == 404
+    assert len(query_counter) == 1
+
+
+def test_delete_category_unlinks_items(client: TestClient, session):
+    """Test that deleting a category removes its item links instead of orphaning them"""
+    books, gifts = [
+        client.post("/api/v1/categories/", json={"title": title, "description": title}).json()["id"]
+        for title in ("Books", "Gifts")
+    ]
+    item_id = client.post("/api/v1/items/", json={
+        "title": "Novel", "description": "Book", "price": 10.0, "category_ids": [books, gifts]
+    }).json()["id"]
+    
+    assert client.delete(f"/api/v1/categories/{books}").status_code == 200
+    
+    item = client.get(f"/api/v1/items/{item_id}").json()
+    assert [category["id"] for category in item["categories"]] == [gifts]
+    assert session.exec(
+        select(ShopItemCategoryAssociation).where(ShopItemCategoryAssociation.category_id == books)
+    ).all() == []
+
+
+def test_bulk_delete_categories(client: TestClient):
+    """Test deleting many categories, reporting the IDs that weren't found"""
+    category_ids = [
+        result["id"] for result in client.post("/api/v1/categories:bulk", json=[
+            {"title": f"Category {n}", "description": "Category"} for n in range(3)
+        ]).json()["results"]
+    ]
+    
+    response = client.post("/api/v1/categories:bulk-delete", json=[category_ids[0], category_ids[2], 999])
+    assert response.status_code == 200
+    assert response.json() == {"deleted": 2, "not_found": [999]}
+    assert [category["id"] for category in client.get("/api/v1/categories/").json()] == [category_ids[1]]
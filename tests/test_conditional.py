@@ -0,0 +1,86 @@
+"""
+Conditional GET (ETag / If-None-Match) tests
+"""
+from fastapi.testclient import TestClient
+from app.utils.cache import catalog_cache
+from app.utils.conditional import etag_matches
+
+
+def test_etag_matches():
+    """Test If-None-Match parsing"""
+    assert etag_matches('"abc"', '"abc"')
+    assert etag_matches('"xyz", W/"abc"', '"abc"')
+    assert etag_matches("*", '"abc"')
+    assert not etag_matches('"xyz"', '"abc"')
+    assert not etag_matches(None, '"abc"')
+
+
+def test_get_shop_item_not_modified(client: TestClient, query_counter):
+    """Test that a matching If-None-Match returns 304 without touching the database"""
+    item_id = client.post("/api/v1/items/", json={
+        "title": "Item", "description": "Item", "price": 9.99
+    }).json()["id"]
+    
+    response = client.get(f"/api/v1/items/{item_id}")
+    etag = response.headers["etag"]
+    assert response.headers["cache-control"] == "no-cache"
+    
+    query_counter.clear()
+    response = client.get(f"/api/v1/items/{item_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+    assert query_counter == []
+
+
+def test_not_modified_without_cache(client: TestClient, monkeypatch):
+    """Test that an uncached read still honours If-None-Match"""
+    monkeypatch.setattr(catalog_cache, "enabled", False)
+    category_id = client.post("/api/v1/categories/", json={
+        "title": "Category", "description": "Category"
+    }).json()["id"]
+    
+    etag = client.get(f"/api/v1/categories/{category_id}").headers["etag"]
+    response = client.get(f"/api/v1/categories/{category_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    
+    etag = client.get("/api/v1/categories/").headers["etag"]
+    response = client.get("/api/v1/categories/", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+
+def test_update_shop_item_changes_etag(client: TestClient):
+    """Test that an item update bumps its version and ETag"""
+    item_id = client.post("/api/v1/items/", json={
+        "title": "Before", "description": "Item", "price": 9.99
+    }).json()["id"]
+    etag = client.get(f"/api/v1/items/{item_id}").headers["etag"]
+    list_etag = client.get("/api/v1/items/").headers["etag"]
+    
+    client.put(f"/api/v1/items/{item_id}", json={"title": "After"})
+    
+    response = client.get(f"/api/v1/items/{item_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["title"] == "After"
+    assert response.headers["etag"] != etag
+    
+    response = client.get("/api/v1/items/", headers={"If-None-Match": list_etag})
+    assert response.status_code == 200
+
+
+def test_update_category_changes_item_etag(client: TestClient):
+    """Test that a category update changes the ETag of items embedding it"""
+    category_id = client.post("/api/v1/categories/", json={
+        "title": "Before", "description": "Category"
+    }).json()["id"]
+    item_id = client.post("/api/v1/items/", json={
+        "title": "Item", "description": "Item", "price": 9.99,
+        "category_ids": [category_id]
+    }).json()["id"]
+    etag = client.get(f"/api/v1/items/{item_id}").headers["etag"]
+    
+    client.put(f"/api/v1/categories/{category_id}", json={"title": "After"})
+    
+    response = client.get(f"/api/v1/items/{item_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["categories"][0]["title"] == "After"
@@ -1,9 +1,11 @@
 """
 Customer endpoint tests
 """
+from concurrent.futures import ThreadPoolExecutor
 import pytest
 from fastapi.testclient import TestClient
-from app.models import Customer
+from sqlmodel import Session, select
+from app.models import Customer, Order
 
 
 def test_create_customer(client: TestClient):
@@ -39,6 +41,45 @@ def test_create_customer_duplicate_email(client: TestClient):
     # Try to create second customer with same email
     response = client.post("/api/v1/customers/", json=customer_data)
     assert response.status_code == 409
+    assert response.json()["detail"] == "Email already exists"
+    
+    # Emails are unique regardless of case
+    response = client.post("/api/v1/customers/", json={**customer_data, "email": "John.Doe@Test.com"})
+    assert response.status_code == 409
+
+
+def test_update_customer_duplicate_email(client: TestClient):
+    """Test that an update can't take another customer's email"""
+    client.post("/api/v1/customers/", json={"name": "John", "surname": "Doe", "email": "john@test.com"})
+    jane = client.post("/api/v1/customers/", json={
+        "name": "Jane", "surname": "Doe", "email": "jane@test.com"
+    }).json()
+    
+    response = client.put(f"/api/v1/customers/{jane['id']}", json={"email": "JOHN@test.com"})
+    assert response.status_code == 409
+    assert client.get(f"/api/v1/customers/{jane['id']}").json() == jane
+    
+    # Keeping your own email, in any case, is fine
+    response = client.put(f"/api/v1/customers/{jane['id']}", json={"email": "Jane@test.com"})
+    assert response.status_code == 200
+
+
+def test_concurrent_signups_never_duplicate(file_client):
+    """Test that concurrent signups with one email create exactly one customer"""
+    client, engine = file_client
+    
+    def sign_up(n):
+        return client.post("/api/v1/customers/", json={
+            "name": "Rush", "surname": f"Signup {n}", "email": "rush@test.com" if n % 2 else "RUSH@test.com"
+        }).status_code
+    
+    with ThreadPoolExecutor(max_workers=20) as pool:
+        statuses = list(pool.map(sign_up, range(40)))
+    
+    assert statuses.count(201) == 1
+    assert statuses.count(409) == 39
+    with Session(engine) as session:
+        assert len(session.exec(select(Customer)).all()) == 1
 
 
 def test_get_customer(client: TestClient):
@@ -86,6 +127,139 @@ def test_list_customers(client: TestClient):
     assert len(data) >= len(customers)
 
 
+def test_list_customers_keyset_pagination(client: TestClient):
+    """Test walking customers with the cursor from X-Next-Cursor"""
+    for i in range(5):
+        client.post("/api/v1/customers/", json={
+            "name": "Page", "surname": str(i), "email": f"page{i}@test.com"
+        })
+    
+    # First page comes from the regular offset mode
+    response = client.get("/api/v1/customers/?limit=2")
+    seen = [customer["id"] for customer in response.json()]
+    cursor = response.headers.get("X-Next-Cursor")
+    
+    while cursor:
+        response = client.get(f"/api/v1/customers/?limit=2&cursor={cursor}")
+        assert response.status_code == 200
+        seen.extend(customer["id"] for customer in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+    
+    assert len(seen) == 5
+    assert seen == sorted(seen)
+    
+    # Offset paging still works and agrees with keyset paging
+    response = client.get("/api/v1/customers/?skip=2&limit=2")
+    assert [customer["id"] for customer in response.json()] == seen[2:4]
+
+
+def test_list_customers_invalid_cursor(client: TestClient):
+    """Test listing customers with a malformed cursor"""
+    response = client.get("/api/v1/customers/?cursor=not-a-cursor")
+    assert response.status_code == 400
+    
+    response = client.get("/api/v1/customers/?cursor=WzFd&skip=1")
+    assert response.status_code == 400
+
+
+def test_list_customer_orders(client: TestClient, query_plans):
+    """Test walking one customer's order history with the cursor"""
+    customer_ids = [
+        result["id"] for result in client.post("/api/v1/customers:bulk", json=[
+            {"name": "History", "surname": "User", "email": f"history{i}@test.com"}
+            for i in range(2)
+        ]).json()["results"]
+    ]
+    item_id = client.post("/api/v1/items/", json={
+        "title": "Item", "description": "Item", "price": 1.0
+    }).json()["id"]
+    for i in range(7):
+        client.post("/api/v1/orders/", json={
+            "customer_id": customer_ids[i % 2],
+            "items": [{"shop_item_id": item_id, "quantity": 1}]
+        })
+    
+    seen = []
+    url = f"/api/v1/customers/{customer_ids[0]}/orders?limit=2"
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        seen.extend(response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        url = f"/api/v1/customers/{customer_ids[0]}/orders?limit=2&cursor={cursor}" if cursor else None
+    
+    assert len(seen) == 4
+    assert all(order["customer_id"] == customer_ids[0] for order in seen)
+    assert [order["created_at"] for order in seen] == sorted(order["created_at"] for order in seen)
+    
+    filtered = client.get(f"/api/v1/orders/?customer_id={customer_ids[1]}").json()
+    assert [order["id"] for order in filtered] == [2, 4, 6]
+    
+    # The history is read straight off the composite index, without a sort
+    first_page = client.get(f"/api/v1/customers/{customer_ids[0]}/orders?limit=2")
+    query_plans.clear()
+    client.get(
+        f"/api/v1/customers/{customer_ids[0]}/orders?limit=2"
+        f"&cursor={first_page.headers['X-Next-Cursor']}"
+    )
+    details = [detail for plan in query_plans for detail in plan]
+    assert any("ix_orders_customer_id_created_at_id" in detail for detail in details)
+    assert not any("TEMP B-TREE" in detail for detail in details)
+
+
+def test_list_customer_orders_not_found(client: TestClient):
+    """Test listing orders of a missing customer"""
+    response = client.get("/api/v1/customers/999/orders")
+    assert response.status_code == 404
+
+
+def test_bulk_create_customers(client: TestClient):
+    """Test bulk creating customers with per-row conflict results"""
+    client.post("/api/v1/customers/", json={
+        "name": "Existing", "surname": "Customer", "email": "existing@test.com"
+    })
+    
+    customers = [
+        {"name": "Bulk", "surname": "One", "email": "bulk1@test.com"},
+        {"name": "Bulk", "surname": "Two", "email": "Existing@Test.com"},
+        {"name": "Bulk", "surname": "Three", "email": "bulk3@test.com"},
+        {"name": "Bulk", "surname": "Four", "email": "BULK1@test.com"}
+    ]
+    response = client.post("/api/v1/customers:bulk", json=customers)
+    assert response.status_code == 200
+    
+    data = response.json()
+    assert (data["created"], data["updated"], data["failed"]) == (2, 0, 2)
+    assert [row["status"] for row in data["results"]] == [
+        "created", "conflict", "created", "conflict"
+    ]
+    assert [row["index"] for row in data["results"]] == [0, 1, 2, 3]
+    
+    created_id = data["results"][2]["id"]
+    assert client.get(f"/api/v1/customers/{created_id}").json()["surname"] == "Three"
+
+
+def test_bulk_upsert_customers(client: TestClient):
+    """Test bulk upserting customers by email"""
+    existing_id = client.post("/api/v1/customers/", json={
+        "name": "Old", "surname": "Name", "email": "upsert@test.com"
+    }).json()["id"]
+    
+    customers = [
+        {"name": "New", "surname": "Name", "email": "upsert@test.com"},
+        {"name": "Fresh", "surname": "Customer", "email": "fresh@test.com"}
+    ]
+    response = client.post("/api/v1/customers:bulk?on_conflict=update", json=customers)
+    assert response.status_code == 200
+    
+    data = response.json()
+    assert (data["created"], data["updated"], data["failed"]) == (1, 1, 0)
+    assert data["results"][0] == {
+        "index": 0, "status": "updated", "id": existing_id, "detail": None
+    }
+    assert client.get(f"/api/v1/customers/{existing_id}").json()["name"] == "New"
+
+
 def test_update_customer(client: TestClient):
     """Test updating a customer"""
     # Create customer
@@ -111,6 +285,17 @@ def test_update_customer(client: TestClient):
     assert data["email"] == update_data["email"]
 
 
+def test_update_customer_null_field(client: TestClient):
+    """Test that nulling a required field is a validation error, not a conflict"""
+    customer = client.post("/api/v1/customers/", json={
+        "name": "John", "surname": "Doe", "email": "john@test.com"
+    }).json()
+    
+    response = client.put(f"/api/v1/customers/{customer['id']}", json={"name": None})
+    assert response.status_code == 422
+    assert client.get(f"/api/v1/customers/{customer['id']}").json() == customer
+
+
 def test_update_customer_not_found(client: TestClient):
     """Test updating non-existent customer"""
     update_data = {
@@ -146,3 +331,60 @@ def test_delete_customer_not_found(client: TestClient):
     """Test deleting non-existent customer"""
     response = client.delete("/api/v1/customers/999")
     assert response.status_code == 404
+
+
+def test_customer_writes_query_count(client: TestClient, query_counter):
+    """Test that creates and updates write and read back in one statement"""
+    customer_data = {"name": "John", "surname": "Doe", "email": "john@test.com"}
+    query_counter.clear()
+    created = client.post("/api/v1/customers/", json=customer_data)
+    assert len(query_counter) == 1
+    
+    query_counter.clear()
+    updated = client.put(f"/api/v1/customers/{created.json()['id']}", json={"name": "Jane"})
+    assert len(query_counter) == 1
+    assert updated.json() == {**created.json(), "name": "Jane"}
+    
+    query_counter.clear()
+    assert client.put("/api/v1/customers/999", json={"name": "Jane"}).status_code == 404
+    assert len(query_counter) == 1
+
+
+def test_delete_customer_with_orders_conflicts(client: TestClient, session):
+    """Test that a customer with orders can't be hard deleted, leaving stock and revenue alone"""
+    customer_id = client.post("/api/v1/customers/", json={
+        "name": "John", "surname": "Doe", "email": "john@test.com"
+    }).json()["id"]
+    item_id = client.post("/api/v1/items/", json={
+        "title": "Item", "description": "Item", "price": 5.0, "stock": 10
+    }).json()["id"]
+    for quantity in (1, 2):
+        client.post("/api/v1/orders/", json={
+            "customer_id": customer_id, "items": [{"shop_item_id": item_id, "quantity": quantity}]
+        })
+    revenue = client.get("/api/v1/analytics/revenue").json()
+    
+    response = client.delete(f"/api/v1/customers/{customer_id}")
+    assert response.status_code == 409
+    assert str(customer_id) in response.json()["detail"]
+    assert client.post("/api/v1/customers:bulk-delete", json=[customer_id]).status_code == 409
+    
+    assert len(session.exec(select(Order)).all()) == 2
+    assert client.get(f"/api/v1/customers/{customer_id}").status_code == 200
+    assert client.get(f"/api/v1/items/{item_id}").json()["stock"] == 7
+    assert client.get("/api/v1/analytics/revenue").json() == revenue
+    assert revenue[0]["revenue"] == 15.0
+
+
+def test_bulk_delete_customers(client: TestClient):
+    """Test deleting many customers, reporting the IDs that weren't found"""
+    customer_ids = [
+        result["id"] for result in client.post("/api/v1/customers:bulk", json=[
+            {"name": "Bulk", "surname": str(n), "email": f"bulk{n}@test.com"} for n in range(3)
+        ]).json()["results"]
+    ]
+    
+    response = client.post("/api/v1/customers:bulk-delete", json=[*customer_ids[:2], 999])
+    assert response.status_code == 200
+    assert response.json() == {"deleted": 2, "not_found": [999]}
+    assert [customer["id"] for customer in client.get("/api/v1/customers/").json()] == [customer_ids[2]]
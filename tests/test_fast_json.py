@@ -0,0 +1,102 @@
+"""
+Fast list response tests
+"""
+import json
+import pytest
+from fastapi.testclient import TestClient
+from app.utils.cache import catalog_cache
+from app.utils.fast_json import encode_json, fast_list_responses
+
+
+LIST_URLS = [
+    "/api/v1/customers/?limit=2",
+    "/api/v1/customers/1/orders?limit=2",
+    "/api/v1/categories/?limit=2",
+    "/api/v1/items/?limit=2",
+    "/api/v1/items/?sort=price&category_ids=1",
+    "/api/v1/orders/?limit=2",
+    "/api/v1/orders/?customer_id=1",
+]
+
+
+@pytest.fixture
+def fast_lists():
+    """Serve list endpoints from the fast path for one test"""
+    with fast_list_responses.override(True):
+        yield
+
+
+@pytest.fixture
+def shop(client: TestClient):
+    """A few customers, categories, items (one without categories) and orders"""
+    for n in range(3):
+        client.post("/api/v1/customers/", json={
+            "name": "Zoë", "surname": f"Ünïcode {n}", "email": f"zoe{n}@test.com"
+        })
+    for title in ("Electronics", "Books", "Gifts"):
+        client.post("/api/v1/categories/", json={"title": title, "description": f"{title} \"quoted\""})
+    client.post("/api/v1/items/", json={
+        "title": "Phone", "description": "Smart", "price": 699.99, "stock": 5, "category_ids": [3, 1]
+    })
+    client.post("/api/v1/items/", json={"title": "Novel", "description": "Paperback", "price": 0.1 + 0.2})
+    client.post("/api/v1/items/", json={
+        "title": "Lamp", "description": "Desk lamp", "price": 25.0, "category_ids": [1]
+    })
+    for customer_id, items in ((1, [1, 2]), (1, [3]), (2, [2, 3]), (1, [1])):
+        client.post("/api/v1/orders/", json={
+            "customer_id": customer_id,
+            "items": [{"shop_item_id": item_id, "quantity": 2} for item_id in items]
+        })
+    return client
+
+
+@pytest.mark.parametrize("url", LIST_URLS)
+def test_fast_list_matches_default(shop: TestClient, url):
+    """Test that the fast path sends the same bytes and headers as the default path"""
+    default = shop.get(url)
+    catalog_cache.clear()
+    with fast_list_responses.override(True):
+        fast = shop.get(url)
+    
+    assert default.status_code == fast.status_code == 200
+    assert fast.content == default.content
+    for header in ("content-type", "etag", "x-next-cursor"):
+        assert fast.headers.get(header) == default.headers.get(header)
+
+
+def test_fast_list_follows_cursor(shop: TestClient, fast_lists):
+    """Test that cursors from the fast path page through every row"""
+    first = shop.get("/api/v1/orders/?limit=3")
+    second = shop.get(f"/api/v1/orders/?limit=3&cursor={first.headers['x-next-cursor']}")
+    
+    assert [order["id"] for order in first.json() + second.json()] == [1, 2, 3, 4]
+    assert "x-next-cursor" not in second.headers
+
+
+def test_fast_list_served_from_cache(shop: TestClient, fast_lists, query_counter):
+    """Test that cached fast pages are sent without re-encoding and still revalidate"""
+    first = shop.get("/api/v1/items/")
+    query_counter.clear()
+    second = shop.get("/api/v1/items/")
+    not_modified = shop.get("/api/v1/items/", headers={"If-None-Match": first.headers["etag"]})
+    
+    assert query_counter == []
+    assert second.content == first.content
+    assert not_modified.status_code == 304
+
+
+def test_fast_list_sees_category_changes(shop: TestClient, fast_lists):
+    """Test that category edits drop cached fast item pages"""
+    shop.get("/api/v1/items/")
+    shop.put("/api/v1/categories/1", json={"title": "Gadgets"})
+    
+    phone = shop.get("/api/v1/items/").json()[0]
+    assert [category["title"] for category in phone["categories"]] == ["Gadgets", "Gifts"]
+
+
+@pytest.mark.parametrize("value", [1e16, 2.5e20, 1e-05, 3.2e-07, 0.0001, 123.45, 0.0])
+def test_encode_json_floats_match_stdlib(value):
+    """Test that floats json.dumps writes in exponent form are encoded the same way"""
+    content = [{"price": value, "title": "Ünïcode  "}]
+    expected = json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode()
+    assert encode_json(content, [value]) == expected
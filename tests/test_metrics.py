@@ -0,0 +1,59 @@
+"""
+Request and query metrics tests
+"""
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlmodel import select
+from app.database import SessionDep, get_session
+from app.models import Customer
+from app.utils.metrics import MetricsMiddleware, MetricsRegistry, metrics
+
+
+def test_metrics_endpoint(client: TestClient):
+    """Test that requests are recorded per route template with their query counts"""
+    metrics.reset()
+    customer_id = client.post("/api/v1/customers/", json={
+        "name": "Metric", "surname": "User", "email": "metric@test.com"
+    }).json()["id"]
+    client.get(f"/api/v1/customers/{customer_id}")
+    client.get("/api/v1/customers/999")
+    client.get("/no/such/path")
+    
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    lines = response.text.splitlines()
+    
+    assert 'http_requests_total{method="GET",route="/api/v1/customers/{customer_id}",status="200"} 1' in lines
+    assert 'http_requests_total{method="GET",route="/api/v1/customers/{customer_id}",status="404"} 1' in lines
+    assert 'http_requests_total{method="POST",route="/api/v1/customers/",status="201"} 1' in lines
+    assert 'http_requests_total{method="GET",route="unmatched",status="404"} 1' in lines
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/v1/customers/{customer_id}"} 2' in lines
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/api/v1/customers/{customer_id}",le="+Inf"} 2' in lines
+    # One SELECT per lookup
+    assert 'http_request_db_queries_sum{method="GET",route="/api/v1/customers/{customer_id}"} 2.000000' in lines
+    assert 'http_request_db_queries_bucket{method="GET",route="unmatched",le="0"} 1' in lines
+    assert any(line.startswith("http_request_db_seconds_total{") for line in lines)
+
+
+def test_query_count_header(session):
+    """Test that debug mode reports each request's query count in a header"""
+    app = FastAPI()
+    
+    @app.get("/customers")
+    def list_customers(db: SessionDep):
+        db.exec(select(Customer)).all()
+        db.exec(select(Customer)).all()
+        return []
+    
+    def get_session_override():
+        return session
+    
+    app.dependency_overrides[get_session] = get_session_override
+    registry = MetricsRegistry()
+    app.add_middleware(MetricsMiddleware, registry=registry, expose_query_count=True)
+    
+    response = TestClient(app).get("/customers")
+    assert response.headers["x-query-count"] == "2"
+    assert float(response.headers["x-query-time-ms"]) >= 0
+    assert registry.queries[("GET", "/customers")].total == 2
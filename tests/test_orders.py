@@ -1,8 +1,18 @@
 """
 Order endpoint tests
 """
+import csv
+import io
+import json
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from datetime import datetime, timedelta
 import pytest
 from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+from app.database import idempotency
+from app.database.idempotency import purge_expired_idempotency_keys
+from app.models import IdempotencyKey, Order, OrderCreate, ShopItem
 
 
 def test_create_order(client: TestClient):
@@ -43,6 +53,49 @@ def test_create_order(client: TestClient):
     assert data["customer_id"] == customer_id
     assert "id" in data
     assert "created_at" in data
+    assert len(data["items"]) == 1
+    assert data["items"][0]["shop_item_id"] == item_id
+    assert data["items"][0]["quantity"] == 2
+    assert data["items"][0]["unit_price"] == 19.99
+    assert data["total_amount"] == 39.98
+    assert data["item_count"] == 2
+
+
+def test_order_totals_follow_items_not_later_prices(client: TestClient):
+    """Test that totals are recomputed on update and survive later price changes"""
+    customer_id = client.post("/api/v1/customers/", json={
+        "name": "Total", "surname": "User", "email": "totals@test.com"
+    }).json()["id"]
+    book_id = client.post("/api/v1/items/", json={
+        "title": "Book", "description": "Test", "price": 12.5
+    }).json()["id"]
+    pen_id = client.post("/api/v1/items/", json={
+        "title": "Pen", "description": "Test", "price": 0.1
+    }).json()["id"]
+    
+    order = client.post("/api/v1/orders/", json={
+        "customer_id": customer_id,
+        "items": [{"shop_item_id": book_id, "quantity": 2}, {"shop_item_id": pen_id, "quantity": 3}]
+    }).json()
+    assert order["total_amount"] == 25.3
+    assert order["item_count"] == 5
+    
+    # Repricing the catalog doesn't rewrite past orders
+    client.put(f"/api/v1/items/{book_id}", json={"price": 99.0})
+    order = client.get(f"/api/v1/orders/{order['id']}").json()
+    assert order["total_amount"] == 25.3
+    assert order["items"][0]["unit_price"] == 12.5
+    
+    # Replacing the items snapshots current prices again
+    order = client.put(f"/api/v1/orders/{order['id']}", json={
+        "items": [{"shop_item_id": book_id, "quantity": 1}]
+    }).json()
+    assert order["total_amount"] == 99.0
+    assert order["item_count"] == 1
+    
+    order = client.put(f"/api/v1/orders/{order['id']}", json={"items": []}).json()
+    assert order["total_amount"] == 0
+    assert order["item_count"] == 0
 
 
 def test_create_order_invalid_customer(client: TestClient):
@@ -97,6 +150,56 @@ def test_create_order_invalid_item(client: TestClient):
     assert response.status_code == 404
 
 
+def test_create_order_invalid_item_leaves_no_order(client: TestClient):
+    """Test that a bad order line does not leave an orphan order behind"""
+    customer_response = client.post("/api/v1/customers/", json={
+        "name": "Orphan", "surname": "Check", "email": "orphan@test.com"
+    })
+    item_response = client.post("/api/v1/items/", json={
+        "title": "Test Item", "description": "Test", "price": 10.99
+    })
+    
+    order_data = {
+        "customer_id": customer_response.json()["id"],
+        "items": [
+            {"shop_item_id": item_response.json()["id"], "quantity": 1},
+            {"shop_item_id": 999, "quantity": 1}
+        ]
+    }
+    
+    response = client.post("/api/v1/orders/", json=order_data)
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Shop item with ID 999 not found"
+    
+    # Verify no order was persisted
+    list_response = client.get("/api/v1/orders/")
+    assert list_response.json() == []
+
+
+def test_create_order_many_items(client: TestClient):
+    """Test creating an order with a large cart"""
+    customer_response = client.post("/api/v1/customers/", json={
+        "name": "Big", "surname": "Cart", "email": "bigcart@test.com"
+    })
+    item_ids = [
+        client.post("/api/v1/items/", json={
+            "title": f"Item {i}", "description": "Test", "price": 1.5
+        }).json()["id"]
+        for i in range(5)
+    ]
+    
+    order_data = {
+        "customer_id": customer_response.json()["id"],
+        "items": [
+            {"shop_item_id": item_ids[i % len(item_ids)], "quantity": i + 1}
+            for i in range(200)
+        ]
+    }
+    
+    response = client.post("/api/v1/orders/", json=order_data)
+    assert response.status_code == 201
+
+
 def test_get_order(client: TestClient):
     """Test getting an order by ID"""
     # Create customer and item first
@@ -169,6 +272,94 @@ def test_list_orders(client: TestClient):
     assert len(data) >= len(orders)
 
 
+def test_list_orders_query_count(client: TestClient, query_counter):
+    """Test that listing orders costs a constant number of queries"""
+    customer_id = client.post("/api/v1/customers/", json={
+        "name": "Query", "surname": "Count", "email": "queries@test.com"
+    }).json()["id"]
+    item_id = client.post("/api/v1/items/", json={
+        "title": "Test Item", "description": "Test", "price": 10.99
+    }).json()["id"]
+    
+    def count_list_queries() -> int:
+        query_counter.clear()
+        response = client.get("/api/v1/orders/?limit=1000")
+        assert response.status_code == 200
+        return len(query_counter)
+    
+    order_data = {
+        "customer_id": customer_id,
+        "items": [
+            {"shop_item_id": item_id, "quantity": 1},
+            {"shop_item_id": item_id, "quantity": 2}
+        ]
+    }
+    client.post("/api/v1/orders/", json=order_data)
+    single_order_queries = count_list_queries()
+    
+    for _ in range(20):
+        client.post("/api/v1/orders/", json=order_data)
+    response = client.get("/api/v1/orders/?limit=1000")
+    assert all(len(order["items"]) == 2 for order in response.json())
+    
+    assert count_list_queries() == single_order_queries <= 2
+
+
+def test_export_orders_ndjson(client: TestClient):
+    """Test that the NDJSON export matches the list endpoint record for record"""
+    customer_id = client.post("/api/v1/customers/", json={
+        "name": "Export", "surname": "User", "email": "export@test.com"
+    }).json()["id"]
+    item_id = client.post("/api/v1/items/", json={
+        "title": "Test Item", "description": "Test", "price": 10.99
+    }).json()["id"]
+    client.post("/api/v1/orders/", json={
+        "customer_id": customer_id,
+        "items": [{"shop_item_id": item_id, "quantity": 1}, {"shop_item_id": item_id, "quantity": 2}]
+    })
+    client.post("/api/v1/orders/", json={"customer_id": customer_id, "items": []})
+    
+    response = client.get("/api/v1/orders/export?format=ndjson")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    
+    exported = [json.loads(line) for line in response.text.splitlines()]
+    assert exported == client.get("/api/v1/orders/").json()
+    assert [len(order["items"]) for order in exported] == [2, 0]
+
+
+def test_export_orders_csv(client: TestClient):
+    """Test exporting orders as CSV with one line per order item"""
+    customer_id = client.post("/api/v1/customers/", json={
+        "name": "Export", "surname": "User", "email": "export-csv@test.com"
+    }).json()["id"]
+    item_id = client.post("/api/v1/items/", json={
+        "title": "Test Item", "description": "Test", "price": 10.99
+    }).json()["id"]
+    order_id = client.post("/api/v1/orders/", json={
+        "customer_id": customer_id,
+        "items": [{"shop_item_id": item_id, "quantity": 3}]
+    }).json()["id"]
+    
+    response = client.get("/api/v1/orders/export?format=csv")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert len(rows) == 1
+    assert rows[0]["order_id"] == str(order_id)
+    assert rows[0]["shop_item_id"] == str(item_id)
+    assert rows[0]["quantity"] == "3"
+    assert rows[0]["unit_price"] == "10.99"
+    assert rows[0]["total_amount"] == "32.97"
+
+
+def test_export_orders_invalid_format(client: TestClient):
+    """Test exporting orders in an unsupported format"""
+    response = client.get("/api/v1/orders/export?format=xml")
+    assert response.status_code == 422
+
+
 def test_update_order(client: TestClient):
     """Test updating an order"""
     # Create customer and items
@@ -204,6 +395,38 @@ def test_update_order(client: TestClient):
     
     data = response.json()
     assert data["customer_id"] == customer2_id
+    assert [item["quantity"] for item in data["items"]] == [3]
+
+
+def test_update_order_customer_and_items_within_budget(client: TestClient, query_counter):
+    """Test that the costliest update, new customer and restocking items, stays in its budget"""
+    customer_ids = [
+        client.post("/api/v1/customers/", json={
+            "name": "Customer", "surname": str(n), "email": f"customer{n}@test.com"
+        }).json()["id"]
+        for n in range(2)
+    ]
+    category_id = client.post("/api/v1/categories/", json={"title": "Books", "description": "Books"}).json()["id"]
+    item_ids = [
+        client.post("/api/v1/items/", json={
+            "title": f"Item {n}", "description": "Stocked", "price": 5.0, "stock": 10,
+            "category_ids": [category_id]
+        }).json()["id"]
+        for n in range(2)
+    ]
+    order_id = client.post("/api/v1/orders/", json={
+        "customer_id": customer_ids[0], "items": [{"shop_item_id": item_ids[0], "quantity": 2}]
+    }).json()["id"]
+    
+    query_counter.clear()
+    response = client.put(f"/api/v1/orders/{order_id}", json={
+        "customer_id": customer_ids[1], "items": [{"shop_item_id": item_ids[1], "quantity": 3}]
+    })
+    assert response.status_code == 200
+    assert response.json()["customer_id"] == customer_ids[1]
+    # The new customer and totals go out together, in the commit
+    assert sum(statement.startswith("UPDATE orders") for statement in query_counter) == 1
+    assert [item["stock"] for item in client.get("/api/v1/items/").json()] == [10, 7]
 
 
 def test_update_order_not_found(client: TestClient):
@@ -250,3 +473,273 @@ def test_delete_order_not_found(client: TestClient):
     """Test deleting non-existent order"""
     response = client.delete("/api/v1/orders/999")
     assert response.status_code == 404
+
+
+def test_order_reserves_stock(client: TestClient):
+    """Test that orders take, return and refuse stock"""
+    customer_id = client.post("/api/v1/customers/", json={
+        "name": "Stock", "surname": "User", "email": "stock@test.com"
+    }).json()["id"]
+    stocked_id = client.post("/api/v1/items/", json={
+        "title": "Stocked", "description": "Stocked", "price": 5.0, "stock": 5
+    }).json()["id"]
+    untracked_id = client.post("/api/v1/items/", json={
+        "title": "Untracked", "description": "Untracked", "price": 1.0
+    }).json()["id"]
+    
+    def stock():
+        return client.get(f"/api/v1/items/{stocked_id}").json()["stock"]
+    
+    order = client.post("/api/v1/orders/", json={
+        "customer_id": customer_id,
+        "items": [
+            {"shop_item_id": stocked_id, "quantity": 2},
+            {"shop_item_id": untracked_id, "quantity": 100},
+            {"shop_item_id": stocked_id, "quantity": 1}
+        ]
+    })
+    assert order.status_code == 201
+    assert stock() == 2
+    assert client.get(f"/api/v1/items/{untracked_id}").json()["stock"] is None
+    
+    # Any short line rolls back the whole order
+    response = client.post("/api/v1/orders/", json={
+        "customer_id": customer_id,
+        "items": [
+            {"shop_item_id": untracked_id, "quantity": 1},
+            {"shop_item_id": stocked_id, "quantity": 3}
+        ]
+    })
+    assert response.status_code == 409
+    assert response.json()["detail"] == f"Insufficient stock for shop item with ID {stocked_id}"
+    assert stock() == 2
+    assert len(client.get("/api/v1/orders/").json()) == 1
+    
+    # Updates only take or return the difference
+    order_id = order.json()["id"]
+    client.put(f"/api/v1/orders/{order_id}", json={
+        "items": [{"shop_item_id": stocked_id, "quantity": 5}]
+    })
+    assert stock() == 0
+    assert client.put(f"/api/v1/orders/{order_id}", json={
+        "items": [{"shop_item_id": stocked_id, "quantity": 6}]
+    }).status_code == 409
+    assert client.get(f"/api/v1/orders/{order_id}").json()["item_count"] == 5
+    
+    client.delete(f"/api/v1/orders/{order_id}")
+    assert stock() == 5
+
+
+def test_concurrent_orders_never_oversell(file_client):
+    """Test that concurrent orders for the last units sell exactly the stock"""
+    client, engine = file_client
+    customer_id = client.post("/api/v1/customers/", json={
+        "name": "Rush", "surname": "Buyer", "email": "rush@test.com"
+    }).json()["id"]
+    item_id = client.post("/api/v1/items/", json={
+        "title": "Last units", "description": "Limited", "price": 9.99, "stock": 5
+    }).json()["id"]
+    
+    def place_order(_):
+        return client.post("/api/v1/orders/", json={
+            "customer_id": customer_id,
+            "items": [{"shop_item_id": item_id, "quantity": 1}]
+        }).status_code
+    
+    with ThreadPoolExecutor(max_workers=20) as pool:
+        statuses = list(pool.map(place_order, range(20)))
+    
+    assert statuses.count(201) == 5
+    assert statuses.count(409) == 15
+    with Session(engine) as session:
+        assert session.get(ShopItem, item_id).stock == 0
+        assert len(session.exec(select(Order)).all()) == 5
+
+
+def test_create_order_idempotency_key(client: TestClient):
+    """Test that a retried order with the same key replays the first response"""
+    customer_id = client.post("/api/v1/customers/", json={
+        "name": "Retry", "surname": "User", "email": "retry@test.com"
+    }).json()["id"]
+    item_id = client.post("/api/v1/items/", json={
+        "title": "Item", "description": "Item", "price": 2.5, "stock": 10
+    }).json()["id"]
+    order_data = {"customer_id": customer_id, "items": [{"shop_item_id": item_id, "quantity": 2}]}
+    headers = {"Idempotency-Key": "order-1"}
+    
+    first = client.post("/api/v1/orders/", json=order_data, headers=headers)
+    assert first.status_code == 201
+    assert "Idempotent-Replayed" not in first.headers
+    
+    retry = client.post("/api/v1/orders/", json=order_data, headers=headers)
+    assert retry.status_code == 201
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json() == first.json()
+    assert len(client.get("/api/v1/orders/").json()) == 1
+    assert client.get(f"/api/v1/items/{item_id}").json()["stock"] == 8
+    
+    # Reusing the key for another request is refused
+    order_data["items"][0]["quantity"] = 3
+    response = client.post("/api/v1/orders/", json=order_data, headers=headers)
+    assert response.status_code == 422
+    
+    # Without a key every request creates an order
+    client.post("/api/v1/orders/", json=order_data)
+    assert len(client.get("/api/v1/orders/").json()) == 2
+
+
+def test_failed_order_releases_idempotency_key(client: TestClient):
+    """Test that a failed request doesn't pin its error to the key"""
+    customer_id = client.post("/api/v1/customers/", json={
+        "name": "Retry", "surname": "User", "email": "release@test.com"
+    }).json()["id"]
+    item_id = client.post("/api/v1/items/", json={
+        "title": "Item", "description": "Item", "price": 2.5, "stock": 1
+    }).json()["id"]
+    order_data = {"customer_id": customer_id, "items": [{"shop_item_id": item_id, "quantity": 2}]}
+    headers = {"Idempotency-Key": "order-2"}
+    
+    assert client.post("/api/v1/orders/", json=order_data, headers=headers).status_code == 409
+    client.put(f"/api/v1/items/{item_id}", json={"stock": 2})
+    response = client.post("/api/v1/orders/", json=order_data, headers=headers)
+    assert response.status_code == 201
+    assert "Idempotent-Replayed" not in response.headers
+
+
+def test_concurrent_idempotent_retries_create_one_order(file_client):
+    """Test that concurrent duplicates wait for the first request instead of racing it"""
+    client, engine = file_client
+    customer_id = client.post("/api/v1/customers/", json={
+        "name": "Impatient", "surname": "Client", "email": "impatient@test.com"
+    }).json()["id"]
+    item_id = client.post("/api/v1/items/", json={
+        "title": "Item", "description": "Item", "price": 1.0
+    }).json()["id"]
+    
+    def place_order(_):
+        return client.post(
+            "/api/v1/orders/",
+            json={"customer_id": customer_id, "items": [{"shop_item_id": item_id, "quantity": 1}]},
+            headers={"Idempotency-Key": "same-key"}
+        )
+    
+    with ThreadPoolExecutor(max_workers=10) as pool:
+        responses = list(pool.map(place_order, range(10)))
+    
+    assert {response.status_code for response in responses} == {201}
+    assert len({response.json()["id"] for response in responses}) == 1
+    assert sum("Idempotent-Replayed" in response.headers for response in responses) == 9
+    with Session(engine) as session:
+        assert len(session.exec(select(Order)).all()) == 1
+
+
+@pytest.fixture
+def short_idempotency_wait(monkeypatch):
+    """Retries wait at most 0.2 s for a claimed key"""
+    monkeypatch.setattr(idempotency, "settings", replace(idempotency.settings, idempotency_wait=0.2))
+
+
+def test_stale_idempotency_claim_is_taken_over(client: TestClient, session, short_idempotency_wait):
+    """Test that a retry takes over the claim of a request that died before finishing"""
+    customer_id = client.post("/api/v1/customers/", json={
+        "name": "Crashed", "surname": "Worker", "email": "crashed@test.com"
+    }).json()["id"]
+    item_id = client.post("/api/v1/items/", json={
+        "title": "Item", "description": "Item", "price": 1.0
+    }).json()["id"]
+    order_data = {"customer_id": customer_id, "items": [{"shop_item_id": item_id, "quantity": 1}]}
+    now = datetime.utcnow()
+    session.add(IdempotencyKey(
+        scope="orders", key="dead", fingerprint=idempotency._fingerprint(OrderCreate(**order_data)),
+        created_at=now - timedelta(seconds=1), claimed_at=now - timedelta(seconds=1),
+        expires_at=now + timedelta(hours=1)
+    ))
+    session.commit()
+    
+    response = client.post("/api/v1/orders/", json=order_data, headers={"Idempotency-Key": "dead"})
+    assert response.status_code == 201
+    assert "Idempotent-Replayed" not in response.headers
+    retry = client.post("/api/v1/orders/", json=order_data, headers={"Idempotency-Key": "dead"})
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json() == response.json()
+
+
+def test_taken_over_claim_cannot_store(session):
+    """Test that a request whose claim was taken over can't record a response"""
+    now = datetime.utcnow()
+    session.add(IdempotencyKey(
+        scope="orders", key="moved", fingerprint="x", claimed_at=now, expires_at=now + timedelta(hours=1)
+    ))
+    session.commit()
+    idempotency._claims(session)["orders", "moved"] = now - timedelta(seconds=30)
+    
+    with pytest.raises(idempotency.HTTPException) as error:
+        idempotency.store_idempotent_response(session, "orders", "moved", 201, OrderCreate(customer_id=1, items=[]))
+    assert error.value.status_code == 409
+    session.rollback()
+    
+    # Releasing it leaves the new holder's claim in place
+    idempotency.release_idempotency_key(session, "orders", "moved")
+    assert session.get(IdempotencyKey, ("orders", "moved")) is not None
+
+
+def test_purge_expired_idempotency_keys(session):
+    """Test that the cleanup job drops only expired keys"""
+    now = datetime.utcnow()
+    session.add(IdempotencyKey(scope="orders", key="old", fingerprint="x", expires_at=now - timedelta(seconds=1)))
+    session.add(IdempotencyKey(scope="orders", key="new", fingerprint="x", expires_at=now + timedelta(hours=1)))
+    session.commit()
+    
+    assert purge_expired_idempotency_keys(session) == 1
+    assert [record.key for record in session.exec(select(IdempotencyKey)).all()] == ["new"]
+
+
+def test_create_order_query_count(client: TestClient, query_counter):
+    """Test that placing an order costs the same statements for any number of items"""
+    customer_id = client.post("/api/v1/customers/", json={
+        "name": "Query", "surname": "Count", "email": "queries@test.com"
+    }).json()["id"]
+    item_ids = [
+        client.post("/api/v1/items/", json={
+            "title": f"Item {n}", "description": "Test", "price": 10.99
+        }).json()["id"]
+        for n in range(5)
+    ]
+    
+    def count_create_queries(items) -> int:
+        query_counter.clear()
+        response = client.post("/api/v1/orders/", json={
+            "customer_id": customer_id,
+            "items": [{"shop_item_id": item_id, "quantity": 1} for item_id in items]
+        })
+        assert response.status_code == 201
+        assert [item["shop_item_id"] for item in response.json()["items"]] == list(items)
+        return len(query_counter)
+    
+    assert count_create_queries(item_ids[:1]) == count_create_queries(item_ids)
+    assert not [statement for statement in query_counter if statement.startswith("SELECT orders")]
+
+
+def test_bulk_delete_orders(client: TestClient):
+    """Test deleting many orders restocks their items and takes them out of the rollups"""
+    customer_id = client.post("/api/v1/customers/", json={
+        "name": "Bulk", "surname": "Buyer", "email": "bulk@test.com"
+    }).json()["id"]
+    item_id = client.post("/api/v1/items/", json={
+        "title": "Item", "description": "Item", "price": 2.5, "stock": 10
+    }).json()["id"]
+    order_ids = [
+        client.post("/api/v1/orders/", json={
+            "customer_id": customer_id, "items": [{"shop_item_id": item_id, "quantity": quantity}]
+        }).json()["id"]
+        for quantity in (1, 2, 3)
+    ]
+    
+    response = client.post("/api/v1/orders:bulk-delete", json=[order_ids[0], order_ids[2], 999])
+    assert response.status_code == 200
+    assert response.json() == {"deleted": 2, "not_found": [999]}
+    
+    assert [order["id"] for order in client.get("/api/v1/orders/").json()] == [order_ids[1]]
+    assert client.get(f"/api/v1/items/{item_id}").json()["stock"] == 8
+    revenue = client.get("/api/v1/analytics/revenue").json()
+    assert [(day["order_count"], day["item_count"], day["revenue"]) for day in revenue] == [(1, 2, 5.0)]
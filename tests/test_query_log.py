@@ -0,0 +1,122 @@
+"""
+Slow-query log and query budget tests
+"""
+import logging
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlmodel import select
+from app.database import SessionDep, get_session
+from app.models import Customer
+from app.utils.metrics import MetricsMiddleware, MetricsRegistry, unbudgeted_queries
+from app.utils.query_log import QueryBudgetExceeded, query_budget, query_budget_mode, slow_query_log
+
+
+@pytest.fixture
+def log_every_query():
+    """Record every statement in the slow-query log"""
+    threshold = slow_query_log.threshold
+    slow_query_log.threshold = 0
+    slow_query_log.clear()
+    yield
+    slow_query_log.threshold = threshold
+    slow_query_log.clear()
+
+
+@pytest.fixture
+def budget_app(session):
+    """App with a handler whose two queries exceed its budget of one"""
+    app = FastAPI()
+    
+    @app.get("/customers")
+    @query_budget(1)
+    def list_customers(db: SessionDep):
+        db.exec(select(Customer)).all()
+        db.exec(select(Customer)).all()
+        return []
+    
+    app.dependency_overrides[get_session] = lambda: session
+    app.add_middleware(MetricsMiddleware, registry=MetricsRegistry())
+    return app
+
+
+def test_slow_query_log(client: TestClient, log_every_query):
+    """Test that slow statements are kept with their parameters and route"""
+    client.get("/api/v1/customers/42")
+    
+    response = client.get("/api/v1/admin/slow-queries")
+    assert response.status_code == 200
+    entry = response.json()[0]
+    assert "FROM customers" in entry["statement"]
+    assert "42" in entry["parameters"]
+    assert entry["method"] == "GET"
+    assert entry["route"] == "/api/v1/customers/{customer_id}"
+    assert entry["duration_ms"] >= 0
+    
+    assert client.delete("/api/v1/admin/slow-queries").status_code == 200
+    assert slow_query_log.entries() == []
+
+
+def test_slow_query_log_is_bounded(log_every_query):
+    """Test that the ring buffer keeps only the newest entries"""
+    maxsize = slow_query_log._entries.maxlen
+    for n in range(maxsize + 5):
+        slow_query_log.record(f"SELECT {n}", (), 0.5)
+    
+    entries = slow_query_log.entries()
+    assert len(entries) == maxsize
+    assert entries[0].statement == f"SELECT {maxsize + 4}"
+    assert entries[0].duration_ms == 500
+
+
+def test_query_budget_raises_in_tests(budget_app):
+    """Test that going over a budget fails the request in raise mode"""
+    with pytest.raises(QueryBudgetExceeded, match="GET /customers issued 2 queries, over its budget of 1"):
+        TestClient(budget_app).get("/customers")
+
+
+def test_query_budget_overrun_is_a_server_error(budget_app):
+    """Test that the budget is checked before the response starts, so the client gets a 500"""
+    response = TestClient(budget_app, raise_server_exceptions=False).get("/customers")
+    assert response.status_code == 500
+
+
+def test_unbudgeted_queries_are_left_out(budget_app):
+    """Test that statements run inside unbudgeted_queries don't count against the budget"""
+    @budget_app.get("/polling")
+    @query_budget(1)
+    def poll(db: SessionDep):
+        with unbudgeted_queries():
+            db.exec(select(Customer)).all()
+            db.exec(select(Customer)).all()
+        db.exec(select(Customer)).all()
+        return []
+    
+    assert TestClient(budget_app).get("/polling").status_code == 200
+
+
+def test_query_budget_logs_in_production(budget_app, caplog, monkeypatch):
+    """Test that going over a budget only logs a warning in log mode"""
+    monkeypatch.setattr(query_budget_mode, "value", "log")
+    with caplog.at_level(logging.WARNING, logger="app.utils.query_log"):
+        response = TestClient(budget_app).get("/customers")
+    
+    assert response.status_code == 200
+    assert "over its budget of 1" in caplog.text
+
+
+def test_update_shop_item_categories_within_budget(client: TestClient):
+    """Test that relinking many categories costs a constant number of queries"""
+    category_ids = [
+        client.post("/api/v1/categories/", json={
+            "title": f"Category {n}", "description": "Category"
+        }).json()["id"]
+        for n in range(20)
+    ]
+    item_id = client.post("/api/v1/items/", json={
+        "title": "Item", "description": "Item", "price": 1.0, "category_ids": category_ids
+    }).json()["id"]
+    
+    response = client.put(f"/api/v1/items/{item_id}", json={"category_ids": category_ids[::-1] + [999]})
+    assert response.status_code == 200
+    assert sorted(category["id"] for category in response.json()["categories"]) == category_ids
@@ -1,8 +1,13 @@
 """
 Shop item endpoint tests
 """
+import json
+import re
 import pytest
 from fastapi.testclient import TestClient
+from sqlmodel import SQLModel, select
+from app.models import ShopItemCategoryAssociation
+from app.utils.cache import catalog_cache
 
 
 def test_create_shop_item(client: TestClient):
@@ -31,6 +36,7 @@ def test_create_shop_item(client: TestClient):
     assert data["description"] == item_data["description"]
     assert data["price"] == item_data["price"]
     assert "id" in data
+    assert [category["id"] for category in data["categories"]] == [category_id]
 
 
 def test_create_shop_item_without_categories(client: TestClient):
@@ -125,6 +131,272 @@ def test_list_shop_items_by_category(client: TestClient):
     assert len(data) >= 1
 
 
+def test_list_shop_items_by_category_keyset_pagination(client: TestClient):
+    """Test cursor paging combined with the category filter"""
+    category_id = client.post("/api/v1/categories/", json={
+        "title": "Paged", "description": "Paged category"
+    }).json()["id"]
+    for i in range(4):
+        client.post("/api/v1/items/", json={
+            "title": f"Item {i}", "description": "Description", "price": 10.99,
+            "category_ids": [category_id] if i % 2 == 0 else []
+        })
+    
+    response = client.get(f"/api/v1/items/?category_id={category_id}&limit=1")
+    cursor = response.headers["X-Next-Cursor"]
+    first_id = response.json()[0]["id"]
+    
+    response = client.get(f"/api/v1/items/?category_id={category_id}&limit=1&cursor={cursor}")
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data) == 1
+    assert data[0]["id"] > first_id
+    assert data[0]["categories"][0]["id"] == category_id
+
+
+def test_list_shop_items_filters_and_sort(client: TestClient):
+    """Test price range, multi-category and sort parameters"""
+    categories = client.post("/api/v1/categories:bulk", json=[
+        {"title": "Shoes", "description": "Shoes"},
+        {"title": "Sale", "description": "Sale"}
+    ]).json()["results"]
+    shoes, sale = categories[0]["id"], categories[1]["id"]
+    client.post("/api/v1/items:bulk", json=[
+        {"title": "Boots", "description": "Item", "price": 80.0, "category_ids": [shoes]},
+        {"title": "Sandals", "description": "Item", "price": 20.0, "category_ids": [shoes, sale]},
+        {"title": "Hat", "description": "Item", "price": 15.0, "category_ids": [sale]},
+        {"title": "Apron", "description": "Item", "price": 30.0}
+    ])
+    
+    def titles(query: str):
+        response = client.get(f"/api/v1/items/?{query}")
+        assert response.status_code == 200, response.text
+        return [item["title"] for item in response.json()]
+    
+    assert titles("min_price=20&max_price=30") == ["Sandals", "Apron"]
+    assert titles(f"category_ids={shoes}&category_ids={sale}") == ["Boots", "Sandals", "Hat"]
+    assert titles(f"category_ids={shoes}&category_ids={sale}&category_match=all") == ["Sandals"]
+    assert titles(f"category_id={sale}&max_price=18") == ["Hat"]
+    assert titles("sort=price") == ["Hat", "Sandals", "Apron", "Boots"]
+    assert titles("sort=title") == ["Apron", "Boots", "Hat", "Sandals"]
+    assert client.get("/api/v1/items/?sort=stock").status_code == 422
+
+
+@pytest.mark.parametrize("sort", ["price", "title"])
+def test_list_shop_items_sorted_keyset_pagination(client: TestClient, sort: str):
+    """Test walking a sorted listing with ties using the cursor"""
+    client.post("/api/v1/items:bulk", json=[
+        {"title": f"Item {4 - i // 2}", "description": "Item", "price": float(5 - i // 2)}
+        for i in range(5)
+    ])
+    
+    seen = []
+    url = f"/api/v1/items/?sort={sort}&limit=2"
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        seen.extend((item[sort], item["id"]) for item in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        url = f"/api/v1/items/?sort={sort}&limit=2&cursor={cursor}" if cursor else None
+    
+    assert seen == sorted(seen)
+    assert len(seen) == 5
+
+
+@pytest.mark.parametrize("query, index", [
+    ("min_price=5&max_price=10", "ix_shop_items_price_id"),
+    ("sort=price&min_price=5", "ix_shop_items_price_id"),
+    ("sort=title", "ix_shop_items_title_id"),
+    ("category_ids=1&category_ids=2", "ix_shop_item_category_association_category_item"),
+    ("category_ids=1&category_ids=2&category_match=all", "ix_shop_item_category_association_category_item"),
+    ("category_id=1&sort=price&max_price=20", "ix_shop_item_category_association_category_item"),
+])
+def test_list_shop_items_query_plans(client: TestClient, query_plans, monkeypatch, query, index):
+    """Test that filtered and sorted listings use indexes instead of full scans"""
+    monkeypatch.setattr(catalog_cache, "enabled", False)
+    client.post("/api/v1/categories:bulk", json=[
+        {"title": f"Category {i}", "description": "Category"} for i in range(2)
+    ])
+    client.post("/api/v1/items:bulk", json=[
+        {"title": f"Item {i}", "description": "Item", "price": float(i), "category_ids": [i % 2 + 1]}
+        for i in range(20)
+    ])
+    query_plans.clear()
+    
+    assert client.get(f"/api/v1/items/?{query}").status_code == 200
+    
+    details = [detail for plan in query_plans for detail in plan]
+    assert any(index in detail for detail in details)
+    # A bare "SCAN <table>" visits every row; "SCAN ... USING INDEX" walks in order up to LIMIT
+    assert not [detail for detail in details if re.fullmatch(r"SCAN \w+", detail)]
+
+
+def test_list_shop_items_query_count(client: TestClient, query_counter, monkeypatch):
+    """Test that listing shop items costs a constant number of queries"""
+    # Measure the database path, not the catalog cache
+    monkeypatch.setattr(catalog_cache, "enabled", False)
+    category_ids = [
+        client.post("/api/v1/categories/", json={
+            "title": f"Category {i}", "description": "Category"
+        }).json()["id"]
+        for i in range(3)
+    ]
+    
+    def count_list_queries() -> int:
+        query_counter.clear()
+        response = client.get("/api/v1/items/?limit=1000")
+        assert response.status_code == 200
+        return len(query_counter)
+    
+    item_data = {
+        "title": "Item", "description": "Description", "price": 10.99,
+        "category_ids": category_ids
+    }
+    client.post("/api/v1/items/", json=item_data)
+    single_item_queries = count_list_queries()
+    
+    for _ in range(20):
+        client.post("/api/v1/items/", json=item_data)
+    response = client.get("/api/v1/items/?limit=1000")
+    assert all(len(item["categories"]) == 3 for item in response.json())
+    
+    assert count_list_queries() == single_item_queries <= 2
+
+
+def test_bulk_create_shop_items(client: TestClient):
+    """Test bulk creating shop items with category links"""
+    category_id = client.post("/api/v1/categories/", json={
+        "title": "Bulk", "description": "Bulk category"
+    }).json()["id"]
+    
+    items = [
+        {
+            "title": f"Bulk Item {i}", "description": "Bulk item", "price": 1.0 + i,
+            "category_ids": [category_id, category_id, 999] if i % 2 == 0 else []
+        }
+        for i in range(4)
+    ]
+    response = client.post("/api/v1/items:bulk", json=items)
+    assert response.status_code == 200
+    
+    data = response.json()
+    assert data["created"] == 4
+    item_ids = [row["id"] for row in data["results"]]
+    
+    listed = client.get(f"/api/v1/items/?category_id={category_id}").json()
+    assert [item["id"] for item in listed] == [item_ids[0], item_ids[2]]
+    assert [category["id"] for category in listed[0]["categories"]] == [category_id]
+
+
+def test_bulk_create_shop_items_invalid_row(client: TestClient):
+    """Test that an invalid row rejects the whole bulk request"""
+    items = [
+        {"title": "Valid", "description": "Valid item", "price": 1.0},
+        {"title": "Invalid", "description": "Negative price", "price": -1.0}
+    ]
+    response = client.post("/api/v1/items:bulk", json=items)
+    assert response.status_code == 422
+    assert client.get("/api/v1/items/").json() == []
+
+
+def test_export_shop_items(client: TestClient):
+    """Test streaming the catalog as NDJSON and CSV"""
+    category_ids = [
+        client.post("/api/v1/categories/", json={
+            "title": f"Category {i}", "description": "Category"
+        }).json()["id"]
+        for i in range(2)
+    ]
+    client.post("/api/v1/items/", json={
+        "title": "Item 1", "description": "Description 1", "price": 10.99,
+        "category_ids": category_ids
+    })
+    client.post("/api/v1/items/", json={
+        "title": "Item 2", "description": "Description 2", "price": 20.99
+    })
+    
+    response = client.get("/api/v1/items/export")
+    assert response.status_code == 200
+    exported = [json.loads(line) for line in response.text.splitlines()]
+    listed = client.get("/api/v1/items/").json()
+    for item in listed:
+        item["categories"].sort(key=lambda category: category["id"])
+    assert exported == listed
+    
+    response = client.get("/api/v1/items/export?format=csv")
+    assert response.text.splitlines() == [
+        "id,title,description,price,stock,category_ids",
+        f"{listed[0]['id']},Item 1,Description 1,10.99,,{category_ids[0]};{category_ids[1]}",
+        f"{listed[1]['id']},Item 2,Description 2,20.99,,",
+    ]
+
+
+def test_search_shop_items(client: TestClient):
+    """Test full-text search ranking, snippets and term matching"""
+    client.post("/api/v1/items:bulk", json=[
+        {"title": "Running shoes", "description": "Shoes for road running", "price": 80.0},
+        {"title": "Wool socks", "description": "Warm socks, good for running", "price": 9.0},
+        {"title": "Café table", "description": "Wooden table", "price": 120.0}
+    ])
+    
+    response = client.get("/api/v1/items/search?q=running")
+    assert response.status_code == 200
+    results = response.json()
+    # Title matches rank above description-only matches
+    assert [item["title"] for item in results] == ["Running shoes", "Wool socks"]
+    assert results[0]["snippet"] == "<mark>Running</mark> shoes"
+    assert results[0]["rank"] <= results[1]["rank"]
+    
+    assert client.get("/api/v1/items/search?q=run").json() == []
+    assert len(client.get("/api/v1/items/search?q=road running").json()) == 1
+    assert client.get("/api/v1/items/search?q=cafe").json()[0]["title"] == "Café table"
+    assert client.get("/api/v1/items/search?q=\"OR (").json() == []
+
+
+def test_search_shop_items_keyset_pagination(client: TestClient):
+    """Test walking search results with the X-Next-Cursor header"""
+    client.post("/api/v1/items:bulk", json=[
+        {"title": f"Lamp {i}", "description": "Desk lamp" * (i + 1), "price": 10.0}
+        for i in range(5)
+    ])
+    
+    seen = []
+    url = "/api/v1/items/search?q=lamp&limit=2"
+    while url:
+        response = client.get(url)
+        seen.extend(item["id"] for item in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        url = f"/api/v1/items/search?q=lamp&limit=2&cursor={cursor}" if cursor else None
+    
+    assert sorted(seen) == [1, 2, 3, 4, 5]
+    assert len(seen) == 5
+
+
+def test_search_index_follows_writes(client: TestClient):
+    """Test that updates and deletes keep the search index in sync"""
+    item_id = client.post("/api/v1/items/", json={
+        "title": "Old name", "description": "Item", "price": 1.0
+    }).json()["id"]
+    
+    client.put(f"/api/v1/items/{item_id}", json={"title": "Brand new"})
+    assert client.get("/api/v1/items/search?q=old").json() == []
+    assert client.get("/api/v1/items/search?q=brand").json()[0]["id"] == item_id
+    
+    client.delete(f"/api/v1/items/{item_id}")
+    assert client.get("/api/v1/items/search?q=brand").json() == []
+
+
+def test_search_index_built_for_existing_items(client: TestClient, session):
+    """Test that creating the index on an existing database indexes its items"""
+    client.post("/api/v1/items/", json={"title": "Existing", "description": "Item", "price": 1.0})
+    session.connection().exec_driver_sql("DROP TABLE shop_items_fts")
+    session.commit()
+    
+    SQLModel.metadata.create_all(session.get_bind())
+    
+    assert client.get("/api/v1/items/search?q=existing").json()[0]["title"] == "Existing"
+
+
 def test_update_shop_item(client: TestClient):
     """Test updating a shop item"""
     # Create item
@@ -150,6 +422,15 @@ def test_update_shop_item(client: TestClient):
     assert data["price"] == update_data["price"]
 
 
+def test_update_shop_item_too_many_categories(client: TestClient):
+    """Test that a write can't link more categories than one lookup covers"""
+    item_id = client.post("/api/v1/items/", json={
+        "title": "Item", "description": "Item", "price": 1.0
+    }).json()["id"]
+    response = client.put(f"/api/v1/items/{item_id}", json={"category_ids": list(range(1, 1002))})
+    assert response.status_code == 422
+
+
 def test_update_shop_item_not_found(client: TestClient):
     """Test updating non-existent shop item"""
     update_data = {
@@ -185,3 +466,70 @@ def test_delete_shop_item_not_found(client: TestClient):
     """Test deleting non-existent shop item"""
     response = client.delete("/api/v1/items/999")
     assert response.status_code == 404
+
+
+def test_shop_item_writes_query_count(client: TestClient, query_counter):
+    """Test that item writes read back with RETURNING instead of a refresh"""
+    query_counter.clear()
+    created = client.post("/api/v1/items/", json={"title": "Lamp", "description": "Desk lamp", "price": 25.0})
+    assert len(query_counter) == 1
+    
+    query_counter.clear()
+    updated = client.put(f"/api/v1/items/{created.json()['id']}", json={"price": 19.99})
+    # UPDATE ... RETURNING, then the item's categories
+    assert len(query_counter) == 2
+    assert updated.json() == {**created.json(), "price": 19.99}
+    
+    query_counter.clear()
+    assert client.put("/api/v1/items/999", json={"price": 19.99}).status_code == 404
+    assert len(query_counter) == 1
+
+
+def test_delete_shop_item_unlinks_categories(client: TestClient, session):
+    """Test that deleting an item removes its category links"""
+    category_id = client.post("/api/v1/categories/", json={"title": "Books", "description": "Books"}).json()["id"]
+    item_id = client.post("/api/v1/items/", json={
+        "title": "Novel", "description": "Book", "price": 10.0, "category_ids": [category_id]
+    }).json()["id"]
+    
+    assert client.delete(f"/api/v1/items/{item_id}").status_code == 200
+    
+    assert session.exec(select(ShopItemCategoryAssociation)).all() == []
+    assert client.get(f"/api/v1/items/?category_id={category_id}").json() == []
+
+
+def test_delete_shop_item_with_orders_conflicts(client: TestClient):
+    """Test that an item that was ordered can't be hard deleted, so its order lines stay valid"""
+    item_id = client.post("/api/v1/items/", json={"title": "Novel", "description": "Book", "price": 10.0}).json()["id"]
+    other_id = client.post("/api/v1/items/", json={"title": "Lamp", "description": "Lamp", "price": 5.0}).json()["id"]
+    customer_id = client.post("/api/v1/customers/", json={
+        "name": "John", "surname": "Doe", "email": "john@test.com"
+    }).json()["id"]
+    order_id = client.post("/api/v1/orders/", json={
+        "customer_id": customer_id, "items": [{"shop_item_id": item_id, "quantity": 1}]
+    }).json()["id"]
+    
+    response = client.delete(f"/api/v1/items/{item_id}")
+    assert response.status_code == 409
+    assert str(item_id) in response.json()["detail"]
+    assert client.post("/api/v1/items:bulk-delete", json=[other_id, item_id]).status_code == 409
+    
+    assert [item["id"] for item in client.get("/api/v1/items/").json()] == [item_id, other_id]
+    assert client.get(f"/api/v1/orders/{order_id}").json()["items"][0]["shop_item_id"] == item_id
+
+
+def test_bulk_delete_shop_items(client: TestClient):
+    """Test deleting many shop items, reporting the IDs that weren't found"""
+    item_ids = [
+        result["id"] for result in client.post("/api/v1/items:bulk", json=[
+            {"title": f"Item {n}", "description": "Item", "price": 1.0, "category_ids": [1]}
+            for n in range(3)
+        ]).json()["results"]
+    ]
+    client.get("/api/v1/items/")
+    
+    response = client.post("/api/v1/items:bulk-delete", json=[item_ids[1], item_ids[1], 999])
+    assert response.status_code == 200
+    assert response.json() == {"deleted": 1, "not_found": [999]}
+    assert [item["id"] for item in client.get("/api/v1/items/").json()] == [item_ids[0], item_ids[2]]
+    assert client.get(f"/api/v1/items/{item_ids[1]}").status_code == 404
@@ -0,0 +1,99 @@
+"""
+Soft delete tests
+"""
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import select
+from app.database.soft_delete import soft_delete
+from app.models import Customer, ShopItem, ShopItemCategory
+
+
+@pytest.fixture
+def soft_deletes():
+    """Soft delete rows for one test"""
+    with soft_delete.override(True):
+        yield
+
+
+@pytest.fixture
+def shop(client: TestClient):
+    """A customer with one order, and an item in two categories"""
+    customer_id = client.post("/api/v1/customers/", json={
+        "name": "John", "surname": "Doe", "email": "john@test.com"
+    }).json()["id"]
+    books, gifts = [
+        client.post("/api/v1/categories/", json={"title": title, "description": title}).json()["id"]
+        for title in ("Books", "Gifts")
+    ]
+    item_id = client.post("/api/v1/items/", json={
+        "title": "Novel", "description": "Paperback novel", "price": 10.0, "stock": 5,
+        "category_ids": [books, gifts]
+    }).json()["id"]
+    order_id = client.post("/api/v1/orders/", json={
+        "customer_id": customer_id, "items": [{"shop_item_id": item_id, "quantity": 2}]
+    }).json()["id"]
+    return {"customer": customer_id, "books": books, "gifts": gifts, "item": item_id, "order": order_id}
+
+
+def _deleted_at(session, model, row_id):
+    return session.exec(select(model.deleted_at).where(model.id == row_id)).one()
+
+
+def test_soft_deleted_item_is_hidden(client: TestClient, session, shop, soft_deletes):
+    """Test that a soft-deleted item stays in the table but disappears from every read"""
+    assert [row["shop_item_id"] for row in client.get("/api/v1/analytics/top-items").json()] == [shop["item"]]
+    assert client.delete(f"/api/v1/items/{shop['item']}").status_code == 200
+    
+    assert _deleted_at(session, ShopItem, shop["item"]) is not None
+    assert client.get(f"/api/v1/items/{shop['item']}").status_code == 404
+    assert client.get("/api/v1/items/").json() == []
+    assert client.get(f"/api/v1/items/?category_id={shop['books']}").json() == []
+    assert client.get("/api/v1/items/search?q=novel").json() == []
+    assert client.get("/api/v1/items/export").text == ""
+    assert client.get("/api/v1/analytics/top-items").json() == []
+    assert client.get("/api/v1/analytics/revenue").json()[0]["revenue"] == 20.0
+    assert client.put(f"/api/v1/items/{shop['item']}", json={"price": 1.0}).status_code == 404
+    assert client.delete(f"/api/v1/items/{shop['item']}").status_code == 404
+    
+    # Order history still points at it; new orders can't
+    assert client.get(f"/api/v1/orders/{shop['order']}").json()["items"][0]["shop_item_id"] == shop["item"]
+    assert client.post("/api/v1/orders/", json={
+        "customer_id": shop["customer"], "items": [{"shop_item_id": shop["item"], "quantity": 1}]
+    }).status_code == 404
+
+
+def test_soft_deleted_category_is_hidden(client: TestClient, session, shop, soft_deletes):
+    """Test that a soft-deleted category disappears from listings and items"""
+    assert client.delete(f"/api/v1/categories/{shop['books']}").status_code == 200
+    
+    assert _deleted_at(session, ShopItemCategory, shop["books"]) is not None
+    assert client.get(f"/api/v1/categories/{shop['books']}").status_code == 404
+    assert [category["id"] for category in client.get("/api/v1/categories/").json()] == [shop["gifts"]]
+    item = client.get(f"/api/v1/items/{shop['item']}").json()
+    assert [category["id"] for category in item["categories"]] == [shop["gifts"]]
+    top_categories = client.get("/api/v1/analytics/top-categories").json()
+    assert [row["category_id"] for row in top_categories] == [shop["gifts"]]
+
+
+def test_soft_deleted_customer_keeps_orders(client: TestClient, session, shop, soft_deletes):
+    """Test that soft-deleting a customer keeps their orders and frees their email"""
+    assert client.delete(f"/api/v1/customers/{shop['customer']}").status_code == 200
+    
+    assert _deleted_at(session, Customer, shop["customer"]) is not None
+    assert client.get(f"/api/v1/customers/{shop['customer']}").status_code == 404
+    assert client.get("/api/v1/customers/").json() == []
+    assert client.get(f"/api/v1/orders/{shop['order']}").status_code == 200
+    assert client.get(f"/api/v1/items/{shop['item']}").json()["stock"] == 3
+    
+    response = client.post("/api/v1/customers/", json={"name": "John", "surname": "Doe", "email": "John@test.com"})
+    assert response.status_code == 201
+    assert response.json()["id"] != shop["customer"]
+
+
+def test_bulk_soft_delete(client: TestClient, session, shop, soft_deletes):
+    """Test that bulk deletes soft delete too, and count already deleted rows as not found"""
+    client.delete(f"/api/v1/categories/{shop['books']}")
+    
+    response = client.post("/api/v1/categories:bulk-delete", json=[shop["books"], shop["gifts"]])
+    assert response.json() == {"deleted": 1, "not_found": [shop["books"]]}
+    assert _deleted_at(session, ShopItemCategory, shop["gifts"]) is not None